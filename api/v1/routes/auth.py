@@ -6,21 +6,18 @@ from datetime import datetime, timedelta, timezone
 from flask import Blueprint, abort, jsonify, request, make_response
 from mongoengine.errors import NotUniqueError
 from email_validator import validate_email, EmailNotValidError
-from werkzeug.security import check_password_hash, generate_password_hash
 from jose import jwt
 from uuid import uuid4
 
 from models.silo import Silo
-from models.user.user import User
+from models.user.user import User, credential_cache
+from utils.passwords import HasherBusyError, password_hasher
 
 
 auth = Blueprint("auth", __name__, url_prefix="/api/v1/auth")
 
 SECRET_KEY: str | None = os.getenv("SECRET_KEY")
-now: datetime = datetime.now(timezone.utc)
 expdelta: timedelta = timedelta(hours=24)
-exp: datetime = now + expdelta
-json_payload: dict = {"exp": exp, "iat": now, "nbf": now}
 
 if not SECRET_KEY:
     raise TypeError("SECRET KEY is not set in the environment!")
@@ -44,6 +41,12 @@ def error_forbidden(e):
     return jsonify({"error": e.description}), e.code
 
 
+@auth.errorhandler(503)
+def error_unavailable(e):
+    """Raised when too many passwords are waiting to be hashed"""
+    return jsonify({"error": e.description}), e.code
+
+
 @auth.post("/create", strict_slashes=False)
 def auth_create_user():
     """Create user endpoint
@@ -75,6 +78,8 @@ def auth_create_user():
                     type: string
       400:
         description: Field not found
+      503:
+        description: Too many signups at once
     """
     data: dict = request.form
 
@@ -98,9 +103,14 @@ def auth_create_user():
     except EmailNotValidError:
         abort(400, f"email address '{email}' is not valid")
 
+    try:
+        pwhash = password_hasher.hash(pswrd)
+    except HasherBusyError:
+        abort(503, "too many requests, try again later")
+
     new_user = User(
         email=valid_mail.normalized,
-        password=generate_password_hash(pswrd),
+        password=pwhash,
         username=uname,
     )
 
@@ -149,32 +159,47 @@ def login():
         description: Missing field
       401:
         description: Username or Email address not registered
+      503:
+        description: Too many logins at once
     """
     email_or_username = request.form["email_or_username"]
     password = request.form["password"]
 
     if not email_or_username or not password:
         abort(400, description="Fill both username and password field")
-    if "@" in str(email_or_username):
-        user = User.objects(email=email_or_username).first()
-        if user is None:
-            abort(401, description="email/username not registered")
-    else:
-        user = User.objects(username=email_or_username).first()
-        if user is None:
-            abort(401, description="email/username not registered")
+    user = User.credentials(str(email_or_username))
+    if user is None:
+        abort(401, description="email/username not registered")
 
     # Now authenticate with password.
-    pwhash = user.password
-    if not check_password_hash(pwhash, password):
+    pwhash = user["password"]
+    try:
+        verified = password_hasher.verify(pwhash, password)
+    except HasherBusyError:
+        abort(503, "too many requests, try again later")
+    if not verified:
         abort(401, description="email/username or password is incorrect")
+    if password_hasher.needs_rehash(pwhash):
+        # Upgrade the hash to the current parameters, unless it changed.
+        def save(new_hash: str) -> None:
+            User.objects(id=user["id"], password=pwhash).update_one(
+                set__password=new_hash
+            )
+            credential_cache.invalidate(user["id"])
+
+        password_hasher.rehash(password, save)
     session_id = str(uuid4())
-    json_payload["session_id"] = session_id
+    now = datetime.now(timezone.utc)
+    exp = now + expdelta
+    json_payload = {"exp": exp, "iat": now, "nbf": now, "session_id": session_id}
 
-    Silo.create_silo(session_id)
+    # The silo lives as long as the token at most.
+    Silo.create_silo(session_id, exp.timestamp())
     jwt_payload = jwt.encode(json_payload, str(SECRET_KEY), algorithm="HS256")
 
-    response = make_response({"email": user.email, "username": user.username}, 201)
+    response = make_response(
+        {"email": user["email"], "username": user["username"]}, 201
+    )
     response.headers["Authorization"] = f"Bearer {jwt_payload}"
 
     return response
@@ -3,9 +3,10 @@
 
 from flask import Blueprint, jsonify, abort, request
 import os
-from jose import jwt, ExpiredSignatureError, JWTError
+from jose import ExpiredSignatureError, JWTError
 from jose.exceptions import JWTClaimsError
 from models.silo import Silo
+from utils.token_cache import TokenCache
 
 main = Blueprint("main", __name__, url_prefix="/api/v1/user/main")
 
@@ -14,6 +15,10 @@ SECRET_KEY: str | None = os.getenv("SECRET_KEY")
 if not SECRET_KEY:
     raise TypeError("SECRET KEY is not set in the environment!")
 
+# Verified tokens kept by every worker, 0 verifies every request.
+TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+token_cache = TokenCache(SECRET_KEY, TOKEN_CACHE_SIZE)
+
 
 @main.errorhandler(401)
 def error_unauthenticated(e):
@@ -33,14 +38,17 @@ def error_forbidden(e):
     return jsonify({"error": e.description}), e.code
 
 
-@main.before_request
-def middleware():
-    """Middleware for handling user authorization
+def authenticate(token: str | None) -> dict:
+    """Verify the Authorization header of a request
 
-    All endpoints in main will run this before their handlers.
-    """
-    token = request.headers.get("Authorization")
+    Tokens already verified are answered from `token_cache` until they
+    expire.
 
+    Returns:
+        The claims of the token, holding a `session_id`.
+    Raises:
+        Unauthorized: as `abort(401)`, with a description of the problem.
+    """
     if not token:
         abort(401, "Unauthorized")
 
@@ -50,20 +58,35 @@ def middleware():
         abort(401, "No Bearer authorization header value found")
 
     try:
-        payload = jwt.decode(key=SECRET_KEY, token=token.split()[-1])
-        silo_session = payload.get("session_id")
-        if not silo_session:
+        payload = token_cache.decode(token.split()[-1])
+        if not payload.get("session_id"):
             raise JWTClaimsError
-
-        setattr(
-            request, "session_id", silo_session
-        )  # sets the silo session token so it can be accessed from the routes
     except ExpiredSignatureError:
         abort(401, "Token expired")
     except JWTClaimsError:
         abort(401, "Invalid token claim")
     except JWTError:
         abort(401, "Invalid token")
+    return payload
+
+
+@main.before_request
+def middleware():
+    """Middleware for handling user authorization
+
+    All endpoints in main will run this before their handlers, see
+    `authenticate`.
+    """
+    payload = authenticate(request.headers.get("Authorization"))
+    silo_session = payload["session_id"]
+    setattr(
+        request, "session_id", silo_session
+    )  # sets the silo session token so it can be accessed from the routes
+
+    # Sliding expiry of the silo: the routes touch it in the same round trip
+    # as they use it, and a silo dropped for being idle is replaced as long
+    # as the token is valid.
+    setattr(request, "expires_at", payload.get("exp"))
 
 
 @main.put("/<joke_id>/like", strict_slashes=False)
@@ -92,7 +115,9 @@ def like(joke_id: int):
     """
     session_id = request.session_id
 
-    Silo.include_joke(session_id, joke_id=str(joke_id))
+    Silo.include_joke(
+        session_id, joke_id=str(joke_id), touch=True, expires_at=request.expires_at
+    )
     return jsonify({"joke_id": joke_id})
 
 
@@ -122,7 +147,9 @@ def dislike(joke_id: int):
     """
     session_id = request.session_id
 
-    Silo.exclude_joke(session_id, joke_id=str(joke_id))
+    Silo.exclude_joke(
+        session_id, joke_id=str(joke_id), touch=True, expires_at=request.expires_at
+    )
     return jsonify({"joke_id": joke_id})
 
 
@@ -148,8 +175,6 @@ def populate():
         description: Unauthorized
     """
     session_id = request.session_id
-    content = Silo.get_jokes(session_id)
-    Silo.repopulate_jokes(
-        session_id
-    )  # NOTE: Can this come after we return content to user.
+    content = Silo.get_jokes(session_id, touch=True, expires_at=request.expires_at)
+    Silo.schedule_refill(session_id)  # Refilled after the response.
     return jsonify({"content": content})
@@ -1,12 +1,10 @@
 """Flask App."""
 
-from flask import Flask
+from flask import Flask, jsonify
 from flasgger import Swagger
-from fastai.tabular.all import (
-    Module,
-    Embedding,
-    sigmoid_range,
-)
+
+from models.metrics import process_metrics
+from utils.generate_content import is_ready, warmup
 
 app = Flask(__name__)
 swagger = Swagger(
@@ -44,33 +42,58 @@ swagger = Swagger(
 )
 
 
-# The class, as defined in the actual module,
-class DotProduct(Module):
-    """Dot Product Class that is used to construct
-    the behaviour of the collab filtering
-        model."""
+@app.get("/api/v1/ready", strict_slashes=False)
+def ready():
+    """Readiness endpoint
+    ---
+    tags:
+      - Status
+    responses:
+      200:
+        description: The model is loaded and recommendations are served
+        schema:
+            type: object
+            properties:
+                ready:
+                    type: boolean
+      503:
+        description: The model is not loaded yet
+    """
+    loaded = is_ready()
+    return jsonify({"ready": loaded}), 200 if loaded else 503
 
-    def __init__(self, n_users, n_items, n_factors, y_range=(-9.5, 10.5)):
-        self.user_factors = Embedding(n_users, n_factors)
-        self.user_bias = Embedding(n_users, 1)
-        self.item_factors = Embedding(n_items, n_factors)
-        self.item_bias = Embedding(n_items, 1)
-        self.y_range = y_range
 
-    def forward(self, x):
-        """Define the forward propagation."""
-        users = self.user_factors(x[:, 0])
-        items = self.item_factors(x[:, 1])
-        res = (users * items).sum(dim=1, keepdim=True)
-        res += self.user_bias(x[:, 0]) + self.item_bias(x[:, 1])
-        return sigmoid_range(res, *self.y_range)
+@app.get("/api/v1/metrics", strict_slashes=False)
+def metrics():
+    """Metrics endpoint
+    ---
+    tags:
+      - Status
+    responses:
+      200:
+        description: The counters of the process serving the request
+        schema:
+            type: object
+            properties:
+                mongo_pool:
+                    type: object
+    """
+    return jsonify(process_metrics()), 200
 
 
 from api.v1.routes.auth import auth
 from api.v1.routes.populate import main
+from models.silo import Silo
 
 app.register_blueprint(auth,)
 app.register_blueprint(main,)
 if __name__ == "__main__":
+    from utils.passwords import password_hasher
+
+    # Hashing processes would import this script again, see utils.passwords.
+    password_hasher.workers = 0
+    # Load the model before accepting requests instead of on the first one.
+    warmup()
+    Silo.fill_starters()
     # TODO: Env variable to turn debug on and off
     app.run("0.0.0.0", 5000, debug=True)
@@ -0,0 +1,213 @@
+"""ASGI entry point of the API.
+
+Usage:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+
+The jokes endpoints of the `main` blueprint, polled by every client, are
+served as coroutines with `AsyncSilo`: a request waiting on Redis holds no
+thread, so a worker keeps thousands of polling clients connected. Every
+other request, e.g. signup, login, readiness and the API docs, is handed to
+the Flask app in an executor of its own, the users being kept in Mongo
+through a synchronous driver. A login waiting on the password hashers then
+holds one of the `FLASK_EXECUTOR_WORKERS` threads, never a thread the jokes
+endpoints need.
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+from app import app
+from api.v1.routes.populate import authenticate
+from models.async_silo import AsyncSilo
+from models.silo import Silo
+from utils.generate_content import warmup
+
+MAIN: str = "/api/v1/user/main"
+# Threads running the requests handed to the Flask app.
+FLASK_EXECUTOR_WORKERS: int = int(os.getenv("FLASK_EXECUTOR_WORKERS", "8"))
+
+flask_executor = ThreadPoolExecutor(
+    FLASK_EXECUTOR_WORKERS, thread_name_prefix="asgi-flask"
+)
+
+
+async def like(session_id: str, expires_at: float | None, joke_id: str) -> dict:
+    """Like a joke, as `api.v1.routes.populate.like`"""
+    await AsyncSilo.include_joke(session_id, joke_id, touch=True, expires_at=expires_at)
+    return {"joke_id": joke_id}
+
+
+async def dislike(session_id: str, expires_at: float | None, joke_id: str) -> dict:
+    """Dislike a joke, as `api.v1.routes.populate.dislike`"""
+    await AsyncSilo.exclude_joke(session_id, joke_id, touch=True, expires_at=expires_at)
+    return {"joke_id": joke_id}
+
+
+async def populate(session_id: str, expires_at: float | None) -> dict:
+    """Serve the next jokes, as `api.v1.routes.populate.populate`"""
+    content = await AsyncSilo.get_jokes(session_id, touch=True, expires_at=expires_at)
+    AsyncSilo.schedule_refill(session_id)  # Refilled after the response.
+    return {"content": content}
+
+
+# Endpoints served as coroutines, with or without a trailing slash.
+ROUTES: list = [
+    ("GET", re.compile(rf"{MAIN}/populate/?"), populate),
+    ("PUT", re.compile(rf"{MAIN}/([^/]+)/like/?"), like),
+    ("PUT", re.compile(rf"{MAIN}/([^/]+)/dislike/?"), dislike),
+]
+
+
+async def application(scope: dict, receive, send) -> None:
+    """The ASGI application"""
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    for method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(scope["path"])
+        if match and scope["method"] == method:
+            await serve_main(scope, send, handler, *match.groups())
+            return
+    await serve_flask(scope, receive, send)
+
+
+async def lifespan(receive, send) -> None:
+    """Load the model before accepting requests, close Redis on shutdown.
+
+    A failed load is reported to the server, which then exits instead of
+    serving requests without a model.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await AsyncSilo.run(warmup)
+                await AsyncSilo.run(Silo.fill_starters)
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await AsyncSilo.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def serve_main(scope: dict, send, handler, *args) -> None:
+    """Authorize a request of `main` as its middleware does, and handle it"""
+    token = dict(scope["headers"]).get(b"authorization")
+    try:
+        payload = authenticate(token.decode("latin-1") if token else None)
+        session_id, expires_at = payload["session_id"], payload.get("exp")
+        status, body = 200, await handler(session_id, expires_at, *args)
+    except HTTPException as e:
+        status, body = e.code, {"error": e.description}
+
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send(
+        {
+            "type": "http.response.body",
+            "body": (json.dumps(body, separators=(",", ":")) + "\n").encode(),
+        }
+    )
+
+
+async def serve_flask(scope: dict, receive, send) -> None:
+    """Hand a request to the Flask app, in a thread of its executor"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    loop = asyncio.get_running_loop()
+    status, headers, content = await loop.run_in_executor(
+        flask_executor, call_flask, environ(scope, body)
+    )
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": content})
+
+
+def environ(scope: dict, body: bytes) -> dict:
+    """The WSGI environ of an ASGI request whose body was read"""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    env = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            env[name] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            env[key] = f"{env[key]},{value}" if key in env else value
+    return env
+
+
+def call_flask(env: dict) -> tuple:
+    """Run the Flask app on a WSGI environ.
+
+    Returns:
+        The status, the ASGI headers and the body of the response.
+    """
+    response = {}
+
+    def start_response(status: str, headers: list, exc_info=None) -> None:
+        response["status"] = int(status.split()[0])
+        response["headers"] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers
+        ]
+
+    result = app(env, start_response)
+    try:
+        content = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], content
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    from utils.passwords import password_hasher
+
+    # Hashing processes would import this script again, see utils.passwords.
+    password_hasher.workers = 0
+
+    uvicorn.run("asgi:application", host="0.0.0.0", port=5000)
@@ -1,7 +1,28 @@
 """Initializer"""
 
+import os
 import sys
 
+from .db.memory import MemoryDB
 from .db.redis import RedisDB
+from .db.storage import FailoverDB
 
+# Where the silos are stored: redis, memory (in the process, for single node
+# deployments and benchmarks) or failover (redis, and memory while redis is
+# unreachable).
+SILO_STORAGE: str = os.getenv("SILO_STORAGE", "redis")
+# Silos kept by the in-process storage before the least recently used are
+# evicted.
+SILO_MEMORY_KEYS: int = int(os.getenv("SILO_MEMORY_KEYS", "100000"))
+
+# Connection settings are read from the REDIS_* environment variables.
 REDIS = RedisDB()
+
+if SILO_STORAGE == "redis":
+    STORAGE = REDIS
+elif SILO_STORAGE == "memory":
+    STORAGE = MemoryDB(SILO_MEMORY_KEYS)
+elif SILO_STORAGE == "failover":
+    STORAGE = FailoverDB(REDIS, MemoryDB(SILO_MEMORY_KEYS))
+else:
+    raise ValueError(f"unknown silo storage '{SILO_STORAGE}'")
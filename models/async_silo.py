@@ -0,0 +1,169 @@
+"""Joke silo for each user, for asyncio callers."""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from . import SILO_STORAGE
+from .db.async_redis import AsyncRedisDB
+from .silo import LINKED, STREAM, STREAM_SIZE, Silo
+from utils.generate_content import (
+    generate_random,
+    generate_text_from_id,
+    is_ready,
+)
+
+# Threads running the model and the other calls that cannot be awaited,
+# shared by every request of the event loop.
+ASYNC_EXECUTOR_WORKERS: int = int(os.getenv("ASYNC_EXECUTOR_WORKERS", "8"))
+
+
+class AsyncSilo:
+    """The operations of `Silo` serving requests, as coroutines.
+
+    With the redis storage, liking, disliking and popping jokes, touching
+    the silo along as `Silo` does, await `redis.asyncio` and hold no
+    thread. Once the model is loaded, joke texts are resolved on the event
+    loop, being read from memory or from a memory map. Everything else, as
+    creating or migrating a silo and the other storages, runs `Silo` in a
+    bounded pool of `ASYNC_EXECUTOR_WORKERS` threads, so the event loop
+    never blocks. Refills are queued to the refill workers of `Silo` as
+    usual.
+
+    Methods:
+        create_silo(session_id: str, expires_at: float | None = None) -> None:
+        include_joke(session_id: str, joke_id: str, touch: bool = False,
+            expires_at: float | None = None) -> None:
+        exclude_joke(session_id: str, joke_id: str, touch: bool = False,
+            expires_at: float | None = None) -> None:
+        get_jokes(session_id: str, count: int = 5, touch: bool = False,
+            expires_at: float | None = None) -> list:
+        schedule_refill(session_id: str) -> bool:
+    """
+
+    __redis = AsyncRedisDB() if SILO_STORAGE == "redis" else None
+    __executor = ThreadPoolExecutor(
+        ASYNC_EXECUTOR_WORKERS, thread_name_prefix="async-silo"
+    )
+
+    @classmethod
+    async def run(cls, fn, *args):
+        """Run a blocking call in the executor of the silos"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.__executor, functools.partial(fn, *args))
+
+    @classmethod
+    async def close(cls) -> None:
+        """Close the connections of the event loop"""
+        if cls.__redis is not None:
+            await cls.__redis.close()
+
+    @classmethod
+    async def create_silo(
+        cls, session_id: str, expires_at: float | None = None
+    ) -> None:
+        """Create a new silo from a user's session, see `Silo.create_silo`"""
+        await cls.run(Silo.create_silo, session_id, expires_at)
+
+    @classmethod
+    async def _use(cls, session_id: str, touch: bool, expires_at, operation, *args):
+        """Await a redis operation on a silo, touching it as `Silo._use` does"""
+        if not touch:
+            return await operation(session_id, *args)
+        ttl = Silo._ttl(expires_at)
+        try:
+            return await operation(session_id, *args, ttl=ttl, linked=LINKED)
+        except KeyError:
+            await cls.create_silo(session_id, expires_at)
+        return await operation(session_id, *args, ttl=ttl, linked=LINKED)
+
+    @classmethod
+    async def include_joke(
+        cls,
+        session_id: str,
+        joke_id: str,
+        touch: bool = False,
+        expires_at: float | None = None,
+    ) -> None:
+        """Include a joke to a user's silo, see `Silo.include_joke`"""
+        if cls.__redis is None:
+            args = (session_id, joke_id, touch, expires_at)
+            return await cls.run(Silo.include_joke, *args)
+        await cls._use(
+            session_id,
+            touch,
+            expires_at,
+            cls.__redis.move_member,
+            "excludes",
+            "includes",
+            joke_id,
+        )
+
+    @classmethod
+    async def exclude_joke(
+        cls,
+        session_id: str,
+        joke_id: str,
+        touch: bool = False,
+        expires_at: float | None = None,
+    ) -> None:
+        """Exclude a joke from a user's silo, see `Silo.exclude_joke`"""
+        if cls.__redis is None:
+            args = (session_id, joke_id, touch, expires_at)
+            return await cls.run(Silo.exclude_joke, *args)
+        await cls._use(
+            session_id,
+            touch,
+            expires_at,
+            cls.__redis.move_member,
+            "includes",
+            "excludes",
+            joke_id,
+        )
+
+    @classmethod
+    async def get_jokes(
+        cls,
+        session_id: str,
+        count: int = 5,
+        touch: bool = False,
+        expires_at: float | None = None,
+    ) -> list:
+        """Serve the next jokes of a user's silo, see `Silo.get_jokes`.
+
+        An empty buffer is handled as `Silo.get_joke_ids` does: a silo of
+        the former format is migrated in the executor, any other is served
+        random jokes.
+        """
+        if cls.__redis is None:
+            args = (session_id, count, touch, expires_at)
+            return await cls.texts(await cls.run(Silo.get_joke_ids, *args))
+
+        n = STREAM_SIZE if count == -1 else count
+        joke_ids = await cls._use(
+            session_id, touch, expires_at, cls.__redis.pop_many, STREAM, n
+        )
+        if not joke_ids and any(await cls.__redis.get(session_id)):
+            if await cls.run(Silo.migrate_silo, session_id):
+                joke_ids = await cls.__redis.pop_many(session_id, STREAM, n)
+        if not joke_ids and is_ready():
+            joke_ids = generate_random(n)
+        elif not joke_ids:
+            joke_ids = await cls.run(generate_random, n)
+        return await cls.texts(joke_ids)
+
+    @classmethod
+    async def texts(cls, joke_ids: list) -> list:
+        """Resolve the texts of jokes, in the executor until the model loaded"""
+        if is_ready():
+            return generate_text_from_id(joke_ids)
+        return await cls.run(generate_text_from_id, joke_ids)
+
+    @classmethod
+    def schedule_refill(cls, session_id: str) -> bool:
+        """Repopulate a user's joke silo in the background.
+
+        Only queues the refill, see `Silo.schedule_refill`.
+        """
+        return Silo.schedule_refill(session_id)
@@ -0,0 +1,168 @@
+"""Redis connector for asyncio callers"""
+
+import asyncio
+import json
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.retry import Retry
+from redis.backoff import EqualJitterBackoff
+
+from .redis import (
+    MOVE_MEMBER,
+    POP_MANY,
+    REDIS_BACKOFF_BASE,
+    REDIS_BACKOFF_CAP,
+    REDIS_CONNECT_TIMEOUT,
+    REDIS_DB,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_HOST,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_PASSWORD,
+    REDIS_POOL_TIMEOUT,
+    REDIS_PORT,
+    REDIS_RETRIES,
+    REDIS_SOCKET_TIMEOUT,
+)
+
+
+class AsyncRedisDB:
+    """The silo operations of the request path, with `redis.asyncio`.
+
+    Keys, sets and buffers are stored exactly as `RedisDB` stores them, with
+    the same scripts, so both can serve the same silos. Commands wait for a
+    connection of a bounded pool without blocking the event loop, and are
+    retried with a jittered exponential backoff like those of `RedisDB`.
+
+    Connections belong to the event loop that opened them. Used from
+    another loop, e.g. after a test ran its own, the pool is created again
+    for that loop.
+    """
+
+    def __init__(
+        self,
+        host: str = REDIS_HOST,
+        port: int = REDIS_PORT,
+        db: int = REDIS_DB,
+        password: str | None = REDIS_PASSWORD,
+        max_connections: int = REDIS_MAX_CONNECTIONS,
+        pool_timeout: float = REDIS_POOL_TIMEOUT,
+        socket_timeout: float = REDIS_SOCKET_TIMEOUT,
+        connect_timeout: float = REDIS_CONNECT_TIMEOUT,
+        retries: int = REDIS_RETRIES,
+        health_check_interval: float = REDIS_HEALTH_CHECK_INTERVAL,
+    ) -> None:
+        self.__pool_kwargs = dict(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=connect_timeout,
+            socket_keepalive=True,
+            retry=Retry(
+                EqualJitterBackoff(REDIS_BACKOFF_CAP, REDIS_BACKOFF_BASE), retries
+            ),
+            health_check_interval=health_check_interval,
+        )
+        self.__loop: asyncio.AbstractEventLoop | None = None
+        self.__pool: BlockingConnectionPool | None = None
+
+    @property
+    def __redis(self) -> Redis:
+        """The client of the running event loop"""
+        return self._bind()
+
+    def _bind(self) -> Redis:
+        """Create the pool, client and scripts of the running event loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self.__loop:
+            self.__pool = BlockingConnectionPool(**self.__pool_kwargs)
+            self.__client = Redis(connection_pool=self.__pool)
+            self.__scripts = {
+                script: self.__client.register_script(script)
+                for script in (MOVE_MEMBER, POP_MANY)
+            }
+            self.__loop = loop
+        return self.__client
+
+    async def _run(self, script: str, keys: list, args: list):
+        """Run one of the scripts of `RedisDB`"""
+        self._bind()
+        return await self.__scripts[script](keys=keys, args=args)
+
+    async def close(self) -> None:
+        """Close the connections of the pool"""
+        if self.__pool is not None and self.__loop is asyncio.get_running_loop():
+            await self.__pool.disconnect()
+
+    async def expire(self, key: str, ttl: float, *sets: str) -> bool:
+        """Make an item expire in `ttl` seconds, along with the named sets.
+
+        Returns:
+            Whether the item is present.
+        """
+        pipe = self.__redis.pipeline(transaction=False)
+        for name in (key, *[f"{key}:{name}" for name in sets]):
+            pipe.pexpire(name, int(ttl * 1000))
+        return bool((await pipe.execute())[0])
+
+    async def ttl(self, key: str) -> float | None:
+        """Seconds left before an item expires, `None` if it never does.
+
+        Raises:
+            KeyError: if the key is not present.
+        """
+        ttl = await self.__redis.pttl(key)
+        if ttl == -2:
+            raise KeyError(f"Key {key} is not present")
+        return None if ttl == -1 else ttl / 1000
+
+    async def get(self, key: str) -> list:
+        """Retrives an object, as `RedisDB.get` without its near cache.
+
+        Raises:
+            KeyError: if the key is not present.
+        """
+        obj = await self.__redis.json().get(key, "$")
+        if obj is None:
+            raise KeyError(f"Key {key} is not present")
+        return obj
+
+    async def move_member(
+        self,
+        key: str,
+        src: str,
+        dst: str,
+        member: str,
+        ttl: float | None = None,
+        linked: tuple = (),
+    ) -> None:
+        """Atomically move a member between two sets of an object.
+
+        Raises:
+            KeyError: if the object is not present.
+        """
+        keys = [key, *[f"{key}:{name}" for name in (src, dst, *linked)]]
+        moved = await self._run(
+            MOVE_MEMBER, keys, [member, int(ttl * 1000) if ttl else 0]
+        )
+        if not moved:
+            raise KeyError(f"Key {key} is not present")
+
+    async def pop_many(
+        self, key: str, name: str, n: int, ttl: float | None = None, linked: tuple = ()
+    ) -> list:
+        """Remove and return the `n` oldest values of a bounded buffer.
+
+        Raises:
+            KeyError: if the object is not present.
+        """
+        if n <= 0:
+            return []
+        keys = [key, *[f"{key}:{other}" for other in (name, *linked)]]
+        values = await self._run(POP_MANY, keys, [n, int(ttl * 1000) if ttl else 0])
+        if values is None:
+            raise KeyError(f"Key {key} is not present")
+        return [json.loads(value) for value in values]
@@ -0,0 +1,194 @@
+"""In-process storage backend"""
+
+import fnmatch
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .storage import Storage
+
+
+class MemoryDB(Storage):
+    """Silo storage in the memory of the process.
+
+    Objects are kept in a bounded LRU: once `max_keys` objects are stored,
+    storing another one evicts the least recently used. The sets and
+    buffers of an object live in the same entry, so they always expire and
+    are evicted or deleted along with it.
+
+    Every operation on a key holds a lock of that key, taken from a fixed
+    pool of `stripes` locks, so operations on different sessions do not
+    wait for each other.
+    """
+
+    def __init__(self, max_keys: int = 100_000, stripes: int = 64) -> None:
+        self.max_keys = max_keys
+        self.__entries: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__key_locks = [threading.Lock() for _ in range(stripes)]
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        """The lock guarding a key"""
+        return self.__key_locks[hash(key) % len(self.__key_locks)]
+
+    def _entry(self, key: str) -> dict | None:
+        """The live entry of a key, marked as recently used"""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if entry["expires"] is not None and entry["expires"] <= time.monotonic():
+                del self.__entries[key]
+                return None
+            self.__entries.move_to_end(key)
+            return entry
+
+    def _existing(self, key: str) -> dict:
+        """The live entry of a key, raising a `KeyError` if absent"""
+        entry = self._entry(key)
+        if entry is None:
+            raise KeyError(f"Key {key} is not present")
+        return entry
+
+    @staticmethod
+    def _fields(doc: dict, fields: tuple) -> str:
+        """Serialized fields of an object, the token of a snapshot"""
+        return json.dumps([[doc[f]] if f in doc else [] for f in fields])
+
+    def connected(self) -> bool:
+        """The memory of the process is always reachable"""
+        return True
+
+    def set(self, key: str, obj: dict, ttl: float | None = None):
+        """Sets a new object, expiring after `ttl` seconds"""
+        entry = {
+            # Stored as JSON would be, and safe from changes by the caller.
+            "doc": json.loads(json.dumps(obj)),
+            "sets": {},
+            "buffers": {},
+            "expires": None if ttl is None else time.monotonic() + ttl,
+        }
+        with self._key_lock(key):
+            with self.__lock:
+                self.__entries[key] = entry
+                self.__entries.move_to_end(key)
+                while len(self.__entries) > self.max_keys:
+                    self.__entries.popitem(last=False)
+
+    def get(self, key: str, field: str | None = None) -> list:
+        """Retrives an object, or one of its fields"""
+        with self._key_lock(key):
+            doc = self._existing(key)["doc"]
+            if field is None:
+                return json.loads(json.dumps([doc]))
+            return json.loads(self._fields(doc, (field,)))[0]
+
+    def snapshot(
+        self, key: str, *fields: str, sets: tuple = (), buffers: tuple = ()
+    ) -> tuple:
+        """Retrives several fields, sets and buffers of an object at once"""
+        with self._key_lock(key):
+            entry = self._existing(key)
+            token = self._fields(entry["doc"], fields)
+            values = dict(zip(fields, json.loads(token)))
+            for name in sets:
+                values[name] = set(entry["sets"].get(name, ()))
+            for name in buffers:
+                values[name] = list(entry["buffers"].get(name, ()))
+        return values, token
+
+    def compare_and_set(self, key: str, obj: dict, token, *fields: str) -> bool:
+        """Replace an object if its fields did not change since a snapshot"""
+        with self._key_lock(key):
+            entry = self._entry(key)
+            if entry is None or self._fields(entry["doc"], fields) != token:
+                return False
+            entry["doc"] = json.loads(json.dumps(obj))
+            return True
+
+    def move_member(
+        self,
+        key: str,
+        src: str,
+        dst: str,
+        member: str,
+        ttl: float | None = None,
+        linked: tuple = (),
+    ) -> None:
+        """Atomically move a member between two sets of an object"""
+        with self._key_lock(key):
+            entry = self._existing(key)
+            if ttl is not None:
+                entry["expires"] = time.monotonic() + ttl
+            sets = entry["sets"]
+            sets.get(src, set()).discard(member)
+            sets.setdefault(dst, set()).add(member)
+
+    def members(self, key: str, name: str) -> set:
+        """Retrives the members of a set of an object"""
+        with self._key_lock(key):
+            entry = self._entry(key)
+            return set() if entry is None else set(entry["sets"].get(name, ()))
+
+    def is_member(self, key: str, name: str, member: str) -> bool:
+        """Check if a member is present in a set of an object"""
+        with self._key_lock(key):
+            entry = self._entry(key)
+            return entry is not None and member in entry["sets"].get(name, ())
+
+    def push_many(self, key: str, name: str, values: list, max_len: int) -> int:
+        """Append values to a bounded buffer of an object, while they fit"""
+        values = json.loads(json.dumps(values))
+        with self._key_lock(key):
+            buffer = self._existing(key)["buffers"].setdefault(name, deque())
+            buffer.extend(values[: max(max_len - len(buffer), 0)])
+            return len(buffer)
+
+    def pop_many(
+        self, key: str, name: str, n: int, ttl: float | None = None, linked: tuple = ()
+    ) -> list:
+        """Remove and return the `n` oldest values of a bounded buffer"""
+        with self._key_lock(key):
+            entry = self._existing(key)
+            if ttl is not None:
+                entry["expires"] = time.monotonic() + ttl
+            buffer = entry["buffers"].get(name, ())
+            return [buffer.popleft() for _ in range(min(n, len(buffer)))]
+
+    def length(self, key: str, name: str) -> int:
+        """Amount of values in a bounded buffer of an object"""
+        with self._key_lock(key):
+            entry = self._entry(key)
+            return 0 if entry is None else len(entry["buffers"].get(name, ()))
+
+    def expire(self, key: str, ttl: float, *sets: str) -> bool:
+        """Make an object, its sets and buffers expire in `ttl` seconds"""
+        with self._key_lock(key):
+            entry = self._entry(key)
+            if entry is None:
+                return False
+            entry["expires"] = time.monotonic() + ttl
+            return True
+
+    def ttl(self, key: str) -> float | None:
+        """Seconds left before an object expires, `None` if it never does"""
+        with self._key_lock(key):
+            expires = self._existing(key)["expires"]
+            return None if expires is None else expires - time.monotonic()
+
+    def scan(self, match: str = "*", _type: str | None = None):
+        """Iterates over the keys of the objects matching a pattern"""
+        if _type not in (None, "ReJSON-RL"):
+            return
+        with self.__lock:
+            keys = list(self.__entries)
+        for key in keys:
+            if fnmatch.fnmatchcase(key, match) and self._entry(key) is not None:
+                yield key
+
+    def delete(self, key: str, *sets: str) -> None:
+        """Delete an object, along with all its sets and buffers"""
+        with self._key_lock(key):
+            with self.__lock:
+                self.__entries.pop(key, None)
@@ -2,11 +2,124 @@
 """Module for the Mongo Engine."""
 
 from mongoengine import connect, disconnect
+from pymongo import monitoring
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 import os
+import threading
 
 MONGO_HOST: str = os.getenv("MONGO_HOST", "localhost")
 MONGO_PORT: str = os.getenv("MONGO_PORT", "27017")
 DB_NAME: str = os.getenv("DB", "testdb")
+# Connections kept per server, and milliseconds an idle one is kept, 0 for
+# as long as the client lives.
+MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "0"))
+# Milliseconds to wait for a connection, a reply, a server and a free
+# connection of the pool, so a slow Mongo fails requests fast.
+MONGO_CONNECT_TIMEOUT_MS: int = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "2000"))
+MONGO_SOCKET_TIMEOUT_MS: int = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(
+    os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "3000")
+)
+MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+# Read preference, e.g. primary, primaryPreferred or secondaryPreferred.
+MONGO_READ_PREFERENCE: str = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Counters of the connection pool events of the Mongo clients.
+
+    Attributes:
+        created:          connections opened.
+        closed:           connections closed.
+        checked_out:      connections taken from a pool.
+        checked_in:       connections given back to a pool.
+        checkout_failed:  connections that could not be taken, e.g. the
+                          pool stayed full past the wait queue timeout.
+        cleared:          pools cleared after a server error.
+        checkout_seconds: total seconds spent taking connections.
+        max_checkout:     longest seconds spent taking a connection.
+    """
+
+    COUNTERS = (
+        "created",
+        "closed",
+        "checked_out",
+        "checked_in",
+        "checkout_failed",
+        "cleared",
+        "checkout_seconds",
+        "max_checkout",
+    )
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Set every counter back to 0."""
+        with self.__lock:
+            for name in self.COUNTERS:
+                setattr(self, name, 0)
+
+    def stats(self) -> dict:
+        """The counters, and the connections open and in use."""
+        with self.__lock:
+            stats = {name: getattr(self, name) for name in self.COUNTERS}
+        stats["open"] = stats["created"] - stats["closed"]
+        stats["in_use"] = stats["checked_out"] - stats["checked_in"]
+        return stats
+
+    def _count(self, name: str) -> None:
+        """Add one to a counter."""
+        with self.__lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def connection_created(self, event) -> None:
+        """A connection was opened."""
+        self._count("created")
+
+    def connection_closed(self, event) -> None:
+        """A connection was closed."""
+        self._count("closed")
+
+    def connection_checked_out(self, event) -> None:
+        """A connection was taken, after waiting `event.duration` seconds."""
+        with self.__lock:
+            self.checked_out += 1
+            self.checkout_seconds += event.duration
+            self.max_checkout = max(self.max_checkout, event.duration)
+
+    def connection_check_out_failed(self, event) -> None:
+        """A connection could not be taken."""
+        self._count("checkout_failed")
+
+    def connection_checked_in(self, event) -> None:
+        """A connection was given back."""
+        self._count("checked_in")
+
+    def pool_cleared(self, event) -> None:
+        """A pool dropped its connections after a server error."""
+        self._count("cleared")
+
+    def pool_created(self, event) -> None:
+        """Not counted."""
+
+    def pool_ready(self, event) -> None:
+        """Not counted."""
+
+    def pool_closed(self, event) -> None:
+        """Not counted."""
+
+    def connection_ready(self, event) -> None:
+        """Not counted, `connection_created` is."""
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+
+pool_metrics = PoolMetrics()
 
 
 class MongoEngine:
@@ -14,7 +127,7 @@ class MongoEngine:
     MongoDb and disconnect a given DB."""
 
     @staticmethod
-    def connect(alias: str, db_name: str = DB_NAME) -> None:
+    def connect(alias: str, db_name: str = DB_NAME, **options) -> None:
         """connect method to connect to a given db and a respective alias
 
         Parameters
@@ -25,9 +138,35 @@ class MongoEngine:
         Defaults to environemnt specified db_name or `test` when
         no environemnt variable is found.
 
+        options - Options of the client, overriding the pool sizes,
+        timeouts and read preference read from the environment, e.g.
+        `maxPoolSize=10`.
+
         Return - None.
         """
-        connect(alias=alias, host=f"mongodb://{MONGO_HOST}:{MONGO_PORT}/{db_name}", uuidRepresentation='standard')
+        settings = {
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+            "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "readPreference": MONGO_READ_PREFERENCE,
+            "event_listeners": [pool_metrics],
+        }
+        if MONGO_MAX_IDLE_TIME_MS:
+            settings["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+        settings.update(options)
+        # Mongoengine takes a read preference object, not its name.
+        settings["read_preference"] = make_read_preference(
+            read_pref_mode_from_name(settings.pop("readPreference")), None
+        )
+        connect(
+            alias=alias,
+            host=f"mongodb://{MONGO_HOST}:{MONGO_PORT}/{db_name}",
+            uuidRepresentation="standard",
+            **settings,
+        )
 
     @staticmethod
     def disconnect(alias: str) -> None:
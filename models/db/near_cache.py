@@ -0,0 +1,167 @@
+"""Per-process cache of Redis reads, invalidated by the server.
+
+Redis 6+ tracks the keys a connection read once `CLIENT TRACKING` is on,
+and announces every later change to them. Invalidations are redirected to
+a connection of the process subscribed to `__redis__:invalidate`, which
+drops the changed keys from the cache, so reads served from the process
+still see the writes of every other worker.
+
+Tracking is opt-in: only the reads preceded by `CLIENT CACHING YES` are
+tracked, the server does not remember the other keys a worker reads.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from redis import Connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL: str = "__redis__:invalidate"
+
+
+class NearCache:
+    """Bounded LRU of Redis reads, kept valid by tracking invalidations.
+
+    Values are only cached while the invalidation listener of the process
+    is connected. When it disconnects, the cache is emptied and reads go to
+    Redis until it reconnects, since changes made meanwhile were missed.
+
+    Attributes:
+        max_keys:  amount of keys cached before the least recently used is
+                   evicted.
+        client_id: id of the connection receiving the invalidations, `None`
+                   while it is not connected.
+        hits:      reads answered from the cache.
+        misses:    reads that went to Redis.
+    """
+
+    def __init__(
+        self, connection_kwargs: dict, max_keys: int = 1024, on_listen=None
+    ) -> None:
+        """Create a near cache.
+
+        Args:
+            connection_kwargs: arguments of the listener `redis.Connection`.
+            max_keys:          amount of keys cached.
+            on_listen:         called once the listener is connected, to
+                               re-open the connections that must redirect
+                               their invalidations to the new `client_id`.
+        """
+        self.max_keys = max_keys
+        self.client_id: int | None = None
+        self.hits = 0
+        self.misses = 0
+        self.__connection_kwargs = {
+            key: value
+            for key, value in connection_kwargs.items()
+            if key not in ("redis_connect_func", "retry", "health_check_interval")
+        }
+        self.__on_listen = on_listen
+        self.__entries: OrderedDict = OrderedDict()
+        self.__generation = 0
+        self.__lock = threading.Lock()
+        self.__pid: int | None = None
+
+    def listening(self) -> bool:
+        """Whether values can be cached, starting the listener if needed"""
+        if self.__pid != os.getpid():
+            # First use, or first use after a fork, which only keeps the
+            # thread that forked.
+            with self.__lock:
+                if self.__pid != os.getpid():
+                    self.__pid = os.getpid()
+                    self.client_id = None
+                    self.__entries.clear()
+                    threading.Thread(
+                        target=self._listen, name="redis-near-cache", daemon=True
+                    ).start()
+        return self.client_id is not None
+
+    def lookup(self, key: str, field: str | None) -> tuple:
+        """Look a read up.
+
+        Returns:
+            Whether it was cached, the value, and the generation to pass to
+            `store` after reading it from Redis on a miss.
+        """
+        with self.__lock:
+            fields = self.__entries.get(key)
+            if fields is not None and field in fields:
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                return True, json.loads(fields[field]), self.__generation
+            self.misses += 1
+            return False, None, self.__generation
+
+    def store(self, key: str, field: str | None, value, generation: int) -> None:
+        """Cache a read, unless an invalidation arrived while reading it"""
+        with self.__lock:
+            if generation != self.__generation or self.client_id is None:
+                return
+            self.__entries.setdefault(key, {})[field] = json.dumps(value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_keys:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, keys: list | None = None) -> None:
+        """Drop keys from the cache, every key if `keys` is `None`"""
+        with self.__lock:
+            self.__generation += 1
+            if keys is None:
+                self.__entries.clear()
+            for key in keys or ():
+                self.__entries.pop(key, None)
+
+    def _connect(self) -> tuple:
+        """Open the listener connection and subscribe to invalidations.
+
+        Returns:
+            The connection and its client id.
+        """
+        connection = Connection(**self.__connection_kwargs)
+        connection.connect()
+        connection.send_command("CLIENT", "ID")
+        client_id = connection.read_response()
+        connection.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+        connection.read_response()
+        return connection, client_id
+
+    def _listen(self) -> None:
+        """Apply the invalidations, reconnecting with a backoff"""
+        pid = os.getpid()
+        delay = 0.1
+        while self.__pid == pid:
+            connection = None
+            try:
+                connection, client_id = self._connect()
+                delay = 0.1
+                # Connections still redirecting to a former listener would
+                # never see their reads invalidated.
+                if self.__on_listen is not None:
+                    self.__on_listen()
+                self.client_id = client_id
+                while self.__pid == pid:
+                    if not connection.can_read(timeout=1):
+                        continue
+                    message = connection.read_response()
+                    if message[0] == b"message":
+                        keys = message[2]
+                        self.invalidate(
+                            None if keys is None else [k.decode() for k in keys]
+                        )
+            except (RedisError, OSError):
+                if self.client_id is not None:
+                    logger.warning("near cache invalidations lost, reconnecting")
+            finally:
+                self.client_id = None
+                self.invalidate()
+                if connection is not None:
+                    connection.disconnect()
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
@@ -1,141 +1,547 @@
 """Redis connector"""
 
-from redis import Redis
-from redis.exceptions import ConnectionError, RedisError
-
-
-class RedisDB:
-    __redis: Redis | None = None
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+
+from redis import BlockingConnectionPool, Redis
+from redis.backoff import EqualJitterBackoff
+from redis.exceptions import ConnectionError, RedisError, ResponseError, TimeoutError
+from redis.retry import Retry
+
+from .near_cache import NearCache
+from .storage import Storage
+
+REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
+REDIS_PASSWORD: str | None = os.getenv("REDIS_PASSWORD") or None
+# Connections of the pool of a process, callers wait up to
+# REDIS_POOL_TIMEOUT seconds for a free one once they are all in use.
+REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "32"))
+REDIS_POOL_TIMEOUT: float = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+REDIS_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+# Retries of a command failing on a connection error or a timeout, waiting
+# an exponential, jittered backoff between REDIS_BACKOFF_BASE and
+# REDIS_BACKOFF_CAP seconds.
+REDIS_RETRIES: int = int(os.getenv("REDIS_RETRIES", "3"))
+REDIS_BACKOFF_BASE: float = float(os.getenv("REDIS_BACKOFF_BASE", "0.05"))
+REDIS_BACKOFF_CAP: float = float(os.getenv("REDIS_BACKOFF_CAP", "1"))
+# Seconds between health checks while connected, and between reconnection
+# attempts once the server was found unreachable.
+REDIS_HEALTH_CHECK_INTERVAL: float = float(
+    os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "15")
+)
+REDIS_RECONNECT_INTERVAL: float = float(os.getenv("REDIS_RECONNECT_INTERVAL", "1"))
+# Keys of `get` cached by every process and invalidated by Redis 6+ client
+# side caching, see `models.db.near_cache`. 0 disables the near cache, the
+# default: the silos are served by scripts and snapshots, which bypass it,
+# and no request reads the same key with `get` repeatedly.
+REDIS_NEAR_CACHE_SIZE: int = int(os.getenv("REDIS_NEAR_CACHE_SIZE", "0"))
+
+# Replaces a JSON document only if the given fields still serialize to the
+# snapshot that was read, making a read-modify-write atomic. The expiry of
+# the document is kept.
+COMPARE_AND_SET = """
+local current = redis.call('JSON.GET', KEYS[1], unpack(ARGV, 3))
+if current ~= ARGV[1] then
+    return 0
+end
+local ttl = redis.call('PTTL', KEYS[1])
+redis.call('JSON.SET', KEYS[1], '$', ARGV[2])
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+# Moves a member from one set of an object to another, if the object exists.
+# Given a positive ARGV[2], every key expires in ARGV[2] milliseconds,
+# otherwise the set receiving the member expires along with the object.
+MOVE_MEMBER = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('SREM', KEYS[2], ARGV[1])
+redis.call('SADD', KEYS[3], ARGV[1])
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    for _, key in ipairs(KEYS) do
+        redis.call('PEXPIRE', key, ttl)
+    end
+    return 1
+end
+ttl = redis.call('PTTL', KEYS[1])
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[3], ttl)
+end
+return 1
+"""
+
+# Appends values to a list next to an object, if the object exists, as
+# long as the list holds fewer than ARGV[1] values: the values past that are
+# dropped, never the values already queued. The list expires along with the
+# object. Returns the length of the list, -1 if the object is missing.
+PUSH_MANY = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local room = tonumber(ARGV[1]) - redis.call('LLEN', KEYS[2])
+if room > 0 then
+    redis.call('RPUSH', KEYS[2], unpack(ARGV, 2, math.min(#ARGV, room + 1)))
+    local ttl = redis.call('PTTL', KEYS[1])
+    if ttl > 0 then
+        redis.call('PEXPIRE', KEYS[2], ttl)
+    end
+end
+return redis.call('LLEN', KEYS[2])
+"""
+
+# Pops the oldest ARGV[1] values of a list next to an object, if the object
+# exists. Given a positive ARGV[2], every key expires in ARGV[2] milliseconds.
+POP_MANY = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return false
+end
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    for _, key in ipairs(KEYS) do
+        redis.call('PEXPIRE', key, ttl)
+    end
+end
+return redis.call('LPOP', KEYS[2], ARGV[1]) or {}
+"""
+
+
+def _connected(method):
+    """Run a `RedisDB` method only while the server is reachable.
+
+    Fails fast with a `RedisError` while the server is known to be down,
+    and marks it down when a command fails on a connection error or a
+    timeout that outlasted the retries.
+    """
+
+    if inspect.isgeneratorfunction(method):
+        # Errors of a generator are raised while it is iterated.
+        @functools.wraps(method)
+        def generator(self, *args, **kwargs):
+            if not self.connected():
+                raise RedisError("Redis not connected")
+            try:
+                yield from method(self, *args, **kwargs)
+            except (ConnectionError, TimeoutError):
+                self._mark_down()
+                raise
+
+        return generator
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.connected():
+            raise RedisError("Redis not connected")
+        try:
+            return method(self, *args, **kwargs)
+        except (ConnectionError, TimeoutError):
+            self._mark_down()
+            raise
+
+    return wrapper
+
+
+class RedisDB(Storage):
+    """JSON documents, sets and plain values kept in Redis.
+
+    Every process uses a bounded pool of connections, re-created after a
+    fork. Commands failing on a connection error or a timeout are retried
+    with a jittered exponential backoff. Once the server is found
+    unreachable, commands fail fast and a reconnection is attempted every
+    `reconnect_interval` seconds, so a worker recovers by itself from a
+    Redis outage.
+
+    With a `near_cache_size`, `get` is served from a `NearCache` of the
+    process, which Redis invalidates whenever a cached key changes. Only
+    `get` is cached, which the request path does not read repeatedly, so
+    it is disabled by default.
+    """
+
+    __redis: Redis
+
+    def __init__(
+        self,
+        host: str = REDIS_HOST,
+        port: int = REDIS_PORT,
+        db: int = REDIS_DB,
+        password: str | None = REDIS_PASSWORD,
+        max_connections: int = REDIS_MAX_CONNECTIONS,
+        pool_timeout: float = REDIS_POOL_TIMEOUT,
+        socket_timeout: float = REDIS_SOCKET_TIMEOUT,
+        connect_timeout: float = REDIS_CONNECT_TIMEOUT,
+        retries: int = REDIS_RETRIES,
+        health_check_interval: float = REDIS_HEALTH_CHECK_INTERVAL,
+        reconnect_interval: float = REDIS_RECONNECT_INTERVAL,
+        near_cache_size: int = REDIS_NEAR_CACHE_SIZE,
+    ) -> None:
+        self.health_check_interval = health_check_interval
+        self.reconnect_interval = reconnect_interval
+        self.__near_cache: NearCache | None = None
+        self.__pool = BlockingConnectionPool(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            max_connections=max_connections,
+            timeout=pool_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=connect_timeout,
+            socket_keepalive=True,
+            retry=Retry(
+                EqualJitterBackoff(REDIS_BACKOFF_CAP, REDIS_BACKOFF_BASE), retries
+            ),
+            health_check_interval=health_check_interval,
+            redis_connect_func=self._on_connect if near_cache_size > 0 else None,
+        )
+        if near_cache_size > 0:
+            self.__near_cache = NearCache(
+                self.__pool.connection_kwargs,
+                near_cache_size,
+                on_listen=self.__pool.disconnect,
+            )
+        self.__redis = Redis(connection_pool=self.__pool)
+        self.__compare_and_set = self.__redis.register_script(COMPARE_AND_SET)
+        self.__move_member = self.__redis.register_script(MOVE_MEMBER)
+        self.__push_many = self.__redis.register_script(PUSH_MANY)
+        self.__pop_many = self.__redis.register_script(POP_MANY)
+        self.__up = False
+        self.__checked = 0.0
+        self.__probe = threading.Lock()
+        self.ping()
+
+    def ping(self) -> bool:
+        """Check now if the server is reachable and record the result"""
+        try:
+            up = bool(self.__redis.ping())
+        except RedisError:
+            up = False
+        self.__up = up
+        self.__checked = time.monotonic()
+        return up
 
-    def __init__(self, host: str = "localhost", port: int = 6379) -> None:
-        self.__redis = Redis(host=host, port=port)
+    def connected(self) -> bool:
+        """Checks if the redis database is active and connected to.
 
+        The server is pinged again once the last check is older than the
+        health check interval, or the reconnect interval while it is down.
+        A single thread pings at a time, the others get the last result.
+        """
+        interval = (
+            self.health_check_interval if self.__up else self.reconnect_interval
+        )
+        if time.monotonic() - self.__checked >= interval:
+            if self.__probe.acquire(blocking=False):
+                try:
+                    self.ping()
+                finally:
+                    self.__probe.release()
+        return self.__up
+
+    @property
+    def near_cache(self) -> NearCache | None:
+        """The near cache of `get`, `None` when disabled"""
+        return self.__near_cache
+
+    def _on_connect(self, connection) -> None:
+        """Redirect the invalidations of a new connection to the near cache"""
+        connection.on_connect()
+        client_id = self.__near_cache.client_id
+        if client_id is None:
+            return
         try:
-            if not self.__redis.ping():
-                self.__redis = None
-        except ConnectionError:
-            self.__redis = None
+            connection.send_command(
+                "CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "OPTIN"
+            )
+            connection.read_response()
+        except ResponseError:
+            # The listener reconnected meanwhile, or the server is older
+            # than Redis 6: reads on this connection are not cached.
+            pass
+
+    def _mark_down(self) -> None:
+        """Record that the server is unreachable, commands then fail fast"""
+        self.__up = False
+        self.__checked = time.monotonic()
+
+    def close(self) -> None:
+        """Close the connections of the pool"""
+        self.__pool.disconnect()
+
+    @_connected
+    def set(self, key: str, obj: dict, ttl: float | None = None):
+        """Sets a new item in the hash cache, expiring after `ttl` seconds"""
+        if ttl is None:
+            self.__redis.json().set(key, "$", obj=obj)
+            return
+
+        pipe = self.__redis.pipeline()
+        pipe.json().set(key, "$", obj=obj)
+        pipe.pexpire(key, int(ttl * 1000))
+        pipe.execute()
+
+    @_connected
+    def expire(self, key: str, ttl: float, *sets: str) -> bool:
+        """Make an item expire in `ttl` seconds, along with the named sets.
+
+        Returns:
+            Whether the item is present.
+        """
+        pipe = self.__redis.pipeline(transaction=False)
+        for name in (key, *[f"{key}:{name}" for name in sets]):
+            pipe.pexpire(name, int(ttl * 1000))
+        return bool(pipe.execute()[0])
 
-    def connected(self) -> bool:
-        """Checks if the redis database is active and connected to"""
-        return self.__redis is not None
+    @_connected
+    def ttl(self, key: str) -> float | None:
+        """Seconds left before an item expires, `None` if it never does.
 
-    def set(self, key: str, obj: dict):
-        """Sets a new item in the hash cache"""
-        if self.__redis is None:
-            raise RedisError("Redis not initialized")
+        Raises:
+            KeyError: if the key is not present.
+        """
+        ttl = self.__redis.pttl(key)
+        if ttl == -2:
+            raise KeyError(f"Key {key} is not present")
+        return None if ttl == -1 else ttl / 1000
+
+    @_connected
+    def memory_usage(self, key: str) -> int:
+        """Bytes used by an item and its overhead, 0 if it is not present"""
+        return self.__redis.memory_usage(key, samples=0) or 0
 
-        self.__redis.json().set(key, "$", obj=obj)
+    @_connected
+    def info(self, section: str | None = None) -> dict:
+        """Server statistics, e.g. of the `memory` or `keyspace` section"""
+        return self.__redis.info(section)
 
+    @_connected
     def get(self, key: str, field: str | None = None) -> list:
         """Retrives an item in the cache"""
-        if self.__redis is None:
-            raise RedisError("Redis not initialized")
-
-        obj = self.__redis.json().get(key, f'${"" if field is None else f".{field}"}')
+        path = f'${"" if field is None else f".{field}"}'
+        near_cache = self.__near_cache
+        if near_cache is None or not near_cache.listening():
+            obj = self.__redis.json().get(key, path)
+        else:
+            cached, obj, generation = near_cache.lookup(key, field)
+            if cached:
+                return obj
+            # Only the reads following CLIENT CACHING YES are tracked.
+            pipe = self.__redis.pipeline(transaction=False)
+            pipe.execute_command("CLIENT", "CACHING", "YES")
+            pipe.json().get(key, path)
+            tracked, obj = pipe.execute(raise_on_error=False)
+            if isinstance(obj, Exception):
+                raise obj
+            if obj is not None and not isinstance(tracked, Exception):
+                near_cache.store(key, field, obj, generation)
 
         if obj is None:
             raise KeyError(f"Key {key} is not present")
 
         return obj
 
-    def delete(self, key: str) -> None:
-        """Delete an item from the cache"""
-        if self.__redis is None:
-            raise RedisError("Redis not initialized")
-
-        self.__redis.json().delete(key, '$')
-
-    def append(self, key: str, field: str, max_len: int = 5, *val):
-        """Append a value to an array field in the cache.
-
-        The field must a field present in the json object
+    @_connected
+    def snapshot(
+        self, key: str, *fields: str, sets: tuple = (), buffers: tuple = ()
+    ) -> tuple[dict, bytes]:
+        """Retrives several fields of an object in a single round trip.
 
         Params:
             key: the object key in the cache
-            field: the name of the field to append
-            max_len: the maximum amount of items the field can contain.
-                     Default is 5.
-            val: variadic values to append. The values must not exceed the
-                    maximum length of item allowed.
+            fields: names of the fields to read
+            sets: names of sets of the object to read along, see `members`
+            buffers: names of bounded buffers of the object to read along,
+                oldest value first, see `push_many`
+        Returns:
+            A dict of the value of each field, in the same form `get`
+            returns it, of the members of each set and of the values of
+            each buffer, and a token to pass to `compare_and_set`.
         Raises:
-            ValueError: if the values exceed the maximum allowed limit.
+            KeyError: if the key is not present.
             RedisError: if redis database is not correctly initialized.
         """
-        if self.__redis is None:
-            raise RedisError('Redis not initialized')
-
-        cur_len = self.__redis.json().arrlen(key, f'$.{field}')[0]
-
-        if not cur_len:
-            cur_len = 0
-
-        if len(val) > max_len:
-            raise ValueError(
-                'length of values to append should not exceed the maximum allowed'
-            )
-
-        if cur_len + len(val) > max_len:
-            self.__redis.json().arrtrim(key, f'$.{field}', 0, max_len - len(val))
-
-        self.__redis.json().arrappend(key, f'$.{field}', *val)
+        paths = [f"$.{field}" for field in fields]
+        pipe = self.__redis.pipeline(transaction=False)
+        pipe.execute_command("JSON.GET", key, *paths)
+        for name in sets:
+            pipe.smembers(f"{key}:{name}")
+        for name in buffers:
+            pipe.lrange(f"{key}:{name}", 0, -1)
+        token, *members = pipe.execute()
+
+        if token is None:
+            raise KeyError(f"Key {key} is not present")
 
-    def remove(self, key: str, field: str, _id: str):
-        """Remove an item from an object field.
+        values = json.loads(token)
+        if len(paths) == 1:
+            values = {fields[0]: values}
+        else:
+            values = {field: values[path] for field, path in zip(fields, paths)}
+        for name, items in zip(sets, members):
+            values[name] = {item.decode() for item in items}
+        for name, items in zip(buffers, members[len(sets) :]):
+            values[name] = [json.loads(item) for item in items]
+        return values, token
+
+    @_connected
+    def compare_and_set(
+        self, key: str, obj: dict, token: bytes, *fields: str
+    ) -> bool:
+        """Replace an object if its fields did not change since a snapshot.
+
+        The comparison and the write happen atomically on the server, in a
+        single round trip.
 
-        The field must a field present in the json object
+        Params:
+            key: the object key in the cache
+            obj: the new object
+            token: the token returned by `snapshot`
+            fields: the fields that were passed to `snapshot`
+        Returns:
+            Whether the object was replaced.
+        Raises:
+            RedisError: if redis database is not correctly initialized.
         """
-        if self.__redis is None:
-            raise RedisError("Redis not initialized")
-        self.__redis.json().delete(key, f"$.{field}.{_id}")
-
-    def append(self, key: str, field: str, max_len: int = 5, *val):
-        """Append a value to an array field in the cache.
-        The field must a field present in the json object
+        paths = [f"$.{field}" for field in fields]
+        return bool(
+            self.__compare_and_set(keys=[key], args=[token, json.dumps(obj), *paths])
+        )
+
+    @_connected
+    def move_member(
+        self,
+        key: str,
+        src: str,
+        dst: str,
+        member: str,
+        ttl: float | None = None,
+        linked: tuple = (),
+    ) -> None:
+        """Atomically move a member between two sets of an object.
+
+        The sets are stored next to the object, under `<key>:<name>`. The
+        member is removed from `src` if present and added to `dst`, in a
+        single round trip.
 
         Params:
             key: the object key in the cache
-            field: the name of the field to append
-            max_len: the maximum amount of items the field can contain.
-            Default is 5.
-            val: variadic values to append. The values must not exceed the
-            maximum length of item allowed.
+            src: name of the set to remove the member from
+            dst: name of the set to add the member to
+            member: the member to move
+            ttl: seconds the object and its `linked` sets and buffers are
+                kept from now, pushed back in the same round trip
+            linked: names of the other sets and buffers of the object
         Raises:
-            ValueError: if the values exceed the maximum allowed limit.
+            KeyError: if the object is not present.
             RedisError: if redis database is not correctly initialized.
         """
-        if self.__redis is None:
-            raise RedisError("Redis not initialized")
-
-        cur_len = self.__redis.json().arrlen(key, f"$.{field}")[0]
-
-        if not cur_len:
-            cur_len = 0
+        keys = [key, *[f"{key}:{name}" for name in (src, dst, *linked)]]
+        moved = self.__move_member(
+            keys=keys, args=[member, int(ttl * 1000) if ttl else 0]
+        )
+        if not moved:
+            raise KeyError(f"Key {key} is not present")
 
-        if len(val) > max_len:
-            raise ValueError(
-                "length of values to append should not exceed the maximum allowed"
-            )
+    @_connected
+    def members(self, key: str, name: str) -> set:
+        """Retrives the members of a set of an object"""
+        return {item.decode() for item in self.__redis.smembers(f"{key}:{name}")}
 
-        if cur_len + len(val) > max_len:
-            self.__redis.json().arrtrim(key, f"$.{field}", 0, max_len - len(val))
+    @_connected
+    def is_member(self, key: str, name: str, member: str) -> bool:
+        """Check if a member is present in a set of an object"""
+        return bool(self.__redis.sismember(f"{key}:{name}", member))
 
-        self.__redis.json().arrappend(key, f"$.{field}", *val)
+    @_connected
+    def push_many(self, key: str, name: str, values: list, max_len: int) -> int:
+        """Append values to a bounded buffer of an object.
 
-    def insert(self, key: str, field: str, _id: str):
-        """Insert a value to a object field in the cache.
+        The buffer is a list stored next to the object, under
+        `<key>:<name>`, of at most `max_len` values: the values that do not
+        fit are dropped, the queued ones are kept. Appending happens
+        atomically, in a single round trip.
 
-        The field must a field present in the json object
+        Params:
+            key: the object key in the cache
+            name: name of the buffer
+            values: JSON serializable values to append, oldest first
+            max_len: the maximum amount of values the buffer keeps
+        Returns:
+            The amount of values in the buffer.
+        Raises:
+            KeyError: if the object is not present.
+            RedisError: if redis database is not correctly initialized.
         """
-        if self.__redis is None:
-            raise RedisError("Redis not initialized")
-
-        self.get(key, field)
+        if not values:
+            return self.length(key, name)
+        length = self.__push_many(
+            keys=[key, f"{key}:{name}"],
+            args=[max_len, *[json.dumps(value) for value in values]],
+        )
+        if length < 0:
+            raise KeyError(f"Key {key} is not present")
+        return length
 
-        self.__redis.json().set(key, f"$.{field}", {_id: 1})
+    @_connected
+    def pop_many(
+        self, key: str, name: str, n: int, ttl: float | None = None, linked: tuple = ()
+    ) -> list:
+        """Remove and return the `n` oldest values of a bounded buffer.
 
-    def exist(self, key: str, field: str, _id: str) -> bool:
-        """Check if an item is present in a field with id."""
-        if self.__redis is None:
-            raise RedisError("Redis not initialized")
-        return len(self.__redis.json().get(key, f"$.{field}.{_id}")) != 0
+        Params:
+            key: the object key in the cache
+            name: name of the buffer
+            n: the amount of values to pop
+            ttl: seconds the object and its `linked` sets and buffers are
+                kept from now, pushed back in the same round trip
+            linked: names of the other sets and buffers of the object
+        Returns:
+            The values, oldest first, fewer than `n` if the buffer runs out.
+        Raises:
+            KeyError: if the object is not present.
+            RedisError: if redis database is not correctly initialized.
+        """
+        if n <= 0:
+            return []
+        keys = [key, *[f"{key}:{other}" for other in (name, *linked)]]
+        values = self.__pop_many(keys=keys, args=[n, int(ttl * 1000) if ttl else 0])
+        if values is None:
+            raise KeyError(f"Key {key} is not present")
+        return [json.loads(value) for value in values]
+
+    @_connected
+    def length(self, key: str, name: str) -> int:
+        """Amount of values in a bounded buffer of an object"""
+        return self.__redis.llen(f"{key}:{name}")
+
+    @_connected
+    def set_value(self, key: str, value: str, ttl: float | None = None) -> None:
+        """Sets a plain string value, expiring after `ttl` seconds"""
+        self.__redis.set(key, value, px=None if ttl is None else int(ttl * 1000))
+
+    @_connected
+    def get_value(self, key: str) -> str | None:
+        """Retrives a plain string value, `None` if it is not present"""
+        value = self.__redis.get(key)
+        return None if value is None else value.decode()
+
+    @_connected
+    def scan(self, match: str = "*", _type: str | None = None):
+        """Iterates over the keys of the cache matching a pattern and type"""
+        for key in self.__redis.scan_iter(match=match, _type=_type):
+            yield key.decode()
+
+    @_connected
+    def delete(self, key: str, *sets: str) -> None:
+        """Delete an item from the cache, along with the named sets"""
+        self.__redis.delete(key, *[f"{key}:{name}" for name in sets])
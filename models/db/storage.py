@@ -0,0 +1,248 @@
+"""Storage backends of the silos.
+
+Every backend implements the `Storage` interface:
+
+    RedisDB:    Redis with the RedisJSON module, shared by every worker.
+    MemoryDB:   a bounded LRU in the memory of the process, for single node
+                deployments and benchmarks.
+    FailoverDB: a primary backend, falling back to another one while the
+                primary is unreachable.
+
+Objects are JSON documents. Each object may have named sets and bounded
+buffers next to it, e.g. the likes of a session or its stream of jokes,
+which expire and are deleted with it when their names are given.
+"""
+
+from abc import ABC, abstractmethod
+
+from redis.exceptions import ConnectionError, TimeoutError
+
+
+class Storage(ABC):
+    """Interface of a silo storage backend."""
+
+    @abstractmethod
+    def connected(self) -> bool:
+        """Checks if the storage is reachable"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, obj: dict, ttl: float | None = None):
+        """Sets a new object, expiring after `ttl` seconds"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, key: str, field: str | None = None) -> list:
+        """Retrives an object, or one of its fields.
+
+        Returns:
+            A list holding the object or the field, empty when the object
+            has no such field.
+        Raises:
+            KeyError: if the key is not present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def snapshot(
+        self, key: str, *fields: str, sets: tuple = (), buffers: tuple = ()
+    ) -> tuple:
+        """Retrives several fields, sets and buffers of an object at once.
+
+        Returns:
+            A dict of the value of each field, in the same form `get`
+            returns it, of the members of each set and of the values of
+            each buffer, oldest first, and a token to pass to
+            `compare_and_set`.
+        Raises:
+            KeyError: if the key is not present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def compare_and_set(self, key: str, obj: dict, token, *fields: str) -> bool:
+        """Replace an object if its fields did not change since a snapshot.
+
+        The expiry of the object is kept.
+
+        Returns:
+            Whether the object was replaced.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def move_member(
+        self,
+        key: str,
+        src: str,
+        dst: str,
+        member: str,
+        ttl: float | None = None,
+        linked: tuple = (),
+    ) -> None:
+        """Atomically move a member between two sets of an object.
+
+        Given a `ttl`, the object and its `linked` sets and buffers expire
+        in `ttl` seconds, in the same operation.
+
+        Raises:
+            KeyError: if the object is not present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def members(self, key: str, name: str) -> set:
+        """Retrives the members of a set of an object"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_member(self, key: str, name: str, member: str) -> bool:
+        """Check if a member is present in a set of an object"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def expire(self, key: str, ttl: float, *sets: str) -> bool:
+        """Make an object expire in `ttl` seconds, with the named sets and buffers.
+
+        Returns:
+            Whether the object is present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def push_many(self, key: str, name: str, values: list, max_len: int) -> int:
+        """Atomically append values to a bounded buffer of an object.
+
+        The buffer never holds more than `max_len` values: the values that
+        do not fit are dropped, the queued ones are kept.
+
+        Returns:
+            The amount of values in the buffer.
+        Raises:
+            KeyError: if the object is not present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def pop_many(
+        self, key: str, name: str, n: int, ttl: float | None = None, linked: tuple = ()
+    ) -> list:
+        """Atomically remove and return the `n` oldest values of a buffer.
+
+        Given a `ttl`, the object and its `linked` sets and buffers expire
+        in `ttl` seconds, in the same operation.
+
+        Raises:
+            KeyError: if the object is not present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def length(self, key: str, name: str) -> int:
+        """Amount of values in a bounded buffer of an object"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def ttl(self, key: str) -> float | None:
+        """Seconds left before an object expires, `None` if it never does.
+
+        Raises:
+            KeyError: if the key is not present.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def scan(self, match: str = "*", _type: str | None = None):
+        """Iterates over the keys matching a pattern, `ReJSON-RL` for objects"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str, *sets: str) -> None:
+        """Delete an object, along with the named sets and buffers"""
+        raise NotImplementedError
+
+
+class FailoverDB(Storage):
+    """Storage using a primary backend, and a fallback while it is down.
+
+    Objects written to the fallback are not copied back to the primary once
+    it recovers: a session whose silo was created during an outage gets a
+    new silo afterwards.
+    """
+
+    def __init__(self, primary: Storage, fallback: Storage) -> None:
+        self.primary = primary
+        self.fallback = fallback
+
+    def _call(self, method: str, *args, **kwargs):
+        """Call a method of the primary, or of the fallback if it is down"""
+        if self.primary.connected():
+            try:
+                return getattr(self.primary, method)(*args, **kwargs)
+            except (ConnectionError, TimeoutError):
+                pass
+        return getattr(self.fallback, method)(*args, **kwargs)
+
+    def connected(self) -> bool:
+        return self.primary.connected() or self.fallback.connected()
+
+    def set(self, key: str, obj: dict, ttl: float | None = None):
+        return self._call("set", key, obj, ttl)
+
+    def get(self, key: str, field: str | None = None) -> list:
+        return self._call("get", key, field)
+
+    def snapshot(
+        self, key: str, *fields: str, sets: tuple = (), buffers: tuple = ()
+    ) -> tuple:
+        return self._call("snapshot", key, *fields, sets=sets, buffers=buffers)
+
+    def compare_and_set(self, key: str, obj: dict, token, *fields: str) -> bool:
+        return self._call("compare_and_set", key, obj, token, *fields)
+
+    def move_member(
+        self,
+        key: str,
+        src: str,
+        dst: str,
+        member: str,
+        ttl: float | None = None,
+        linked: tuple = (),
+    ) -> None:
+        return self._call("move_member", key, src, dst, member, ttl, linked)
+
+    def members(self, key: str, name: str) -> set:
+        return self._call("members", key, name)
+
+    def is_member(self, key: str, name: str, member: str) -> bool:
+        return self._call("is_member", key, name, member)
+
+    def expire(self, key: str, ttl: float, *sets: str) -> bool:
+        return self._call("expire", key, ttl, *sets)
+
+    def push_many(self, key: str, name: str, values: list, max_len: int) -> int:
+        return self._call("push_many", key, name, values, max_len)
+
+    def pop_many(
+        self, key: str, name: str, n: int, ttl: float | None = None, linked: tuple = ()
+    ) -> list:
+        return self._call("pop_many", key, name, n, ttl, linked)
+
+    def length(self, key: str, name: str) -> int:
+        return self._call("length", key, name)
+
+    def ttl(self, key: str) -> float | None:
+        return self._call("ttl", key)
+
+    def scan(self, match: str = "*", _type: str | None = None):
+        # A generator, so errors of the primary are raised while iterating.
+        if self.primary.connected():
+            try:
+                yield from self.primary.scan(match, _type)
+                return
+            except (ConnectionError, TimeoutError):
+                pass
+        yield from self.fallback.scan(match, _type)
+
+    def delete(self, key: str, *sets: str) -> None:
+        return self._call("delete", key, *sets)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Memory and keyspace metrics of the silos, for capacity planning.
+
+Usage:
+    python -m models.metrics [sample]
+
+Every key is scanned to count the silos, so it is meant to be run from time
+to time rather than on the request path. Memory is measured on a sample of
+`sample` silos, 100 by default, and extrapolated to all of them.
+
+The counters of a serving process, e.g. of its Mongo connection pool, are
+read with `process_metrics`, served by `/api/v1/metrics`.
+"""
+
+import json
+import sys
+
+from . import REDIS
+from .db.mongo_engine import pool_metrics
+from .db.redis import REDIS_DB
+from .silo import LINKED
+
+
+def silo_metrics(sample: int = 100) -> dict:
+    """Measure the silos in the cache.
+
+    Args:
+        sample: amount of silos whose memory and expiry are measured.
+    Returns:
+        silos:          amount of silos.
+        sampled:        amount of silos measured.
+        bytes_per_silo: mean bytes of a measured silo, with its sets and jokes.
+        silo_bytes:     estimated bytes of all the silos.
+        mean_ttl:       mean seconds left of the measured silos that expire.
+        without_ttl:    measured silos that never expire.
+        used_memory:    bytes used by the server.
+        maxmemory:      memory limit of the server, 0 when unlimited.
+        keys:           keys of the database.
+        expires:        keys of the database that expire.
+    """
+    silos = 0
+    measured = []
+    for key in REDIS.scan(_type="ReJSON-RL"):
+        silos += 1
+        if len(measured) >= sample:
+            continue
+        try:
+            ttl = REDIS.ttl(key)
+        except KeyError:
+            # Expired while scanning.
+            continue
+        size = sum(
+            REDIS.memory_usage(name)
+            for name in (key, *[f"{key}:{name}" for name in LINKED])
+        )
+        measured.append((size, ttl))
+
+    sizes = [size for size, _ in measured]
+    ttls = [ttl for _, ttl in measured if ttl is not None]
+    bytes_per_silo = sum(sizes) / len(sizes) if sizes else 0
+    memory = REDIS.info("memory")
+    keyspace = REDIS.info("keyspace").get(f"db{REDIS_DB}", {})
+    return {
+        "silos": silos,
+        "sampled": len(measured),
+        "bytes_per_silo": bytes_per_silo,
+        "silo_bytes": int(bytes_per_silo * silos),
+        "mean_ttl": sum(ttls) / len(ttls) if ttls else None,
+        "without_ttl": len(measured) - len(ttls),
+        "used_memory": memory.get("used_memory", 0),
+        "maxmemory": memory.get("maxmemory", 0),
+        "keys": keyspace.get("keys", 0),
+        "expires": keyspace.get("expires", 0),
+    }
+
+
+def process_metrics() -> dict:
+    """Counters of the current process.
+
+    Returns:
+        mongo_pool: the connection pool events, see `PoolMetrics.stats`.
+    """
+    return {"mongo_pool": pool_metrics.stats()}
+
+
+if __name__ == "__main__":
+    sample = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print(json.dumps(silo_metrics(sample), indent=2))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Convert the silos storing their jokes in the silo document.
+
+Usage:
+    python -m models.migrate
+
+The jokes, as ids or texts, are moved to the bounded buffer of the silo as
+ids, see `Silo.migrate_silo`. Silos are migrated one at a time and
+atomically, so it can run while the API is serving. Silos already using a
+buffer are left untouched, silos of the former format that are not
+migrated here are migrated when they are first served. Silos
+created before they expired are given an expiry of `SILO_IDLE_TTL`.
+"""
+
+from . import STORAGE
+from .silo import SILO_IDLE_TTL, Silo
+
+
+def migrate_silos() -> tuple[int, int]:
+    """Migrate every silo in the cache.
+
+    Returns:
+        The amount of silos scanned and of silos migrated.
+    """
+    scanned = migrated = 0
+    for key in STORAGE.scan(_type="ReJSON-RL"):
+        scanned += 1
+        try:
+            migrated += Silo.migrate_silo(key)
+        except KeyError:
+            # Destroyed while scanning.
+            pass
+    return scanned, migrated
+
+
+def expire_silos() -> int:
+    """Make every silo that never expires expire after being idle.
+
+    Returns:
+        The amount of silos given an expiry.
+    """
+    if SILO_IDLE_TTL <= 0:
+        return 0
+    expired = 0
+    for key in STORAGE.scan(_type="ReJSON-RL"):
+        try:
+            if STORAGE.ttl(key) is None:
+                expired += Silo.touch_silo(key)
+        except KeyError:
+            # Destroyed while scanning.
+            pass
+    return expired
+
+
+if __name__ == "__main__":
+    scanned, migrated = migrate_silos()
+    print(f"migrated {migrated} of {scanned} silos")
+    print(f"set the expiry of {expire_silos()} silos")
@@ -0,0 +1,83 @@
+"""Background refill of the joke silos."""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class RefillWorker:
+    """Thread pool running silo refills off the request path.
+
+    A session has at most one refill queued or running. Submitting a
+    session that is already queued is a no-op. Submitting it while its
+    refill runs queues a single follow-up run once it is done, so changes
+    made meanwhile are not missed and two refills of a session never
+    compute the same missing jokes concurrently.
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 1024) -> None:
+        """Create a worker.
+
+        Args:
+            workers:     amount of threads running refills.
+            max_pending: amount of sessions allowed to be queued or
+                         running, new submissions are dropped beyond it.
+        """
+        self.max_pending = max_pending
+        self.__executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="silo-refill"
+        )
+        self.__queued: set = set()
+        # Running sessions, with the follow-up refill and its arguments
+        # submitted meanwhile, or None.
+        self.__running: dict = {}
+        self.__lock = threading.Lock()
+
+    def pending(self) -> int:
+        """Amount of sessions queued or being refilled."""
+        with self.__lock:
+            return len(self.__queued) + len(self.__running)
+
+    def submit(self, session_id: str, refill, *args) -> bool:
+        """Queue `refill(session_id, *args)`.
+
+        Returns:
+            Whether it was queued, False if the session is already queued,
+            its refill is running and a follow-up run was recorded instead,
+            or the queue is full.
+        """
+        with self.__lock:
+            if session_id in self.__queued:
+                return False
+            if session_id in self.__running:
+                self.__running[session_id] = (refill, args)
+                return False
+            if len(self.__queued) + len(self.__running) >= self.max_pending:
+                return False
+            self.__queued.add(session_id)
+        self.__executor.submit(self._run, session_id, refill, *args)
+        return True
+
+    def _run(self, session_id: str, refill, *args) -> None:
+        """Run the refills of a session, logging instead of raising errors."""
+        with self.__lock:
+            self.__queued.discard(session_id)
+            self.__running[session_id] = None
+        while True:
+            try:
+                refill(session_id, *args)
+            except Exception:
+                logger.exception("refill of silo %s failed", session_id)
+            with self.__lock:
+                follow_up = self.__running[session_id]
+                if follow_up is None:
+                    del self.__running[session_id]
+                    return
+                self.__running[session_id] = None
+            refill, args = follow_up
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting refills, waiting for the queued ones if `wait`."""
+        self.__executor.shutdown(wait=wait)
@@ -1,44 +1,163 @@
 """Joke silo for each user."""
 
-from . import REDIS
+import heapq
+import os
+import random
+import time
+
+from . import STORAGE
+from .refill import RefillWorker
+from .starter_pool import StarterPool
 from utils.generate_content import (
+    filter_known_ids,
+    generate_id_from_text,
     generate_random,
-    generate_dynamic,
+    generate_personalized,
     generate_text_from_id,
-    DotProduct,
 )
 
+REFILL_ATTEMPTS: int = 3
+PREFERENCES: tuple = ("includes", "excludes")
+# Bounded buffer of the ids of the jokes queued for a session.
+STREAM: str = "jokes"
+STREAM_SIZE: int = 20
+# Everything stored next to a silo, expiring and deleted with it.
+LINKED: tuple = PREFERENCES + (STREAM,)
+REFILL_WORKERS: int = int(os.getenv("REFILL_WORKERS", "2"))
+# Best ranked jokes a refill draws its personalized jokes from, favouring
+# the best, so a session that stops rating is not served the same jokes
+# over again. Within the neighbour table by default.
+REFILL_CANDIDATES: int = int(os.getenv("REFILL_CANDIDATES", "50"))
+# Starter silos generated ahead of the logins, 0 generates them at login.
+STARTER_POOL_SIZE: int = int(os.getenv("STARTER_POOL_SIZE", "64"))
+# Seconds a silo is kept without being used, never past its token's expiry.
+# 0 keeps it until the token expires.
+SILO_IDLE_TTL: int = int(os.getenv("SILO_IDLE_TTL", "3600"))
+
 
 class Silo:
     """Silo class.
 
+    A silo queues the ids of the jokes of a session in a bounded buffer,
+    `<session_id>:jokes`, of at most `STREAM_SIZE` ids. Serving jokes pops
+    the oldest ids and resolves their texts from the catalog, refilling
+    pushes new ids. Silos written before the buffer held their jokes, as
+    ids or texts, in the silo document itself, which is kept empty
+    otherwise. They are converted by `migrate_silo` when first served.
+
+    The jokes a session liked and disliked are kept in two sets next to the
+    silo, `<session_id>:includes` and `<session_id>:excludes`.
+
+    Silos are kept in the storage backend picked by `SILO_STORAGE`, see
+    `models.db.storage`.
+
+    A silo, its buffer and its sets expire when the session's token does, or earlier
+    once the session was not used for `SILO_IDLE_TTL` seconds. Serving a
+    request touches the silo: liking, disliking and serving jokes push the
+    idle expiry back in their own round trip, and create again a silo
+    dropped for being idle. `touch_silo` does so on its own.
+
     Methods:
-        create_silo(session_id: str) -> None:
+        create_silo(session_id: str, expires_at: float | None = None) -> None:
+        fill_starters() -> int:
+        touch_silo(session_id: str, expires_at: float | None = None) -> bool:
         repopulate_silo(session_id: str) -> None:
-        include_joke(session_id: str, joke_id: str) -> None:
-        exclude_joke(session_id: str, joke_id: str) -> None:
-        get_jokes(session_id: str, count: int = 5) -> list:
+        include_joke(session_id: str, joke_id: str, touch: bool = False,
+            expires_at: float | None = None) -> None:
+        exclude_joke(session_id: str, joke_id: str, touch: bool = False,
+            expires_at: float | None = None) -> None:
+        get_jokes(session_id: str, count: int = 5, touch: bool = False,
+            expires_at: float | None = None) -> list:
+        get_joke_ids(session_id: str, count: int = 5, touch: bool = False,
+            expires_at: float | None = None) -> list:
+        migrate_silo(session_id: str) -> bool:
+        schedule_refill(session_id: str) -> bool:
     """
 
-    __silo = REDIS
+    __silo = STORAGE
+    __refiller = RefillWorker(REFILL_WORKERS)
+    __starters = StarterPool(lambda: generate_random(STREAM_SIZE), STARTER_POOL_SIZE)
+
+    @staticmethod
+    def _ttl(expires_at: float | None) -> float | None:
+        """Seconds a silo is kept from now.
+
+        Args:
+            expires_at: POSIX timestamp the session's token expires at
+        Returns:
+            The seconds until the token expires, capped by `SILO_IDLE_TTL`,
+            or `None` to keep the silo forever.
+        """
+        idle = SILO_IDLE_TTL if SILO_IDLE_TTL > 0 else None
+        if expires_at is None:
+            return idle
+        # A silo outliving its token by a moment is harmless, a zero or
+        # negative expiry is not accepted by Redis.
+        left = max(expires_at - time.time(), 1)
+        return left if idle is None else min(left, idle)
 
     @classmethod
-    def create_silo(cls, session_id: str) -> None:
+    def create_silo(cls, session_id: str, expires_at: float | None = None) -> None:
         """Create a new silo from a user's session.
 
         The joke field is to be populated with the user's preferences present
         in the user's database. If the field is empty, the joke field is
-        populated with randomly generated jokes.
+        populated with randomly generated jokes, taken from the pool of
+        starter silos.
 
         Args:
             session_id: ID generated for the user's session
+            expires_at: POSIX timestamp the session's token expires at
         """
-        jokes = generate_text_from_id(generate_random(5))
+        jokes = cls.__starters.pop()
 
-        cls.__silo.set(
-            session_id, {"jokes": jokes,
-                         "includes": {}, "excludes": {}}
-        )
+        cls.__silo.set(session_id, {}, cls._ttl(expires_at))
+        cls.__silo.push_many(session_id, STREAM, jokes, STREAM_SIZE)
+
+    @classmethod
+    def fill_starters(cls) -> int:
+        """Generate the pool of starter silos now, before the first logins.
+
+        Returns:
+            The amount of starter silos generated.
+        """
+        return cls.__starters.fill()
+
+    @classmethod
+    def touch_silo(cls, session_id: str, expires_at: float | None = None) -> bool:
+        """Push back the expiry of a silo that is being used.
+
+        Args:
+            session_id: ID generated for the user's session
+            expires_at: POSIX timestamp the session's token expires at
+        Returns:
+            Whether the silo exists, False once it expired.
+        """
+        ttl = cls._ttl(expires_at)
+        if ttl is None:
+            try:
+                cls.__silo.ttl(session_id)
+            except KeyError:
+                return False
+            return True
+        return cls.__silo.expire(session_id, ttl, *LINKED)
+
+    @classmethod
+    def _use(cls, session_id: str, touch: bool, expires_at, operation, *args):
+        """Run a storage operation on a silo, touching it if `touch`.
+
+        A touching operation pushes back the expiry of the silo itself, and
+        a silo that expired is created again first, as the middleware did
+        with `touch_silo`, but without a round trip of its own.
+        """
+        if not touch:
+            return operation(session_id, *args)
+        ttl = cls._ttl(expires_at)
+        try:
+            return operation(session_id, *args, ttl=ttl, linked=LINKED)
+        except KeyError:
+            cls.create_silo(session_id, expires_at)
+        return operation(session_id, *args, ttl=ttl, linked=LINKED)
 
     @classmethod
     def destroy_silo(cls, session_id: str) -> None:
@@ -47,90 +166,248 @@ class Silo:
         Args:
             session_id: ID generated for the user's session
         """
-        cls.__silo.delete(session_id)
+        cls.__silo.delete(session_id, *LINKED)
 
     @classmethod
-    def include_joke(cls, session_id: str, joke_id: str) -> None:
+    def include_joke(
+        cls,
+        session_id: str,
+        joke_id: str,
+        touch: bool = False,
+        expires_at: float | None = None,
+    ) -> None:
         """Include a joke to a user's silo.
 
+        A previous dislike of the joke is dropped in the same operation.
+
         Args:
             session_id: ID generated for the session
             joke_id:    ID of the joke to include
+            touch:      Push back the expiry of the silo, see `touch_silo`
+            expires_at: POSIX timestamp the session's token expires at
+        Raises:
+            KeyError: if the silo is missing and not touched.
         """
-        if cls.__silo.exist(session_id, "excludes", joke_id):
-            cls.__silo.remove(session_id, "excludes", joke_id)
-        cls.__silo.insert(session_id, "includes", joke_id)
+        cls._use(
+            session_id,
+            touch,
+            expires_at,
+            cls.__silo.move_member,
+            "excludes",
+            "includes",
+            joke_id,
+        )
 
     @classmethod
-    def exclude_joke(cls, session_id: str, joke_id: str) -> None:
+    def exclude_joke(
+        cls,
+        session_id: str,
+        joke_id: str,
+        touch: bool = False,
+        expires_at: float | None = None,
+    ) -> None:
         """Exclude a joke from a user's silo.
 
+        A previous like of the joke is dropped in the same operation.
+
         Args:
             session_id: ID generated for the session
             joke_id:    ID of the joke to exclude
+            touch:      Push back the expiry of the silo, see `touch_silo`
+            expires_at: POSIX timestamp the session's token expires at
+        Raises:
+            KeyError: if the silo is missing and not touched.
         """
-        if cls.__silo.exist(session_id, "includes", joke_id):
-            cls.__silo.remove(session_id, "includes", joke_id)
-        cls.__silo.insert(session_id, "excludes", joke_id)
+        cls._use(
+            session_id,
+            touch,
+            expires_at,
+            cls.__silo.move_member,
+            "includes",
+            "excludes",
+            joke_id,
+        )
 
     @classmethod
-    def get_jokes(cls, session_id: str, count: int = 5) -> list:
-        """Get the jokes avaliable for a user from the silo.
+    def get_jokes(
+        cls,
+        session_id: str,
+        count: int = 5,
+        touch: bool = False,
+        expires_at: float | None = None,
+    ) -> list:
+        """Serve the next jokes of a user's silo.
+
+        The jokes are taken out of the silo, `schedule_refill` replaces them.
 
         Args:
             session_id: ID generated for the session
             count:      No of results to return
+            touch:      Push back the expiry of the silo, see `touch_silo`
+            expires_at: POSIX timestamp the session's token expires at
         Returns:
             List of jokes present in user's silo
         Raises:
-            KeyError
+            KeyError: if the silo is missing and not touched.
+        """
+        joke_ids = cls.get_joke_ids(session_id, count, touch, expires_at)
+        return generate_text_from_id(joke_ids)
+
+    @classmethod
+    def get_joke_ids(
+        cls,
+        session_id: str,
+        count: int = 5,
+        touch: bool = False,
+        expires_at: float | None = None,
+    ) -> list:
+        """Serve the ids of the next jokes of a user's silo.
+
+        The ids are popped from the silo in a single round trip. A silo of
+        the former format is migrated first. A silo emptied faster than it
+        is refilled is served random jokes.
+
+        Args:
+            session_id: ID generated for the session
+            count:      No of results to return, -1 for all
+            touch:      Push back the expiry of the silo, see `touch_silo`
+            expires_at: POSIX timestamp the session's token expires at
+        Returns:
+            List of joke ids present in user's silo, oldest first
+        Raises:
+            KeyError: if the silo is missing and not touched.
         """
-        jokes = cls.__silo.get(session_id, "jokes")
-        if isinstance(jokes, str):
-            pass
-        elif isinstance(jokes, list):
-            if isinstance(jokes[0], list):
-                jokes = jokes[0]
         if count == -1:
-            return jokes
-        return jokes[:count]
+            count = STREAM_SIZE
+        joke_ids = cls._use(
+            session_id, touch, expires_at, cls.__silo.pop_many, STREAM, count
+        )
+        if joke_ids:
+            return joke_ids
+        if cls.migrate_silo(session_id):
+            joke_ids = cls.__silo.pop_many(session_id, STREAM, count)
+        return joke_ids or generate_random(count)
+
+    @staticmethod
+    def _refill(amount: int, includes: set, excludes: set, queued: list) -> list:
+        """Compute the jokes to add to a silo.
+
+        The personalized jokes are drawn from the `REFILL_CANDIDATES` best
+        ranked ones that are not queued yet, the joke of rank `r` with a
+        weight of `1 / r`, and are queued in their ranking order.
+
+        Args:
+            amount:   the amount of jokes missing from the silo
+            includes: the ids of the jokes the session liked
+            excludes: the ids of the jokes the session disliked
+            queued:   the ids of the jokes left in the silo
+        Returns:
+            `amount` joke ids, the personalized ones first
+        """
+        # Keep two random jokes for the session to discover.
+        personalized = max(amount - 2, 0)
+        include_ids = [int(i) for i in includes if i.isdigit()]
+        exclude_ids = [int(i) for i in excludes if i.isdigit()]
+        queued = set(queued)
+
+        # Fold the session's preferences in to get personalized jokeIds
+        if not include_ids and not exclude_ids:
+            joke_ids = generate_random(personalized, queued)
+        else:
+            candidates = generate_personalized(
+                include_ids, exclude_ids, REFILL_CANDIDATES
+            )
+            candidates = [i for i in candidates if i not in queued]
+            # Weighted draw without replacement, rank r keyed u ** r.
+            picked = heapq.nlargest(
+                personalized,
+                range(len(candidates)),
+                key=lambda i: random.random() ** (i + 1),
+            )
+            joke_ids = [candidates[i] for i in sorted(picked)]
+        # Exclude the exclude_ids from the jokeIds generated.
+        joke_ids = [i for i in joke_ids if i not in exclude_ids]
+        joke_ids = filter_known_ids(joke_ids)
+        # Top up with jokes that are neither picked, rated nor queued.
+        seen = queued.union(joke_ids, include_ids, exclude_ids)
+        joke_ids.extend(generate_random(amount - len(joke_ids), seen))
+        return joke_ids
 
     @classmethod
     def repopulate_jokes(cls, session_id: str) -> None:
         """Repopulate a user's joke silo
 
+        The session's preferences and the jokes left are read in one round
+        trip, and the missing jokes are pushed in another. A silo never
+        holds more than `STREAM_SIZE` jokes: if refills overlap, the jokes
+        of the later one that do not fit are dropped, never the jokes
+        already queued.
+
         Args:
             session_id: ID generated for the user's session
+        Raises:
+            KeyError
         """
-        jokes_in_stream = cls.get_jokes(session_id, -1)
-        excludes = cls.__silo.get(session_id, "excludes")
-        includes = cls.__silo.get(session_id, "includes")
-        # Use excludes and includes to repopulate jokes.
-        jokes_left_over = jokes_in_stream[5:]  # Can change 5: to count:
-        amount_left = len(jokes_left_over)
-        amount_needed_to_bulk_up = 20 - amount_left
-
-        # Use the given id to get personalized jokeIds
-        # if len(list(includes)) == 0:
-        if includes[0] == {}:
-            joke_ids = generate_random(amount_needed_to_bulk_up - 2)
-        else:
-            joke_ids = generate_dynamic(
-                [list(obj.keys())[0] for obj in includes], amount_needed_to_bulk_up - 2
-            )
-        # Exclude the exclude_ids from the jokeIds generated.
-        if excludes[0] != {}:
-            for id in [list(obj.keys())[0] for obj in excludes]:
-                try:
-                    joke_ids.remove(id)
-                except ValueError:
-                    pass
-        jokes_left_over.extend(generate_text_from_id(joke_ids))
-        amount_needed_to_bulk_up = 20 - len(jokes_left_over)
-        addendum = generate_text_from_id(generate_random(amount_needed_to_bulk_up))
-        jokes_left_over.extend(addendum)
-
-        cls.__silo.set(
-            session_id,
-            {"jokes": jokes_left_over, "includes": {}, "excludes": {}},
+        silo, _ = cls.__silo.snapshot(
+            session_id, sets=PREFERENCES, buffers=(STREAM,)
         )
+        queued = silo[STREAM]
+        amount = STREAM_SIZE - len(queued)
+        if amount <= 0:
+            return
+
+        jokes = cls._refill(amount, silo["includes"], silo["excludes"], queued)
+        cls.__silo.push_many(session_id, STREAM, jokes, STREAM_SIZE)
+
+    @classmethod
+    def migrate_silo(cls, session_id: str) -> bool:
+        """Move the jokes stored in a silo document to its buffer.
+
+        Joke texts are replaced by their ids, texts that are not in the
+        catalog anymore are dropped. Likes and dislikes stored in the silo
+        document itself are moved to their sets.
+
+        Args:
+            session_id: ID generated for the user's session
+        Returns:
+            Whether the silo was in the former format and was migrated
+        Raises:
+            KeyError
+        """
+        fields = (STREAM,) + PREFERENCES
+        for _ in range(REFILL_ATTEMPTS):
+            silo, token = cls.__silo.snapshot(session_id, *fields)
+            if not any(silo[field] for field in fields):
+                return False
+            jokes = silo[STREAM][0] if silo[STREAM] else []
+            preferences = {
+                name: list(silo[name][0]) for name in PREFERENCES if silo[name]
+            }
+
+            joke_ids = []
+            for joke in jokes:
+                if isinstance(joke, str):
+                    joke_ids.extend(generate_id_from_text([joke]))
+                else:
+                    joke_ids.append(joke)
+            if cls.__silo.compare_and_set(session_id, {}, token, *fields):
+                cls.__silo.push_many(session_id, STREAM, joke_ids, STREAM_SIZE)
+                for joke_id in preferences.get("includes", []):
+                    cls.include_joke(session_id, joke_id)
+                for joke_id in preferences.get("excludes", []):
+                    cls.exclude_joke(session_id, joke_id)
+                return True
+        return False
+
+    @classmethod
+    def schedule_refill(cls, session_id: str) -> bool:
+        """Repopulate a user's joke silo in the background.
+
+        Args:
+            session_id: ID generated for the user's session
+        Returns:
+            Whether a refill was queued, False if one is already queued or
+            running for that session, a running one is then followed by
+            another run.
+        """
+        return cls.__refiller.submit(session_id, cls.repopulate_jokes)
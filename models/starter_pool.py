@@ -0,0 +1,87 @@
+"""Pool of pre-generated starter silos."""
+
+import logging
+import os
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class StarterPool:
+    """Starter silo payloads generated ahead of the logins needing them.
+
+    Payloads are kept in the memory of the process, popping one takes no
+    round trip. Once fewer than `low` are left, a background thread tops the
+    pool up to `size`. When the pool is empty, e.g. during a login storm,
+    the payload is generated inline as if there were no pool.
+    """
+
+    def __init__(self, generate, size: int = 64, low: int | None = None) -> None:
+        """Create a pool.
+
+        Args:
+            generate: callable without arguments generating a payload.
+            size:     amount of payloads kept, 0 disables the pool.
+            low:      amount of payloads left below which the pool is topped
+                      up, half of `size` by default.
+        """
+        self.generate = generate
+        self.size = size
+        self.low = size // 2 if low is None else low
+        self.__payloads: deque = deque()
+        self.__wake = threading.Event()
+        self.__lock = threading.Lock()
+        self.__pid: int | None = None
+
+    def __len__(self) -> int:
+        return len(self.__payloads)
+
+    def pop(self):
+        """Take a payload, generating one if the pool is empty."""
+        if self.size <= 0:
+            return self.generate()
+        self._start()
+        try:
+            payload = self.__payloads.popleft()
+        except IndexError:
+            payload = None
+        if len(self.__payloads) < self.low:
+            self.__wake.set()
+        return self.generate() if payload is None else payload
+
+    def fill(self) -> int:
+        """Top the pool up now.
+
+        Returns:
+            The amount of payloads generated.
+        """
+        generated = 0
+        while len(self.__payloads) < self.size:
+            self.__payloads.append(self.generate())
+            generated += 1
+        return generated
+
+    def _start(self) -> None:
+        """Start the thread topping the pool up, once per process."""
+        if self.__pid == os.getpid():
+            return
+        with self.__lock:
+            if self.__pid != os.getpid():
+                # A forked child only keeps the thread that forked.
+                self.__pid = os.getpid()
+                self.__wake.set()
+                threading.Thread(
+                    target=self._run, name="starter-pool", daemon=True
+                ).start()
+
+    def _run(self) -> None:
+        """Top the pool up every time it runs low."""
+        pid = os.getpid()
+        while self.__pid == pid:
+            self.__wake.wait()
+            self.__wake.clear()
+            try:
+                self.fill()
+            except Exception:
+                logger.exception("starter pool top up failed")
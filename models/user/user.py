@@ -3,11 +3,25 @@
 
 from mongoengine import Document, IntField, ListField, StringField, EmailField
 from models.db.mongo_engine import MongoEngine
+from collections import OrderedDict
 import os
+import threading
+import time
 
 alias: str = os.getenv("DB_ALIAS", "test_witter")
 MongoEngine.connect(alias)
 
+# Credentials of the users logging in kept in process for this many
+# seconds, 0 disables the cache, and the amount of users kept.
+USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "0"))
+USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "1024"))
+
+# Compares strings ignoring their case. The email and username indexes use
+# it, so neither can be registered twice in different cases.
+CASE_INSENSITIVE: dict = {"locale": "en", "strength": 2}
+# Fields a login needs, the only ones read.
+CREDENTIALS: tuple = ("email", "username", "password")
+
 
 class User(Document):
     """The user class that will be used to
@@ -20,4 +34,105 @@ class User(Document):
     include_ids = ListField(IntField)
     exclude_ids = ListField(IntField)
     # TODO: Test both include_ids & exclude_ids field.
-    meta = {"db_alias": alias, "collection": "user"}
+    meta = {
+        "db_alias": alias,
+        "collection": "user",
+        "indexes": [
+            {"fields": ["email"], "name": "email_ci", "collation": CASE_INSENSITIVE},
+            {
+                "fields": ["username"],
+                "name": "username_ci",
+                "collation": CASE_INSENSITIVE,
+            },
+        ],
+    }
+
+    @classmethod
+    def credentials(cls, email_or_username: str) -> dict | None:
+        """Find the credentials of a user logging in.
+
+        The email or username is matched ignoring its case, through the
+        unique case-insensitive indexes, and only the id, email, username
+        and password hash are read.
+
+        Parameters
+        =================
+        email_or_username - An email address if it holds an `@`, a username
+        otherwise.
+
+        Return - A dict of `id`, `email`, `username` and `password`, or None
+        when no user matches.
+        """
+        field = "email" if "@" in email_or_username else "username"
+        # Cached like the indexes match it, whatever its case.
+        key = (field, email_or_username.casefold())
+        found = credential_cache.get(key)
+        if found is not None:
+            return found
+
+        doc = (
+            cls.objects(**{field: email_or_username})
+            .collation(CASE_INSENSITIVE)
+            .only(*CREDENTIALS)
+            .as_pymongo()
+            .first()
+        )
+        if doc is None:
+            return None
+        found = {"id": doc["_id"], **{f: doc[f] for f in CREDENTIALS}}
+        credential_cache.set(key, found)
+        return found
+
+
+class CredentialCache:
+    """Bounded cache of user credentials, each kept for `ttl` seconds."""
+
+    def __init__(self, max_size: int = 1024, ttl: float = 0) -> None:
+        """Create a cache.
+
+        Parameters
+        =================
+        max_size - The amount of users kept.
+
+        ttl - Seconds a user is kept, 0 disables the cache.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.__entries: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def get(self, key: tuple) -> dict | None:
+        """The credentials cached under a key, None if absent or expired."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.__entries[key]
+                return None
+            self.__entries.move_to_end(key)
+            return dict(entry[1])
+
+    def set(self, key: tuple, credentials: dict) -> None:
+        """Cache credentials, evicting the least recently used."""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.ttl, dict(credentials))
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        """Drop every entry of a user, e.g. after its password changed."""
+        with self.__lock:
+            for key in [k for k, v in self.__entries.items() if v[1]["id"] == user_id]:
+                del self.__entries[key]
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self.__lock:
+            self.__entries.clear()
+
+
+credential_cache = CredentialCache(USER_CACHE_SIZE, USER_CACHE_TTL)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Test the ASGI entry point"""
+
+import asyncio
+import json
+import os
+import time
+import unittest
+from unittest import mock
+from uuid import uuid4
+
+from jose import jwt
+
+from asgi import application
+from models.silo import Silo
+
+SECRET_KEY: str | None = os.getenv("SECRET_KEY")
+
+if not SECRET_KEY:
+    raise TypeError("SECRET KEY is not set in the environment!")
+
+
+def request(method: str, path: str, headers: list = (), body: bytes = b"") -> tuple:
+    """Run a request through the ASGI application.
+
+    Returns:
+        The status, the headers and the body of the response.
+    """
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start, content = sent
+    return start["status"], dict(start["headers"]), content["body"]
+
+
+class TestAsgi(unittest.TestCase):
+    """Class that inheirts from TestCase"""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        self.session_id = str(uuid4())
+        token = jwt.encode(
+            {"exp": time.time() + 60, "session_id": self.session_id},
+            str(SECRET_KEY),
+            algorithm="HS256",
+        )
+        self.headers = [("Authorization", f"Bearer {token}")]
+        Silo.create_silo(self.session_id)
+
+    def tearDown(self) -> None:
+        """tear Down method."""
+        Silo.destroy_silo(self.session_id)
+
+    def test_populate(self) -> None:
+        """Test jokes are served from the silo of the session."""
+        status, _, body = request("GET", "/api/v1/user/main/populate", self.headers)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body)["content"]), 5)
+
+    def test_like_and_dislike(self) -> None:
+        """Test likes and dislikes are stored in the silo of the session."""
+        status, _, body = request("PUT", "/api/v1/user/main/7/like/", self.headers)
+        self.assertEqual(status, 200)
+        self.assertDictEqual(json.loads(body), {"joke_id": "7"})
+        request("PUT", "/api/v1/user/main/8/dislike", self.headers)
+        silo, _ = Silo._Silo__silo.snapshot(
+            self.session_id, sets=("includes", "excludes")
+        )
+        self.assertSetEqual(silo["includes"], {"7"})
+        self.assertSetEqual(silo["excludes"], {"8"})
+
+    def test_unauthorized(self) -> None:
+        """Test requests without a valid token are rejected."""
+        status, _, body = request("GET", "/api/v1/user/main/populate")
+        self.assertEqual(status, 401)
+        self.assertDictEqual(json.loads(body), {"error": "Unauthorized"})
+        status, _, body = request(
+            "GET", "/api/v1/user/main/populate", [("Authorization", "Bearer x")]
+        )
+        self.assertEqual(status, 401)
+        self.assertDictEqual(json.loads(body), {"error": "Invalid token"})
+
+    def test_flask_fallback(self) -> None:
+        """Test the other endpoints are served by the Flask app."""
+        status, headers, body = request("POST", "/api/v1/auth/login", body=b"")
+        self.assertEqual(status, 400)
+        self.assertIn(b"content-type", headers)
+        status, _, _ = request("GET", "/api/v1/user/main/populate/extra")
+        self.assertEqual(status, 404)
+
+    def test_empty_silo_served(self) -> None:
+        """Test a silo emptied before its refill is served random jokes."""
+        Silo.get_joke_ids(self.session_id, -1)
+        status, _, body = request("GET", "/api/v1/user/main/populate", self.headers)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body)["content"]), 5)
+
+    def test_startup_failed(self) -> None:
+        """Test a failed model load is reported to the server."""
+        messages = [{"type": "lifespan.startup"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        with mock.patch("asgi.warmup", side_effect=FileNotFoundError("model")):
+            asyncio.run(application({"type": "lifespan"}, receive, send))
+        self.assertListEqual(
+            sent, [{"type": "lifespan.startup.failed", "message": "model"}]
+        )
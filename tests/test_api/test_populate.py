@@ -103,7 +103,7 @@ class TestPopulate(unittest.TestCase):
 
         self.assertEqual(resp.status_code, 200)
         likes = list(
-            map(int, REDIS.get(self.session_id, "includes")[0].keys()))
+            map(int, REDIS.members(self.session_id, "includes")))
         self.assertIn(self.include_random, likes)
 
     def test_dislike_behaviour(self) -> None:
@@ -115,5 +115,5 @@ class TestPopulate(unittest.TestCase):
 
         self.assertEqual(resp.status_code, 200)
         dislikes = list(
-            map(int, REDIS.get(self.session_id, "excludes")[0].keys()))
+            map(int, REDIS.members(self.session_id, "excludes")))
         self.assertIn(self.exclude_random, dislikes)
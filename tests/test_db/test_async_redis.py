@@ -0,0 +1,59 @@
+"""Test For the asyncio Redis connector"""
+
+import asyncio
+import unittest
+
+from models.db.async_redis import AsyncRedisDB
+from models.db.redis import RedisDB
+
+
+class TestAsyncRedisDB(unittest.IsolatedAsyncioTestCase):
+    """asyncio Redis test case"""
+
+    ID = "asyncsilotest"
+
+    def setUp(self) -> None:
+        self.redis_db = RedisDB()
+        self.redis_db.set(self.ID, {}, 60)
+
+    async def asyncSetUp(self) -> None:
+        self.db = AsyncRedisDB()
+
+    async def asyncTearDown(self) -> None:
+        await self.db.close()
+
+    def tearDown(self) -> None:
+        self.redis_db.delete(self.ID, "includes", "excludes", "jokes")
+
+    async def test_shared_with_redis_db(self):
+        """Test the buffers and sets are those `RedisDB` reads and writes"""
+        self.redis_db.push_many(self.ID, "jokes", [1, 2, 3], 20)
+        self.assertListEqual(await self.db.pop_many(self.ID, "jokes", 2), [1, 2])
+        self.assertListEqual(self.redis_db.pop_many(self.ID, "jokes", 5), [3])
+        self.assertListEqual(await self.db.get(self.ID), [{}])
+        await self.db.move_member(self.ID, "excludes", "includes", "7")
+        self.assertSetEqual(self.redis_db.members(self.ID, "includes"), {"7"})
+
+    async def test_expire(self):
+        """Test an object and its sets expire together"""
+        await self.db.move_member(self.ID, "excludes", "includes", "7")
+        self.assertTrue(await self.db.expire(self.ID, 0.05, "includes"))
+        self.assertLessEqual(await self.db.ttl(self.ID), 0.05)
+        await asyncio.sleep(0.1)
+        with self.assertRaises(KeyError):
+            await self.db.ttl(self.ID)
+        with self.assertRaises(KeyError):
+            await self.db.pop_many(self.ID, "jokes", 1)
+        with self.assertRaises(KeyError):
+            await self.db.get(self.ID)
+        self.assertFalse(await self.db.expire(self.ID, 1))
+        self.assertSetEqual(self.redis_db.members(self.ID, "includes"), set())
+
+    async def test_concurrent_pops(self):
+        """Test concurrent pops never serve a joke twice"""
+        self.redis_db.push_many(self.ID, "jokes", list(range(20)), 20)
+        popped = await asyncio.gather(
+            *[self.db.pop_many(self.ID, "jokes", 3) for _ in range(10)]
+        )
+        served = [joke for jokes in popped for joke in jokes]
+        self.assertListEqual(sorted(served), list(range(20)))
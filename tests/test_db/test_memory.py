@@ -0,0 +1,164 @@
+"""Test For the in-process storage"""
+
+import threading
+import time
+import unittest
+
+from models.db.memory import MemoryDB
+from models.db.redis import RedisDB
+from models.db.storage import FailoverDB, Storage
+from redis.exceptions import ConnectionError
+
+
+class TestMemoryDB(unittest.TestCase):
+    """In-process storage test case"""
+
+    ID = "memorytest"
+
+    def setUp(self) -> None:
+        self.db = MemoryDB(max_keys=3)
+        self.db.set(self.ID, {"jokes": [1, 2]})
+
+    def test_get(self):
+        """Test an object and its fields are read as from Redis"""
+        self.assertListEqual(self.db.get(self.ID), [{"jokes": [1, 2]}])
+        self.assertListEqual(self.db.get(self.ID, "jokes"), [[1, 2]])
+        self.assertListEqual(self.db.get(self.ID, "missing"), [])
+        with self.assertRaises(KeyError):
+            self.db.get("missing")
+
+    def test_stored_as_copy(self):
+        """Test changing a stored or read object does not change the store"""
+        obj = {"jokes": [1]}
+        self.db.set(self.ID, obj)
+        obj["jokes"].append(2)
+        self.db.get(self.ID, "jokes")[0].append(3)
+        self.assertListEqual(self.db.get(self.ID, "jokes"), [[1]])
+
+    def test_compare_and_set(self):
+        """Test an object is only replaced if unchanged since a snapshot"""
+        values, token = self.db.snapshot(self.ID, "jokes", sets=("includes",))
+        self.assertDictEqual(values, {"jokes": [[1, 2]], "includes": set()})
+        self.assertTrue(self.db.compare_and_set(self.ID, {"jokes": [3]}, token, "jokes"))
+        self.assertFalse(self.db.compare_and_set(self.ID, {"jokes": [4]}, token, "jokes"))
+        self.assertListEqual(self.db.get(self.ID, "jokes"), [[3]])
+
+    def test_move_member(self):
+        """Test members move between the sets of an object"""
+        self.db.move_member(self.ID, "excludes", "includes", "7")
+        self.db.move_member(self.ID, "includes", "excludes", "7")
+        self.assertSetEqual(self.db.members(self.ID, "excludes"), {"7"})
+        self.assertFalse(self.db.is_member(self.ID, "includes", "7"))
+        with self.assertRaises(KeyError):
+            self.db.move_member("missing", "excludes", "includes", "7")
+
+    def test_expiry(self):
+        """Test an object and its sets expire"""
+        self.db.move_member(self.ID, "excludes", "includes", "7")
+        self.assertIsNone(self.db.ttl(self.ID))
+        self.assertTrue(self.db.expire(self.ID, 0.01))
+        self.assertLessEqual(self.db.ttl(self.ID), 0.01)
+        time.sleep(0.02)
+        with self.assertRaises(KeyError):
+            self.db.get(self.ID)
+        self.assertSetEqual(self.db.members(self.ID, "includes"), set())
+        self.assertFalse(self.db.expire(self.ID, 1))
+
+    def test_touched_in_operation(self):
+        """Test moving members and popping values push back the expiry"""
+        self.db.expire(self.ID, 0.01)
+        self.db.move_member(self.ID, "excludes", "includes", "7", 60, ("jokes",))
+        self.assertGreater(self.db.ttl(self.ID), 1)
+        self.db.expire(self.ID, 0.01)
+        self.db.pop_many(self.ID, "jokes", 1, 60, ("includes", "excludes"))
+        self.assertGreater(self.db.ttl(self.ID), 1)
+
+    def test_lru_eviction(self):
+        """Test the least recently used object is evicted"""
+        self.db.set("a", {})
+        self.db.set("b", {})
+        self.db.get(self.ID)
+        self.db.set("c", {})
+        self.assertListEqual(sorted(self.db.scan()), ["b", "c", self.ID])
+        self.assertListEqual(list(self.db.scan("memory*", "ReJSON-RL")), [self.ID])
+        self.assertListEqual(list(self.db.scan(_type="set")), [])
+
+    def test_concurrent_moves(self):
+        """Test concurrent moves of different members are all applied"""
+        threads = [
+            threading.Thread(
+                target=self.db.move_member,
+                args=(self.ID, "excludes", "includes", str(i)),
+            )
+            for i in range(50)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.db.members(self.ID, "includes")), 50)
+
+    def test_bounded_buffer(self):
+        """Test values are pushed and popped in order, keeping the queued"""
+        self.assertEqual(self.db.push_many(self.ID, "jokes", [1, 2, 3], 4), 3)
+        self.assertEqual(self.db.push_many(self.ID, "jokes", [4, "five"], 4), 4)
+        self.assertEqual(self.db.length(self.ID, "jokes"), 4)
+        values, _ = self.db.snapshot(self.ID, buffers=("jokes",))
+        self.assertListEqual(values["jokes"], [1, 2, 3, 4])
+        self.assertListEqual(self.db.pop_many(self.ID, "jokes", 3), [1, 2, 3])
+        self.assertListEqual(self.db.pop_many(self.ID, "jokes", 3), [4])
+        self.assertListEqual(self.db.pop_many(self.ID, "jokes", 3), [])
+        with self.assertRaises(KeyError):
+            self.db.push_many("missing", "jokes", [1], 4)
+        with self.assertRaises(KeyError):
+            self.db.pop_many("missing", "jokes", 1)
+
+    def test_delete(self):
+        """Test deleting an object deletes its sets"""
+        self.db.move_member(self.ID, "excludes", "includes", "7")
+        self.db.delete(self.ID, "includes")
+        self.assertSetEqual(self.db.members(self.ID, "includes"), set())
+        with self.assertRaises(KeyError):
+            self.db.get(self.ID)
+
+
+class TestStorage(unittest.TestCase):
+    """Storage interface test case"""
+
+    def test_incomplete_backend(self):
+        """Test a backend missing an operation cannot be created"""
+
+        class Incomplete(Storage):
+            def connected(self) -> bool:
+                return True
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+class BrokenScan(MemoryDB):
+    """In-process storage losing its connection while scanning"""
+
+    def scan(self, match: str = "*", _type: str | None = None):
+        yield "partial"
+        raise ConnectionError("lost")
+
+
+class TestFailoverDB(unittest.TestCase):
+    """Failover storage test case"""
+
+    def test_scan_falls_back_while_iterating(self):
+        """Test a scan failing midway goes on with the fallback"""
+        fallback = MemoryDB()
+        fallback.set("fallbackkey", {})
+        db = FailoverDB(BrokenScan(), fallback)
+        self.assertListEqual(list(db.scan()), ["partial", "fallbackkey"])
+
+    def test_fallback_while_down(self):
+        """Test the fallback is used while the primary is unreachable"""
+        fallback = MemoryDB()
+        db = FailoverDB(RedisDB("someinvalid host", 1000), fallback)
+        db.set("failovertest", {"jokes": [1]}, 60)
+        self.assertTrue(db.connected())
+        self.assertListEqual(fallback.get("failovertest", "jokes"), [[1]])
+        self.assertListEqual(db.get("failovertest", "jokes"), [[1]])
@@ -4,7 +4,9 @@
 import unittest
 
 from mongoengine.connection import mongoengine
-from models.db.mongo_engine import MongoEngine
+from types import SimpleNamespace
+
+from models.db.mongo_engine import MongoEngine, PoolMetrics, pool_metrics
 from mongoengine import ConnectionFailure
 
 
@@ -35,6 +37,35 @@ class TestMongoEngine(unittest.TestCase):
         MongoEngine.connect("test", "ATotallyNewDB")
         self.assertIsNotNone(mongoengine.get_connection("test"))
 
+    def test_connect_options(self) -> None:
+        """Test the pool, timeouts and read preference of the client."""
+        MongoEngine.connect(
+            "test", "dbName1", maxPoolSize=7, readPreference="secondaryPreferred"
+        )
+        client = mongoengine.get_connection("test")
+        self.assertEqual(client.options.pool_options.max_pool_size, 7)
+        self.assertEqual(client.options.pool_options.connect_timeout, 2)
+        self.assertEqual(client.options.server_selection_timeout, 3)
+        self.assertEqual(client.read_preference.mongos_mode, "secondaryPreferred")
+        self.assertIn(pool_metrics, client.options.event_listeners)
+
+    def test_pool_metrics(self) -> None:
+        """Test the pool events are counted."""
+        metrics = PoolMetrics()
+        metrics.connection_created(None)
+        metrics.connection_checked_out(SimpleNamespace(duration=0.5))
+        metrics.connection_checked_out(SimpleNamespace(duration=0.25))
+        metrics.connection_checked_in(None)
+        metrics.connection_check_out_failed(None)
+        stats = metrics.stats()
+        self.assertEqual(stats["open"], 1)
+        self.assertEqual(stats["in_use"], 1)
+        self.assertEqual(stats["checkout_failed"], 1)
+        self.assertEqual(stats["checkout_seconds"], 0.75)
+        self.assertEqual(stats["max_checkout"], 0.5)
+        metrics.reset()
+        self.assertEqual(metrics.stats()["checked_out"], 0)
+
     def tearDown(self) -> None:
         """The tear down method."""
         mongoengine.disconnect("test")
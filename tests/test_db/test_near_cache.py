@@ -0,0 +1,56 @@
+"""Test For the near cache"""
+
+import unittest
+
+from models.db.near_cache import NearCache
+
+
+class TestNearCache(unittest.TestCase):
+    """Near cache test case"""
+
+    def setUp(self) -> None:
+        self.cache = NearCache({"host": "someinvalid host", "port": 1000}, 2)
+        # As if the listener was connected.
+        self.cache.client_id = 1
+
+    def test_lookup(self):
+        """Test a stored read is served, as a copy"""
+        _, _, generation = self.cache.lookup("a", "jokes")
+        self.cache.store("a", "jokes", [[1, 2]], generation)
+        cached, value, _ = self.cache.lookup("a", "jokes")
+        self.assertTrue(cached)
+        self.assertListEqual(value, [[1, 2]])
+        value[0].append(3)
+        self.assertListEqual(self.cache.lookup("a", "jokes")[1], [[1, 2]])
+        self.assertFalse(self.cache.lookup("a", None)[0])
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+
+    def test_invalidated(self):
+        """Test invalidated keys are dropped"""
+        self.cache.store("a", None, [{}], 0)
+        self.cache.store("b", None, [{}], 0)
+        self.cache.invalidate(["a"])
+        self.assertFalse(self.cache.lookup("a", None)[0])
+        self.assertTrue(self.cache.lookup("b", None)[0])
+        self.cache.invalidate()
+        self.assertFalse(self.cache.lookup("b", None)[0])
+
+    def test_invalidated_while_reading(self):
+        """Test a read is not cached if invalidated before it is stored"""
+        _, _, generation = self.cache.lookup("a", None)
+        self.cache.invalidate(["a"])
+        self.cache.store("a", None, [{}], generation)
+        self.assertFalse(self.cache.lookup("a", None)[0])
+
+    def test_not_cached_without_listener(self):
+        """Test nothing is cached while invalidations are not received"""
+        self.cache.client_id = None
+        self.cache.store("a", None, [{}], 0)
+        self.assertFalse(self.cache.lookup("a", None)[0])
+
+    def test_bounded(self):
+        """Test the least recently used key is evicted"""
+        for key in "abc":
+            self.cache.store(key, None, [{}], 0)
+        self.assertFalse(self.cache.lookup("a", None)[0])
+        self.assertTrue(self.cache.lookup("c", None)[0])
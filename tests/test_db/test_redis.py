@@ -1,5 +1,6 @@
 """Test  For Redis DB"""
 
+import time
 import unittest
 
 from models.db.redis import RedisDB, RedisError
@@ -25,3 +26,120 @@ class TestSilo(unittest.TestCase):
         redis_db = RedisDB("someinvalid host", 1000)
         with self.assertRaises(RedisError):
             redis_db.set(self.ID, {})
+
+    def test_redis_reconnects(self):
+        """Test the connection is checked again once marked down"""
+        redis_db = RedisDB(reconnect_interval=0)
+        redis_db._mark_down()
+        self.assertTrue(redis_db.connected())
+        redis_db.set(self.ID, {})
+        redis_db.delete(self.ID)
+
+    def test_redis_fails_fast_while_down(self):
+        """Test commands are not attempted until the next reconnection"""
+        redis_db = RedisDB(reconnect_interval=60)
+        redis_db._mark_down()
+        self.assertFalse(redis_db.connected())
+        with self.assertRaises(RedisError):
+            redis_db.set(self.ID, {})
+
+    def test_near_cache_invalidated(self):
+        """Test reads cached by a worker see the writes of another one"""
+        redis_db = RedisDB(near_cache_size=10)
+        for _ in range(50):
+            if redis_db.near_cache.listening():
+                break
+            time.sleep(0.1)
+        redis_db.set(self.ID, {"jokes": [1]})
+        self.assertListEqual(redis_db.get(self.ID, "jokes"), [[1]])
+        self.assertListEqual(redis_db.get(self.ID, "jokes"), [[1]])
+        self.assertEqual(redis_db.near_cache.hits, 1)
+
+        RedisDB().set(self.ID, {"jokes": [2]})
+        time.sleep(0.1)
+        self.assertListEqual(redis_db.get(self.ID, "jokes"), [[2]])
+        redis_db.delete(self.ID)
+
+    def test_bounded_buffer(self):
+        """Test values are pushed and popped in order, keeping the queued"""
+        redis_db = RedisDB()
+        redis_db.set(self.ID, {})
+        self.assertEqual(redis_db.push_many(self.ID, "jokes", [1, 2, 3], 4), 3)
+        self.assertEqual(redis_db.push_many(self.ID, "jokes", [4, "five"], 4), 4)
+        self.assertEqual(redis_db.length(self.ID, "jokes"), 4)
+        values, _ = redis_db.snapshot(self.ID, buffers=("jokes",))
+        self.assertListEqual(values["jokes"], [1, 2, 3, 4])
+        self.assertListEqual(redis_db.pop_many(self.ID, "jokes", 3), [1, 2, 3])
+        self.assertListEqual(redis_db.pop_many(self.ID, "jokes", 3), [4])
+        self.assertListEqual(redis_db.pop_many(self.ID, "jokes", 3), [])
+        redis_db.delete(self.ID, "jokes")
+        with self.assertRaises(KeyError):
+            redis_db.push_many(self.ID, "jokes", [1], 4)
+        with self.assertRaises(KeyError):
+            redis_db.pop_many(self.ID, "jokes", 1)
+
+    def test_snapshot(self):
+        """Test several fields are read together"""
+        redis_db = RedisDB()
+        redis_db.set(self.ID, {"jokes": ["a", "b"], "includes": {"1": 1}})
+        values, _ = redis_db.snapshot(self.ID, "jokes", "includes")
+        self.assertDictEqual(values, {"jokes": [["a", "b"]], "includes": [{"1": 1}]})
+        values, _ = redis_db.snapshot(self.ID, "jokes")
+        self.assertDictEqual(values, {"jokes": [["a", "b"]]})
+        redis_db.delete(self.ID)
+        with self.assertRaises(KeyError):
+            redis_db.snapshot(self.ID, "jokes")
+
+    def test_compare_and_set(self):
+        """Test an object is only replaced if unchanged since the snapshot"""
+        redis_db = RedisDB()
+        redis_db.set(self.ID, {"jokes": ["a"], "includes": {}})
+        _, token = redis_db.snapshot(self.ID, "jokes", "includes")
+        self.assertTrue(
+            redis_db.compare_and_set(
+                self.ID, {"jokes": ["b"], "includes": {}}, token, "jokes", "includes"
+            )
+        )
+        self.assertListEqual(redis_db.get(self.ID, "jokes"), [["b"]])
+
+        _, token = redis_db.snapshot(self.ID, "jokes", "includes")
+        redis_db.set(self.ID, {"jokes": ["b"], "includes": {"3": 1}})
+        self.assertFalse(
+            redis_db.compare_and_set(
+                self.ID, {"jokes": ["c"], "includes": {}}, token, "jokes", "includes"
+            )
+        )
+        self.assertListEqual(redis_db.get(self.ID, "jokes"), [["b"]])
+        redis_db.delete(self.ID)
+
+    def test_move_member(self):
+        """Test a member is moved between the sets of an object"""
+        redis_db = RedisDB()
+        redis_db.set(self.ID, {"jokes": []})
+        redis_db.move_member(self.ID, "excludes", "includes", "5")
+        redis_db.move_member(self.ID, "includes", "excludes", "5")
+        self.assertFalse(redis_db.is_member(self.ID, "includes", "5"))
+        self.assertTrue(redis_db.is_member(self.ID, "excludes", "5"))
+
+        values, _ = redis_db.snapshot(self.ID, "jokes", sets=("includes", "excludes"))
+        self.assertDictEqual(
+            values, {"jokes": [[]], "includes": set(), "excludes": {"5"}}
+        )
+        redis_db.delete(self.ID, "includes", "excludes")
+        with self.assertRaises(KeyError):
+            redis_db.move_member(self.ID, "excludes", "includes", "5")
+        self.assertSetEqual(redis_db.members(self.ID, "excludes"), set())
+
+    def test_touched_in_operation(self):
+        """Test moving members and popping values push back the expiry"""
+        redis_db = RedisDB()
+        redis_db.set(self.ID, {}, 10)
+        redis_db.push_many(self.ID, "jokes", [1, 2], 4)
+        redis_db.move_member(self.ID, "excludes", "includes", "5", 60, ("jokes",))
+        self.assertGreater(redis_db.ttl(self.ID), 10)
+        self.assertGreater(redis_db.ttl(f"{self.ID}:includes"), 10)
+        self.assertGreater(redis_db.ttl(f"{self.ID}:jokes"), 10)
+
+        redis_db.pop_many(self.ID, "jokes", 1, 120, ("includes",))
+        self.assertGreater(redis_db.ttl(f"{self.ID}:includes"), 60)
+        redis_db.delete(self.ID, "includes", "jokes")
@@ -0,0 +1,38 @@
+"""Test For Silo Metrics"""
+
+import time
+import unittest
+
+from models.metrics import process_metrics, silo_metrics
+from models.silo import Silo
+
+
+class TestMetrics(unittest.TestCase):
+    """Metrics test case"""
+
+    ID = "ametricsid"
+
+    def setUp(self) -> None:
+        Silo.create_silo(self.ID, time.time() + 60)
+
+    def tearDown(self) -> None:
+        Silo.destroy_silo(self.ID)
+
+    def test_silo_metrics(self):
+        """Test the silos are counted and measured"""
+        metrics = silo_metrics()
+        self.assertGreaterEqual(metrics["silos"], 1)
+        self.assertGreaterEqual(metrics["sampled"], 1)
+        self.assertGreater(metrics["bytes_per_silo"], 0)
+        self.assertGreater(metrics["used_memory"], 0)
+        self.assertGreaterEqual(metrics["expires"], 1)
+
+    def test_sample_bounded(self):
+        """Test no more silos than asked for are measured"""
+        self.assertEqual(silo_metrics(0)["sampled"], 0)
+
+    def test_process_metrics(self):
+        """Test the counters of the Mongo pool are exposed"""
+        pool = process_metrics()["mongo_pool"]
+        self.assertIn("checkout_failed", pool)
+        self.assertEqual(pool["in_use"], pool["checked_out"] - pool["checked_in"])
@@ -0,0 +1,95 @@
+"""Test  For the background refill worker"""
+
+import threading
+import unittest
+
+from models.refill import RefillWorker
+
+
+class TestRefillWorker(unittest.TestCase):
+    """RefillWorker test case"""
+
+    def setUp(self) -> None:
+        self.worker = RefillWorker(workers=1, max_pending=2)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+
+    def tearDown(self) -> None:
+        self.release.set()
+        self.worker.shutdown()
+
+    def block(self, session_id: str) -> None:
+        """Refill that waits until released"""
+        self.started.set()
+        self.release.wait(5)
+        self.calls.append(session_id)
+
+    def record(self, session_id: str) -> None:
+        """Refill that records the session"""
+        self.calls.append(session_id)
+
+    def test_refill_runs(self):
+        """Test a submitted refill runs"""
+        self.assertTrue(self.worker.submit("a", self.record))
+        self.worker.shutdown()
+        self.assertListEqual(self.calls, ["a"])
+
+    def test_duplicate_dropped(self):
+        """Test a session already queued is not queued twice"""
+        self.worker.submit("busy", self.block)
+        self.started.wait(5)
+        self.assertTrue(self.worker.submit("a", self.record))
+        self.assertFalse(self.worker.submit("a", self.record))
+        self.assertEqual(self.worker.pending(), 2)
+        self.release.set()
+        self.worker.shutdown()
+        self.assertListEqual(self.calls, ["busy", "a"])
+
+    def test_follow_up_while_running(self):
+        """Test submissions during a refill are folded into one follow-up"""
+        self.worker.submit("a", self.block)
+        self.started.wait(5)
+        self.assertFalse(self.worker.submit("a", self.record))
+        self.assertFalse(self.worker.submit("a", self.record))
+        self.assertEqual(self.worker.pending(), 1)
+        self.release.set()
+        self.worker.shutdown()
+        self.assertListEqual(self.calls, ["a", "a"])
+        self.assertEqual(self.worker.pending(), 0)
+
+    def test_never_concurrent(self):
+        """Test two refills of a session never run at the same time"""
+        worker = RefillWorker(workers=4)
+        running = []
+        overlaps = []
+
+        def refill(session_id):
+            running.append(session_id)
+            overlaps.append(len(running) > 1)
+            self.release.wait(0.01)
+            running.remove(session_id)
+
+        for _ in range(50):
+            worker.submit("a", refill)
+        worker.shutdown()
+        self.assertNotIn(True, overlaps)
+
+    def test_queue_bounded(self):
+        """Test submissions beyond max_pending are dropped"""
+        self.worker.submit("busy", self.block)
+        self.started.wait(5)
+        self.assertTrue(self.worker.submit("a", self.record))
+        self.assertFalse(self.worker.submit("b", self.record))
+
+    def test_errors_do_not_propagate(self):
+        """Test a failing refill does not stop the worker"""
+
+        def fail(session_id):
+            raise KeyError(session_id)
+
+        with self.assertLogs("models.refill", "ERROR"):
+            self.worker.submit("a", fail)
+            self.worker.submit("b", self.record)
+            self.worker.shutdown()
+        self.assertListEqual(self.calls, ["b"])
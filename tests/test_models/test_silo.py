@@ -1,9 +1,11 @@
 """Test  For Silos"""
 
+import time
 import unittest
 
-from models.silo import Silo
+from models.silo import SILO_IDLE_TTL, Silo
 from models import REDIS
+from utils.generate_content import generate_text_from_id
 
 
 class TestSilo(unittest.TestCase):
@@ -23,29 +25,120 @@ class TestSilo(unittest.TestCase):
 
     def test_new_silo_created(self):
         """Test to see if a new silo was successfully created."""
-
-        item = REDIS.get(self.ID, "jokes")
+        self.assertEqual(REDIS.length(self.ID, "jokes"), 20)
         _item = Silo.get_jokes(self.ID, 5)
 
-        self.assertTrue(
-            len(_item) == len(item[0])
+        self.assertEqual(len(_item), 5)
+        self.assertTrue(all(isinstance(j, str) for j in _item))
+
+    def test_jokes_popped(self):
+        """Test serving jokes takes them out of the silo."""
+        ids = Silo.get_joke_ids(self.ID, 3)
+        self.assertEqual(len(ids), 3)
+        self.assertTrue(all(isinstance(i, int) for i in ids))
+        self.assertEqual(REDIS.length(self.ID, "jokes"), 17)
+        self.assertEqual(len(Silo.get_joke_ids(self.ID, 20)), 17)
+
+    def test_empty_silo_served(self):
+        """Test a silo emptied before its refill is served random jokes."""
+        Silo.get_joke_ids(self.ID, -1)
+        ids = Silo.get_joke_ids(self.ID, 5)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(REDIS.length(self.ID, "jokes"), 0)
+        self.assertDictEqual(REDIS.get(self.ID)[0], {})
+
+    def test_silo_repopulated(self):
+        """Test a refill tops the silo up to its size."""
+        Silo.get_joke_ids(self.ID, 5)
+        Silo.repopulate_jokes(self.ID)
+        self.assertEqual(REDIS.length(self.ID, "jokes"), 20)
+        Silo.repopulate_jokes(self.ID)
+        self.assertEqual(REDIS.length(self.ID, "jokes"), 20)
+
+    def test_refill_without_duplicates(self):
+        """Test a refill never queues a joke twice or a rated one"""
+        Silo.include_joke(self.ID, "3")
+        Silo.exclude_joke(self.ID, "4")
+        Silo.repopulate_jokes(self.ID)
+        values, _ = REDIS.snapshot(self.ID, buffers=("jokes",))
+        joke_ids = values["jokes"]
+
+        self.assertEqual(len(joke_ids), 20)
+        self.assertEqual(len(set(joke_ids)), 20)
+        self.assertNotIn(3, joke_ids[5:])
+        self.assertNotIn(4, joke_ids[5:])
+
+    def test_refill_varies(self):
+        """Test refills of a session that stopped rating serve new jokes"""
+        Silo.include_joke(self.ID, "3")
+        Silo.get_joke_ids(self.ID, -1)
+        Silo.repopulate_jokes(self.ID)
+        first = Silo.get_joke_ids(self.ID, -1)
+        Silo.repopulate_jokes(self.ID)
+        second = Silo.get_joke_ids(self.ID, -1)
+
+        self.assertEqual(len(first), 20)
+        self.assertNotEqual(set(first[:18]), set(second[:18]))
+
+    def test_legacy_silo_migrated(self):
+        """Test a silo holding joke texts is served and migrated."""
+        ids = Silo.get_joke_ids(self.ID, -1)
+        texts = generate_text_from_id(ids)
+        REDIS.set(
+            self.ID, {"jokes": texts, "includes": {"7": 1}, "excludes": {"8": 1}}
         )
-        self.assertLessEqual(len(_item), 5)
-        self.assertListEqual(item[0], _item)
+
+        self.assertTrue(Silo.migrate_silo(self.ID))
+        self.assertFalse(Silo.migrate_silo(self.ID))
+        self.assertSetEqual(REDIS.members(self.ID, "includes"), {"7"})
+        self.assertSetEqual(REDIS.members(self.ID, "excludes"), {"8"})
+        self.assertListEqual(Silo.get_joke_ids(self.ID, -1), ids)
+
+    def test_legacy_silo_served(self):
+        """Test a silo holding joke ids is migrated when served."""
+        ids = Silo.get_joke_ids(self.ID, -1)
+        REDIS.set(self.ID, {"jokes": ids})
+
+        self.assertListEqual(Silo.get_jokes(self.ID, -1), generate_text_from_id(ids))
+        self.assertDictEqual(REDIS.get(self.ID)[0], {})
 
     def test_joke_id_included(self):
         """Test including a new id exists"""
         Silo.include_joke(self.ID, "0")
 
-        self.assertTrue(REDIS.exist(self.ID, "includes", "0"))
-        self.assertFalse(REDIS.exist(self.ID, "exclude", "0"))
+        self.assertTrue(REDIS.is_member(self.ID, "includes", "0"))
+        self.assertFalse(REDIS.is_member(self.ID, "excludes", "0"))
 
     def test_joke_id_excluded(self):
         """Test excluding a new id exists"""
         Silo.exclude_joke(self.ID, "0")
 
-        self.assertTrue(REDIS.exist(self.ID, "excludes", "0"))
-        self.assertFalse(REDIS.exist(self.ID, "includes", "0"))
+        self.assertTrue(REDIS.is_member(self.ID, "excludes", "0"))
+        self.assertFalse(REDIS.is_member(self.ID, "includes", "0"))
+
+    def test_joke_id_moved(self):
+        """Test liking then disliking a joke moves it between the sets"""
+        Silo.include_joke(self.ID, "3")
+        Silo.include_joke(self.ID, "4")
+        Silo.exclude_joke(self.ID, "3")
+
+        self.assertSetEqual(REDIS.members(self.ID, "includes"), {"4"})
+        self.assertSetEqual(REDIS.members(self.ID, "excludes"), {"3"})
+
+    def test_preference_on_missing_silo(self):
+        """Test liking a joke of a session without a silo fails"""
+        with self.assertRaises(KeyError):
+            Silo.include_joke("thisiddoesnotexist", "3")
+        self.assertSetEqual(REDIS.members("thisiddoesnotexist", "includes"), set())
+
+    def test_destroy_removes_preferences(self):
+        """Test destroying a silo removes its likes and dislikes"""
+        Silo.include_joke(self.ID, "3")
+        Silo.exclude_joke(self.ID, "4")
+        Silo.destroy_silo(self.ID)
+
+        self.assertSetEqual(REDIS.members(self.ID, "includes"), set())
+        self.assertSetEqual(REDIS.members(self.ID, "excludes"), set())
 
     def test_exception_if_id_destroyed(self):
         """Test if geting item after destruction id fails"""
@@ -57,3 +150,54 @@ class TestSilo(unittest.TestCase):
         """Test if geting item with a non existent id fails"""
         with self.assertRaises(KeyError):
             Silo.get_jokes("thisiddoesnotexist")
+
+    def test_silo_expires(self):
+        """Test a silo, its jokes and sets expire with the session's token"""
+        Silo.create_silo(self.ID, time.time() + 60)
+        Silo.include_joke(self.ID, "3")
+
+        self.assertLessEqual(REDIS.ttl(self.ID), 60)
+        self.assertLessEqual(REDIS.ttl(f"{self.ID}:jokes"), 60)
+        self.assertLessEqual(REDIS.ttl(f"{self.ID}:includes"), 60)
+
+    def test_silo_expiry_capped_by_idle_ttl(self):
+        """Test a silo of a long lived token expires once idle"""
+        Silo.create_silo(self.ID, time.time() + 10 * SILO_IDLE_TTL)
+        self.assertLessEqual(REDIS.ttl(self.ID), SILO_IDLE_TTL)
+
+    def test_silo_touched(self):
+        """Test using a silo pushes back its expiry, along with its sets"""
+        Silo.create_silo(self.ID, time.time() + 10)
+        Silo.exclude_joke(self.ID, "4")
+
+        self.assertTrue(Silo.touch_silo(self.ID, time.time() + 60))
+        self.assertGreater(REDIS.ttl(self.ID), 10)
+        self.assertGreater(REDIS.ttl(f"{self.ID}:excludes"), 10)
+
+    def test_silo_touched_in_use(self):
+        """Test serving a request pushes back the expiry in the same call"""
+        Silo.create_silo(self.ID, time.time() + 10)
+        Silo.exclude_joke(self.ID, "4", touch=True, expires_at=time.time() + 60)
+        self.assertGreater(REDIS.ttl(self.ID), 10)
+        self.assertGreater(REDIS.ttl(f"{self.ID}:excludes"), 10)
+        self.assertGreater(REDIS.ttl(f"{self.ID}:jokes"), 10)
+
+        Silo.get_joke_ids(self.ID, 5, touch=True, expires_at=time.time() + 120)
+        self.assertGreater(REDIS.ttl(f"{self.ID}:excludes"), 60)
+
+    def test_expired_silo_created_in_use(self):
+        """Test serving a request of an expired silo creates it again"""
+        Silo.destroy_silo(self.ID)
+        Silo.include_joke(self.ID, "3", touch=True, expires_at=time.time() + 60)
+        self.assertTrue(REDIS.is_member(self.ID, "includes", "3"))
+        self.assertEqual(REDIS.length(self.ID, "jokes"), 20)
+
+    def test_refill_keeps_expiry(self):
+        """Test repopulating a silo does not make it permanent"""
+        Silo.create_silo(self.ID, time.time() + 60)
+        Silo.repopulate_jokes(self.ID)
+        self.assertIsNotNone(REDIS.ttl(self.ID))
+
+    def test_touch_missing_silo(self):
+        """Test touching an expired silo reports it is gone"""
+        self.assertFalse(Silo.touch_silo("thisiddoesnotexist", time.time() + 60))
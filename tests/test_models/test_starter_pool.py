@@ -0,0 +1,50 @@
+"""Test  For the starter silo pool"""
+
+import itertools
+import time
+import unittest
+
+from models.starter_pool import StarterPool
+
+
+class TestStarterPool(unittest.TestCase):
+    """StarterPool test case"""
+
+    def setUp(self) -> None:
+        self.counter = itertools.count()
+        self.pool = StarterPool(lambda: [next(self.counter)], size=4, low=2)
+
+    def wait_full(self) -> None:
+        """Wait for the background top up"""
+        for _ in range(100):
+            if len(self.pool) == self.pool.size:
+                return
+            time.sleep(0.01)
+
+    def test_fill(self):
+        """Test filling generates payloads up to the size"""
+        self.assertEqual(self.pool.fill(), 4)
+        self.assertEqual(self.pool.fill(), 0)
+        self.assertListEqual(self.pool.pop(), [0])
+
+    def test_pop_empty(self):
+        """Test a payload is generated inline when the pool is empty"""
+        self.assertEqual(len(self.pool.pop()), 1)
+        self.wait_full()
+        # The top up may have raced the pop.
+        self.assertGreaterEqual(len(self.pool), 3)
+
+    def test_topped_up_when_low(self):
+        """Test the pool is topped up once it runs low"""
+        self.pool.fill()
+        popped = [self.pool.pop() for _ in range(3)]
+        self.assertListEqual(popped, [[0], [1], [2]])
+        self.wait_full()
+        self.assertEqual(len(self.pool), 4)
+
+    def test_disabled(self):
+        """Test a pool of size 0 always generates"""
+        pool = StarterPool(lambda: [next(self.counter)], size=0)
+        self.assertEqual(pool.fill(), 0)
+        self.assertListEqual(pool.pop(), [0])
+        self.assertEqual(len(pool), 0)
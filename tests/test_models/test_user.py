@@ -2,7 +2,9 @@
 """Test User.py Module."""
 
 import unittest
-from models.user.user import User
+import time
+from unittest import mock
+from models.user.user import CredentialCache, User
 from mongoengine import (
     OperationError,
     ConnectionFailure,
@@ -153,6 +155,80 @@ class TestUser(unittest.TestCase):
         with self.assertRaises(NotUniqueError):
             duplicate_mary_email.save()
 
+    def test_credentials(self) -> None:
+        """Test a login finds only the credentials, ignoring the case"""
+        john = User(
+            email=self.john_email,
+            username=self.john_username,
+            password=self.john_password,
+            include_ids=[1, 2],
+        )
+        john.save()
+        found = User.credentials(self.john_username.upper())
+        self.assertDictEqual(
+            found,
+            {
+                "id": john.id,
+                "email": self.john_email,
+                "username": self.john_username,
+                "password": self.john_password,
+            },
+        )
+        self.assertEqual(User.credentials(self.john_email.upper())["id"], john.id)
+        self.assertIsNone(User.credentials("nobody"))
+
+    def test_unique_ignoring_case(self) -> None:
+        """Test an email or username is unique whatever its case"""
+        User(email=self.john_email, username="john", password="lower").save()
+        with self.assertRaises(NotUniqueError):
+            User(email=self.mary_email, username="JOHN", password="upper").save()
+        with self.assertRaises(NotUniqueError):
+            User(
+                email=self.john_email.upper(), username="mary", password="upper"
+            ).save()
+
+    def test_credentials_cached_ignoring_case(self) -> None:
+        """Test the credentials are cached once whatever the case"""
+        User(
+            email=self.john_email,
+            username=self.john_username,
+            password=self.john_password,
+        ).save()
+        cache = CredentialCache(ttl=60)
+        with mock.patch("models.user.user.credential_cache", cache):
+            User.credentials(self.john_username.upper())
+            cached = cache.get(("username", self.john_username.casefold()))
+        self.assertEqual(cached["password"], self.john_password)
+
+
+class TestCredentialCache(unittest.TestCase):
+    """Test Class for the cache of the credentials."""
+
+    def test_expiry(self) -> None:
+        """Test credentials are kept until their time to live"""
+        cache = CredentialCache(ttl=0.01)
+        cache.set(("username", "john"), {"id": 1, "password": "hash"})
+        self.assertEqual(cache.get(("username", "john"))["password"], "hash")
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(("username", "john")))
+
+    def test_disabled(self) -> None:
+        """Test nothing is cached without a time to live"""
+        cache = CredentialCache()
+        cache.set(("username", "john"), {"id": 1})
+        self.assertIsNone(cache.get(("username", "john")))
+
+    def test_bounded_and_invalidated(self) -> None:
+        """Test the least recently used entry is evicted, and a user dropped"""
+        cache = CredentialCache(max_size=2, ttl=60)
+        cache.set(("username", "john"), {"id": 1})
+        cache.set(("email", "john@johndoe.com"), {"id": 1})
+        cache.set(("username", "mary"), {"id": 2})
+        self.assertIsNone(cache.get(("username", "john")))
+        cache.invalidate(1)
+        self.assertIsNone(cache.get(("email", "john@johndoe.com")))
+        self.assertEqual(cache.get(("username", "mary")), {"id": 2})
+
 
 # TODO : Test email field.
 # TODO : Fix issue when mongod is not starting.
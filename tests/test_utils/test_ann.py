@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Test the similarity search backends."""
+
+import unittest
+
+import numpy as np
+
+from utils.ann import BruteForceIndex, IVFIndex, SimilarityIndex, make_index
+from utils.bench_ann import (
+    bench,
+    fold_in_queries,
+    recall,
+    synthetic_artifact,
+    synthetic_vectors,
+)
+from utils.fold_in import FoldInRanker
+from utils.model_artifact import ModelArtifact
+from utils.neighbors import NeighborIndex
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    """Test Class for the ann backends."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        self.vectors = synthetic_vectors(2000, 16)
+        self.valid = np.ones(len(self.vectors), dtype=bool)
+        self.valid[:10] = False
+        self.queries = self.vectors[100:120]
+
+    def exact(self, n: int) -> np.ndarray:
+        """Exact top `n` valid items of every query."""
+        sims = self.queries @ self.vectors.T
+        sims[:, ~self.valid] = -np.inf
+        return np.argsort(-sims, axis=1)[:, :n]
+
+    def test_brute_force(self) -> None:
+        """Test the brute force backend is exact and skips invalid items."""
+        index = BruteForceIndex(self.vectors, self.valid)
+        positions, scores = index.search(self.queries, 10)
+        np.testing.assert_array_equal(positions, self.exact(10))
+        self.assertTrue((np.diff(scores, axis=1) <= 0).all())
+
+    def test_interface(self) -> None:
+        """Test a backend without a search cannot be created."""
+
+        class Incomplete(SimilarityIndex):
+            pass
+
+        with self.assertRaises(TypeError):
+            Incomplete(self.vectors)
+
+    def test_padding(self) -> None:
+        """Test rows are padded when fewer items than requested exist."""
+        index = BruteForceIndex(self.vectors[:12], self.valid[:12])
+        positions, scores = index.search(self.queries[:1], 5)
+        self.assertListEqual(sorted(positions[0, :2]), [10, 11])
+        self.assertListEqual(list(positions[0, 2:]), [-1, -1, -1])
+        self.assertTrue(np.isneginf(scores[0, 2:]).all())
+
+    def test_exclude(self) -> None:
+        """Test excluded positions are never returned."""
+        index = BruteForceIndex(self.vectors, self.valid)
+        truth = self.exact(6)
+        exclude = [row[:2] for row in truth]
+        positions, _ = index.search(self.queries, 4, exclude=exclude)
+        np.testing.assert_array_equal(positions, truth[:, 2:])
+
+    def test_ivf_full_probe_is_exact(self) -> None:
+        """Test probing every list gives the exact results."""
+        index = IVFIndex(self.vectors, self.valid, n_lists=16, n_probe=16)
+        positions, _ = index.search(self.queries, 10)
+        np.testing.assert_array_equal(positions, self.exact(10))
+
+    def test_ivf_recall(self) -> None:
+        """Test a partial probe keeps a high recall and skips invalid items."""
+        index = IVFIndex(self.vectors, self.valid, n_lists=32, n_probe=8)
+        positions, _ = index.search(self.queries, 10)
+        self.assertGreater(recall(positions, self.exact(10)), 0.8)
+        self.assertFalse(np.isin(positions, np.arange(10)).any())
+
+    def test_make_index(self) -> None:
+        """Test backends are picked by name."""
+        self.assertIsInstance(make_index("ivf", self.vectors), IVFIndex)
+        with self.assertRaises(ValueError):
+            make_index("hnsw", self.vectors)
+
+    def test_neighbor_index_backend(self) -> None:
+        """Test the neighbour table can be built with an approximate index."""
+        ids = list(range(len(self.vectors)))
+        exact = NeighborIndex(self.vectors, ids, k=5)
+        approx = NeighborIndex(self.vectors, ids, k=5, backend="ivf", n_probe=32)
+        self.assertListEqual(exact.neighbors(150, 5), approx.neighbors(150, 5))
+        self.assertNotIn(150, approx.recommend([150, 151], 10, "max"))
+
+    def test_ranker_backend(self) -> None:
+        """Test the fold-in ranker can search with an approximate index."""
+        rng = np.random.default_rng(0)
+        ids = [-1] + list(range(1, len(self.vectors)))
+        artifact = ModelArtifact(self.vectors, rng.normal(size=len(ids)), ids)
+        exact = FoldInRanker(artifact)
+        approx = FoldInRanker(artifact, backend="ivf", n_probe=32)
+        self.assertIsInstance(approx.index, IVFIndex)
+        ranked = approx.rank([150, 151], [152], 10)
+        self.assertGreaterEqual(
+            len(set(ranked) & set(exact.rank([150, 151], [152], 10))), 8
+        )
+        for joke_id in (-1, 150, 151, 152):
+            self.assertNotIn(joke_id, ranked)
+
+    def test_bench_ranker_workload(self) -> None:
+        """Test the benchmark searches the ranker vectors with fold-in queries."""
+        ranker = FoldInRanker(synthetic_artifact(500, 8))
+        queries = fold_in_queries(ranker, 5)
+        self.assertEqual(queries.shape, (5, 9))
+        np.testing.assert_array_equal(queries[:, -1], 1)
+        rows = bench(ranker.vectors, queries, 10)
+        self.assertEqual(rows[0][0], "brute")
+        self.assertEqual(rows[0][3], 1.0)
+        self.assertEqual(rows[-1][3], 1.0)
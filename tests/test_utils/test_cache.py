@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test the recommendation cache."""
+
+import time
+import unittest
+
+from redis.exceptions import RedisError
+
+from utils.cache import RecommendationCache
+
+
+class SharedTier:
+    """In memory stand-in exposing the RedisDB string methods."""
+
+    def __init__(self, broken: bool = False) -> None:
+        self.values = {}
+        self.broken = broken
+
+    def get_value(self, key):
+        if self.broken:
+            raise RedisError("Redis not initialized")
+        return self.values.get(key)
+
+    def set_value(self, key, value, ttl=None):
+        if self.broken:
+            raise RedisError("Redis not initialized")
+        self.values[key] = value
+
+
+class TestRecommendationCache(unittest.TestCase):
+    """Test Class for the RecommendationCache."""
+
+    def test_key_is_canonical(self) -> None:
+        """Test the key ignores order and duplicates inside a set."""
+        key = RecommendationCache.key
+        self.assertEqual(
+            key("a", 5, "v1", [3, 1, 2]), key("a", 5, "v1", ["2", 1, 3, 3])
+        )
+        self.assertNotEqual(key("a", 5, "v1", [1]), key("a", 6, "v1", [1]))
+        self.assertNotEqual(key("a", 5, "v1", [1]), key("a", 5, "v2", [1]))
+        self.assertNotEqual(key("a", 5, "v1", [1], []), key("a", 5, "v1", [], [1]))
+
+    def test_hit_and_miss(self) -> None:
+        """Test results are computed once and counted."""
+        cache = RecommendationCache()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return [4, 5]
+
+        self.assertListEqual(cache.get_or_compute("k", compute), [4, 5])
+        self.assertListEqual(cache.get_or_compute("k", compute), [4, 5])
+        self.assertEqual(len(calls), 1)
+        self.assertDictEqual(
+            cache.stats(), {"hits": 1, "redis_hits": 0, "misses": 1, "size": 1}
+        )
+
+    def test_lru_eviction(self) -> None:
+        """Test the least recently used entry is evicted first."""
+        cache = RecommendationCache(max_size=2)
+        cache.set("a", [1])
+        cache.set("b", [2])
+        cache.get("a")
+        cache.set("c", [3])
+        self.assertIsNone(cache.get("b"))
+        self.assertListEqual(cache.get("a"), [1])
+        self.assertListEqual(cache.get("c"), [3])
+
+    def test_ttl(self) -> None:
+        """Test entries expire."""
+        cache = RecommendationCache(ttl=0.01)
+        cache.set("a", [1])
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_results_are_copies(self) -> None:
+        """Test callers cannot alter a cached result."""
+        cache = RecommendationCache()
+        cache.set("a", [1, 2])
+        cache.get("a").remove(1)
+        self.assertListEqual(cache.get("a"), [1, 2])
+
+    def test_shared_tier(self) -> None:
+        """Test a result cached by one worker is served to another."""
+        shared = SharedTier()
+        RecommendationCache(redis=shared).set("a", [7, 8])
+        other = RecommendationCache(redis=shared)
+        self.assertListEqual(other.get("a"), [7, 8])
+        self.assertListEqual(other.get("a"), [7, 8])
+        self.assertDictEqual(
+            other.stats(), {"hits": 1, "redis_hits": 1, "misses": 0, "size": 1}
+        )
+
+    def test_shared_tier_unavailable(self) -> None:
+        """Test an unreachable shared tier degrades to a miss."""
+        cache = RecommendationCache(max_size=0, redis=SharedTier(broken=True))
+        self.assertListEqual(cache.get_or_compute("a", lambda: [1]), [1])
+        self.assertEqual(cache.stats()["misses"], 1)
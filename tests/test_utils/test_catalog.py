@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Test the joke catalog."""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from utils.catalog import JokeCatalog, MappedCatalog
+
+
+class TestJokeCatalog(unittest.TestCase):
+    """Test Class for the JokeCatalog."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        self.ratings_df = pd.DataFrame(
+            {
+                "userId": [1, 1, 2, 2, 3],
+                "jokeId": [7, 5, 7, 12, 5],
+                "rating": [1.0, -2.0, 3.5, 0.0, 9.0],
+                "jokeText": ["seven", "five", "seven", "twelve", "five"],
+            }
+        )
+        self.catalog = JokeCatalog.from_ratings(self.ratings_df)
+
+    def test_deduplicated(self) -> None:
+        """Test every joke is stored once."""
+        self.assertEqual(len(self.catalog), 3)
+        self.assertListEqual(self.catalog.joke_ids, [5, 7, 12])
+
+    def test_requested_order(self) -> None:
+        """Test texts come back in the order of the ids requested."""
+        self.assertListEqual(
+            self.catalog.texts([12, 5, 7]), ["twelve", "five", "seven"]
+        )
+        self.assertListEqual(self.catalog.texts([7, 12]), ["seven", "twelve"])
+
+    def test_unknown_ids_skipped(self) -> None:
+        """Test ids that are not in the catalog are skipped."""
+        self.assertListEqual(self.catalog.texts([0, 6, 5, 13, -1]), ["five"])
+        self.assertIsNone(self.catalog.get(100))
+
+
+class TestMappedCatalog(unittest.TestCase):
+    """Test Class for the MappedCatalog."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "jokes.cat")
+        self.catalog = JokeCatalog([None, "one", None, "three", "vier ü"])
+        self.catalog.save(self.path)
+        self.mapped = MappedCatalog(self.path)
+
+    def tearDown(self) -> None:
+        """tear Down method."""
+        del self.mapped
+        self.tmpdir.cleanup()
+
+    def test_same_content(self) -> None:
+        """Test the mapped catalog reads back what was saved."""
+        self.assertEqual(len(self.mapped), 3)
+        self.assertListEqual(self.mapped.joke_ids, [1, 3, 4])
+        self.assertListEqual(self.mapped.texts([4, 1, 3]), ["vier ü", "one", "three"])
+        self.assertListEqual(self.mapped.texts([0, 2, 5, 3]), ["three"])
+
+    def test_not_a_catalog(self) -> None:
+        """Test mapping a file that is not a catalog."""
+        with open(self.path, "wb") as f:
+            f.write(b"not a catalog file")
+        with self.assertRaises(ValueError):
+            MappedCatalog(self.path)
+
+    def test_resave(self) -> None:
+        """Test a mapped catalog can be copied."""
+        copy_path = os.path.join(self.tmpdir.name, "copy.cat")
+        self.mapped.save(copy_path)
+        self.assertListEqual(MappedCatalog(copy_path).texts([3]), ["three"])
+
+    def test_find_and_contains(self) -> None:
+        """Test the reverse lookup of a joke text."""
+        self.assertEqual(self.mapped.find("three"), 3)
+        self.assertIsNone(self.mapped.find("two"))
+        self.assertIn(4, self.mapped)
+        self.assertNotIn(2, self.mapped)
+        self.assertNotIn(50, self.catalog)
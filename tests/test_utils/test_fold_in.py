@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Test the fold-in ranker."""
+
+import unittest
+
+import numpy as np
+
+from utils.fold_in import FoldInRanker, logit_range
+from utils.model_artifact import ModelArtifact
+
+
+class TestFoldInRanker(unittest.TestCase):
+    """Test Class for the FoldInRanker."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        rng = np.random.default_rng(0)
+        self.factors = rng.normal(size=(20, 4)).astype(np.float32)
+        self.bias = rng.normal(scale=0.1, size=20).astype(np.float32)
+        self.ids = [-1] + list(range(10, 29))
+        self.artifact = ModelArtifact(self.factors, self.bias, self.ids)
+        self.ranker = FoldInRanker(self.artifact, reg=0.5)
+
+    def test_logit_range(self) -> None:
+        """Test the inverse of sigmoid_range."""
+        raw = logit_range(8.0, -9.5, 10.5)
+        self.assertAlmostEqual(1 / (1 + np.exp(-raw)) * 20 - 9.5, 8.0, places=4)
+
+    def test_user_vector_solves_ridge(self) -> None:
+        """Test the user vector satisfies the normal equations."""
+        u = self.ranker.user_vector([11, 15], [20])
+        q = self.factors[[2, 6, 11]]
+        t = np.array(
+            [self.ranker.like_target] * 2 + [self.ranker.dislike_target]
+        ) - self.bias[[2, 6, 11]]
+        np.testing.assert_allclose(
+            (q.T @ q + 0.5 * np.eye(4)) @ u, q.T @ t, rtol=1e-4, atol=1e-4
+        )
+
+    def test_empty_session(self) -> None:
+        """Test an empty session ranks by item bias alone."""
+        self.assertFalse(self.ranker.user_vector([], [99]).any())
+        expected = [self.ids[i] for i in np.argsort(-self.bias) if i != 0][:5]
+        self.assertListEqual(self.ranker.rank([], [], 5), expected)
+
+    def test_rank(self) -> None:
+        """Test ranking orders by score and skips rated jokes."""
+        includes, excludes = [11, 15, "17"], [20]
+        ranked = self.ranker.rank(includes, excludes, 30)
+        self.assertEqual(len(ranked), 15)
+        for joke_id in (11, 15, 17, 20, -1):
+            self.assertNotIn(joke_id, ranked)
+
+        scores = self.ranker.scores(self.ranker.user_vector(includes, excludes))
+        ranked_scores = [scores[self.artifact.o2i[i]] for i in ranked]
+        self.assertListEqual(ranked_scores, sorted(ranked_scores, reverse=True))
+
+    def test_liked_neighbour_ranks_high(self) -> None:
+        """Test a joke close to the liked one is ranked above its opposite."""
+        factors = np.array(
+            [[1, 0], [1, 0.1], [-1, 0], [0, 1], [0.9, 0]], dtype=np.float32
+        )
+        artifact = ModelArtifact(factors, np.zeros(5), [0, 1, 2, 3, 4])
+        ranked = FoldInRanker(artifact).rank([0], [2], 3)
+        self.assertListEqual(ranked[:2], [1, 4])
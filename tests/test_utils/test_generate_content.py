@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Test the lazily loaded content generation."""
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import utils.generate_content as generate_content
+from utils.catalog import JokeCatalog
+from utils.generate_content import ModelHolder
+from utils.model_artifact import ModelArtifact
+from utils.shared_embeddings import publish
+
+
+class TestModelHolder(unittest.TestCase):
+    """Test Class for the ModelHolder."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        catalog_path = os.path.join(self.tmpdir.name, "jokes.cat")
+        model_path = os.path.join(self.tmpdir.name, "model.npz")
+        JokeCatalog([None, "one", "two", "three", "four"]).save(catalog_path)
+        rng = np.random.default_rng(0)
+        ModelArtifact(
+            rng.normal(size=(5, 3)), rng.normal(size=5), [-1, 1, 2, 3, 4]
+        ).save(model_path)
+        self.patches = [
+            mock.patch.object(generate_content, "CATALOG_PATH", catalog_path),
+            mock.patch.object(generate_content, "MODEL_PATH", model_path),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self) -> None:
+        """tear Down method."""
+        for patch in self.patches:
+            patch.stop()
+        self.tmpdir.cleanup()
+
+    def test_lazy(self) -> None:
+        """Test nothing is loaded until asked for."""
+        holder = ModelHolder()
+        self.assertFalse(holder.ready)
+        self.assertIsNone(holder.catalog)
+        holder.load()
+        self.assertTrue(holder.ready)
+        self.assertListEqual(holder.catalog.texts([3, 1]), ["three", "one"])
+        self.assertEqual(len(holder.ranker.rank([2], [], 3)), 3)
+        self.assertEqual(len(holder.neighbor_index.neighbors(2, 3)), 3)
+        self.assertGreaterEqual(holder.load_seconds, 0)
+
+    def test_generate_random_excludes(self) -> None:
+        """Test random jokes skip the excluded ids and the catalog's end."""
+        with mock.patch.object(generate_content, "model_holder", ModelHolder()):
+            self.assertListEqual(
+                sorted(generate_content.generate_random(3, [2, 4])), [1, 3]
+            )
+            self.assertEqual(len(generate_content.generate_random(2, [1])), 2)
+            self.assertListEqual(generate_content.generate_random(0), [])
+
+    def test_single_like_from_table(self) -> None:
+        """Test a session with a single like is served its neighbours."""
+        holder = ModelHolder().load()
+        with mock.patch.object(generate_content, "model_holder", holder):
+            self.assertListEqual(
+                generate_content.generate_personalized([2], [], 3),
+                holder.neighbor_index.neighbors(2, 3),
+            )
+            self.assertListEqual(generate_content.generate_dynamic([99], 3), [])
+
+    def test_similarity_ranking(self) -> None:
+        """Test the similarity ranking combines the scores of every like."""
+        holder = ModelHolder().load()
+        with mock.patch.object(generate_content, "model_holder", holder):
+            with mock.patch.object(generate_content, "RANKING", "similarity"):
+                self.assertListEqual(
+                    generate_content.generate_personalized([1, 2], [3], 2),
+                    holder.neighbor_index.recommend([1, 2], 2, "sum"),
+                )
+            self.assertListEqual(
+                generate_content.generate_dynamic([1, 2], 2, "max"),
+                holder.neighbor_index.recommend([1, 2], 2, "max"),
+            )
+
+    def test_loads_once(self) -> None:
+        """Test concurrent first requests load the model a single time."""
+        holder = ModelHolder()
+        with mock.patch.object(
+            ModelHolder, "_load", autospec=True, side_effect=ModelHolder._load
+        ) as load:
+            threads = [threading.Thread(target=holder.load) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(load.call_count, 1)
+        self.assertTrue(holder.ready)
+
+    def test_failed_load_is_retried(self) -> None:
+        """Test a failed load leaves the holder not ready."""
+        holder = ModelHolder()
+        broken_path = os.path.join(self.tmpdir.name, "broken.cat")
+        with open(broken_path, "wb") as f:
+            f.write(b"not a catalog")
+        with mock.patch.object(generate_content, "CATALOG_PATH", broken_path):
+            with self.assertRaises(ValueError):
+                holder.load()
+        self.assertFalse(holder.ready)
+        holder.load()
+        self.assertTrue(holder.ready)
+
+    def test_attach_shared_embeddings(self) -> None:
+        """Test workers map the embeddings published by the parent."""
+        shared_dir = os.path.join(self.tmpdir.name, "shared")
+        parent = ModelHolder(shared_dir="").load()
+        publish(shared_dir, parent.model, parent.ranker, parent.neighbor_index)
+
+        worker = ModelHolder(shared_dir=shared_dir).load()
+        self.assertFalse(worker.ranker.vectors.flags.writeable)
+        self.assertFalse(worker.neighbor_index.vectors.flags.writeable)
+        self.assertEqual(worker.model.version, parent.model.version)
+        self.assertListEqual(
+            worker.ranker.rank([1], [2], 2), parent.ranker.rank([1], [2], 2)
+        )
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Test the NumPy model artifact."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from utils.model_artifact import ModelArtifact
+
+
+class TestModelArtifact(unittest.TestCase):
+    """Test Class for the ModelArtifact."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        rng = np.random.default_rng(0)
+        self.artifact = ModelArtifact(
+            rng.normal(size=(6, 3)),
+            rng.normal(size=(6, 1)),
+            [-1, 5, 6, 7, 9, 12],
+            (-9.5, 10.5),
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "model.npz")
+
+    def tearDown(self) -> None:
+        """tear Down method."""
+        self.tmpdir.cleanup()
+
+    def test_mapping(self) -> None:
+        """Test the id to position mapping skips the placeholder."""
+        self.assertListEqual(self.artifact.joke_ids, [5, 6, 7, 9, 12])
+        self.assertEqual(self.artifact.o2i[9], 4)
+        self.assertNotIn(-1, self.artifact.o2i)
+        self.assertEqual(self.artifact.item_bias.shape, (6,))
+
+    def test_save_load(self) -> None:
+        """Test an artifact is read back unchanged."""
+        self.artifact.save(self.path)
+        loaded = ModelArtifact.load(self.path)
+        np.testing.assert_array_equal(loaded.item_factors, self.artifact.item_factors)
+        np.testing.assert_array_equal(loaded.item_bias, self.artifact.item_bias)
+        np.testing.assert_array_equal(loaded.ids, self.artifact.ids)
+        self.assertEqual(loaded.y_range, (-9.5, 10.5))
+        self.assertEqual(loaded.version, self.artifact.version)
+
+    def test_version_changes_with_weights(self) -> None:
+        """Test the version identifies the weights."""
+        other = ModelArtifact(
+            self.artifact.item_factors + 1,
+            self.artifact.item_bias,
+            self.artifact.ids,
+        )
+        self.assertNotEqual(other.version, self.artifact.version)
+
+    def test_missing_file(self) -> None:
+        """Test loading a missing artifact."""
+        with self.assertRaises(FileNotFoundError):
+            ModelArtifact.load(self.path)
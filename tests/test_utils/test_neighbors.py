@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test the precomputed neighbour index."""
+
+import unittest
+
+import numpy as np
+
+from utils.neighbors import NeighborIndex
+
+
+class TestNeighborIndex(unittest.TestCase):
+    """Test Class for the NeighborIndex."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        rng = np.random.default_rng(0)
+        self.factors = rng.normal(size=(30, 8)).astype(np.float32)
+        self.ids = ["#na#"] + list(range(100, 129))
+        self.index = NeighborIndex(self.factors, self.ids, k=5)
+
+    def brute_force(self, joke_id: int) -> list:
+        """Rank every other valid joke by cosine similarity."""
+        unit = self.factors / np.linalg.norm(self.factors, axis=1, keepdims=True)
+        pos = self.ids.index(joke_id)
+        sims = unit @ unit[pos]
+        order = [i for i in np.argsort(-sims) if i not in (0, pos)]
+        return [self.ids[i] for i in order]
+
+    def test_table_lookup(self) -> None:
+        """Test neighbours within k come from the table and are exact."""
+        self.assertEqual(self.index.table.shape, (30, 5))
+        for joke_id in (100, 115, 128):
+            self.assertListEqual(
+                self.index.neighbors(joke_id, 5), self.brute_force(joke_id)[:5]
+            )
+
+    def test_fallback_beyond_k(self) -> None:
+        """Test asking for more than k neighbours falls back to a full pass."""
+        self.assertListEqual(
+            self.index.neighbors(110, 12), self.brute_force(110)[:12]
+        )
+        self.assertEqual(len(self.index.neighbors(110, 1000)), 28)
+
+    def test_excludes_self_and_placeholder(self) -> None:
+        """Test a joke is never its own neighbour nor is `#na#` returned."""
+        closest = self.index.neighbors(120, 28)
+        self.assertNotIn(120, closest)
+        self.assertNotIn(-1, closest)
+
+    def test_unknown_id(self) -> None:
+        """Test looking up a joke outside the model."""
+        with self.assertRaises(KeyError):
+            self.index.neighbors(5)
+
+    def test_recommend_combines_seeds(self) -> None:
+        """Test several seeds are scored and combined in a single pass."""
+        unit = self.factors / np.linalg.norm(self.factors, axis=1, keepdims=True)
+        seeds = [101, 107, 119]
+        positions = [self.ids.index(i) for i in seeds]
+        for combine, reduce in (("sum", np.sum), ("max", np.max), ("mean", np.mean)):
+            scores = reduce(unit[positions] @ unit.T, axis=0)
+            order = [i for i in np.argsort(-scores) if i not in [0] + positions]
+            expected = [self.ids[i] for i in order[:6]]
+            self.assertListEqual(self.index.recommend(seeds, 6, combine), expected)
+
+    def test_recommend_single_seed_matches_neighbors(self) -> None:
+        """Test a single seed recommends the same as its neighbours."""
+        self.assertListEqual(
+            self.index.recommend([112], 5), self.index.neighbors(112, 5)
+        )
+
+    def test_recommend_ignores_unknown_seeds(self) -> None:
+        """Test unknown seeds are skipped and never returned."""
+        self.assertListEqual(self.index.recommend([1, 2], 5), [])
+        closest = self.index.recommend(["105", 3, 106], 40)
+        self.assertEqual(len(closest), 27)
+        self.assertNotIn(105, closest)
+        self.assertNotIn(106, closest)
+
+    def test_recommend_unknown_mode(self) -> None:
+        """Test an unknown combine mode is rejected."""
+        with self.assertRaises(ValueError):
+            self.index.recommend([101], 5, "median")
@@ -0,0 +1,83 @@
+"""Test the password hashing pool"""
+
+import threading
+import unittest
+
+from werkzeug.security import generate_password_hash
+
+from utils.passwords import HasherBusyError, PasswordHasher
+
+METHOD = "pbkdf2:sha256:1000"
+
+
+class TestPasswordHasher(unittest.TestCase):
+    """PasswordHasher test case"""
+
+    def setUp(self) -> None:
+        self.hasher = PasswordHasher(workers=0, method=METHOD, salt_length=8)
+
+    def tearDown(self) -> None:
+        self.hasher.shutdown()
+
+    def test_hash_and_verify(self):
+        """Test a hash verifies its password only"""
+        pwhash = self.hasher.hash("secret")
+        self.assertTrue(pwhash.startswith(METHOD + "$"))
+        self.assertTrue(self.hasher.verify(pwhash, "secret"))
+        self.assertFalse(self.hasher.verify(pwhash, "other"))
+        self.assertEqual(self.hasher.pending(), 0)
+
+    def test_process_pool(self):
+        """Test hashing in worker processes"""
+        hasher = PasswordHasher(workers=1, method=METHOD, salt_length=8)
+        try:
+            self.assertTrue(hasher.verify(hasher.hash("secret"), "secret"))
+        finally:
+            hasher.shutdown()
+
+    def test_needs_rehash(self):
+        """Test hashes made with other parameters are upgraded"""
+        self.assertFalse(self.hasher.needs_rehash(self.hasher.hash("secret")))
+        self.assertTrue(
+            self.hasher.needs_rehash(generate_password_hash("secret", "scrypt", 8))
+        )
+        self.assertTrue(
+            self.hasher.needs_rehash(generate_password_hash("secret", METHOD, 16))
+        )
+
+    def test_rehash(self):
+        """Test the new hash is saved off the calling thread"""
+        saved = []
+        done = threading.Event()
+
+        def save(pwhash: str) -> None:
+            saved.append((pwhash, threading.current_thread().name))
+            done.set()
+
+        self.assertTrue(self.hasher.rehash("secret", save))
+        self.assertTrue(done.wait(5))
+        pwhash, thread = saved[0]
+        self.assertTrue(self.hasher.verify(pwhash, "secret"))
+        self.assertTrue(thread.startswith("password-rehash"))
+
+    def test_bounded(self):
+        """Test passwords are refused once too many are waiting"""
+        release = threading.Event()
+        started = threading.Event()
+
+        def block(*args):
+            started.set()
+            release.wait(5)
+
+        hasher = PasswordHasher(workers=0, max_pending=1)
+        thread = threading.Thread(target=hasher._submit, args=(block,))
+        thread.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HasherBusyError):
+                hasher.hash("secret")
+            self.assertFalse(hasher.rehash("secret", print))
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(hasher.pending(), 0)
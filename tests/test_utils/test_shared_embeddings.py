@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Test the embeddings shared between processes."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from utils.fold_in import FoldInRanker
+from utils.model_artifact import ModelArtifact
+from utils.neighbors import NeighborIndex
+from utils.shared_embeddings import attach, publish, published
+
+
+class TestSharedEmbeddings(unittest.TestCase):
+    """Test Class for publishing and attaching shared embeddings."""
+
+    def setUp(self) -> None:
+        """Set Up Method."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmpdir.name, "shared")
+        rng = np.random.default_rng(0)
+        self.model = ModelArtifact(
+            rng.normal(size=(40, 6)), rng.normal(size=40), [-1] + list(range(39))
+        )
+        self.ranker = FoldInRanker(self.model)
+        self.index = NeighborIndex(self.model.item_factors, self.model.ids, k=5)
+
+    def tearDown(self) -> None:
+        """tear Down method."""
+        self.tmpdir.cleanup()
+
+    def test_nothing_published(self) -> None:
+        """Test attaching before a publish."""
+        self.assertFalse(published(self.directory))
+        with self.assertRaises(FileNotFoundError):
+            attach(self.directory)
+
+    def test_attach_is_read_only_map(self) -> None:
+        """Test workers get read only memory maps of the published arrays."""
+        publish(self.directory, self.model, self.ranker, self.index)
+        self.assertTrue(published(self.directory))
+        model, vectors, index = attach(self.directory)
+
+        self.assertIsInstance(vectors, np.memmap)
+        self.assertFalse(vectors.flags.writeable)
+        self.assertFalse(index.table.flags.writeable)
+        self.assertFalse(model.item_factors.flags.writeable)
+        self.assertEqual(model.version, self.model.version)
+        self.assertEqual(model.y_range, self.model.y_range)
+
+    def test_same_results(self) -> None:
+        """Test a ranker over attached arrays ranks like the published one."""
+        publish(self.directory, self.model, self.ranker, self.index)
+        model, vectors, index = attach(self.directory)
+        ranker = FoldInRanker(model, vectors=vectors)
+        for includes, excludes in (([], []), ([1, 2, 3], [4]), ([17], [])):
+            self.assertListEqual(
+                ranker.rank(includes, excludes, 6),
+                self.ranker.rank(includes, excludes, 6),
+            )
+        for joke_id in (0, 17, 38):
+            self.assertListEqual(
+                index.neighbors(joke_id, 5), self.index.neighbors(joke_id, 5)
+            )
+            self.assertListEqual(
+                index.neighbors(joke_id, 9), self.index.neighbors(joke_id, 9)
+            )
+
+    def test_republish(self) -> None:
+        """Test a new version replaces the current one."""
+        first = publish(self.directory, self.model, self.ranker, self.index)
+        model = ModelArtifact(
+            self.model.item_factors * 2, self.model.item_bias, self.model.ids
+        )
+        second = publish(self.directory, model, self.ranker, self.index)
+        self.assertNotEqual(first, second)
+        self.assertTrue(os.path.isdir(first))
+        self.assertEqual(attach(self.directory)[0].version, model.version)
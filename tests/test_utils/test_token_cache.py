@@ -0,0 +1,73 @@
+"""Test the cache of verified tokens"""
+
+import time
+import unittest
+from unittest import mock
+
+from jose import ExpiredSignatureError, JWTError, jwt
+
+from utils.token_cache import TokenCache
+
+KEY = "testkey"
+
+
+def token(session_id: str = "s1", ttl: float = 60, key: str = KEY) -> str:
+    """A signed token expiring in `ttl` seconds"""
+    return jwt.encode(
+        {"session_id": session_id, "exp": int(time.time() + ttl)}, key, "HS256"
+    )
+
+
+class TestTokenCache(unittest.TestCase):
+    """TokenCache test case"""
+
+    def setUp(self) -> None:
+        self.cache = TokenCache(KEY, max_size=2)
+
+    def test_cached(self):
+        """Test a verified token is answered from the cache"""
+        signed = token()
+        self.assertEqual(self.cache.decode(signed)["session_id"], "s1")
+        payload = self.cache.decode(signed)
+        self.assertEqual(payload["session_id"], "s1")
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        payload["session_id"] = "changed"
+        self.assertEqual(self.cache.decode(signed)["session_id"], "s1")
+
+    def test_invalid_not_cached(self):
+        """Test a token with a bad signature is always rejected"""
+        signed = token(key="otherkey")
+        for _ in range(2):
+            with self.assertRaises(JWTError):
+                self.cache.decode(signed)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_expired(self):
+        """Test a cached token is verified again once past its exp"""
+        signed = token(ttl=60)
+        self.cache.decode(signed)
+        with mock.patch("utils.token_cache.time.time", return_value=time.time() + 61):
+            self.cache.decode(signed)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+    def test_expired_rejected(self):
+        """Test an expired token is rejected"""
+        with self.assertRaises(ExpiredSignatureError):
+            self.cache.decode(token(ttl=-1))
+
+    def test_bounded(self):
+        """Test the least recently used token is evicted"""
+        first = token("s1")
+        self.cache.decode(first)
+        self.cache.decode(token("s2"))
+        self.cache.decode(token("s3"))
+        self.cache.decode(first)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_disabled(self):
+        """Test a cache of size 0 verifies every token"""
+        cache = TokenCache(KEY, max_size=0)
+        signed = token()
+        cache.decode(signed)
+        cache.decode(signed)
+        self.assertEqual(cache.hits, 0)
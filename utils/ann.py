@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Similarity search backends over the joke embeddings.
+
+Every backend searches item vectors by inner product, which is the cosine
+similarity of unit length vectors, and implements the `SimilarityIndex`
+interface:
+
+    brute: exact search, scores every item.
+    ivf:   approximate inverted file index. The items are clustered with
+           k-means and a query only scores the items of the `n_probe`
+           clusters closest to it.
+
+Use `make_index` to pick a backend by name, and `python -m utils.bench_ann`
+to compare their recall and latency for a given catalog size.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+BLOCK_SIZE: int = 1024
+
+
+def top_k(scores: np.ndarray, n: int) -> np.ndarray:
+    """Positions of the `n` highest scores of every row, best first.
+
+    Uses a partial selection so only the selected items are sorted.
+    """
+    n = min(n, scores.shape[1])
+    if n <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class SimilarityIndex(ABC):
+    """Interface of a similarity search backend.
+
+    Attributes:
+        vectors: (n_items, n_factors) item vectors.
+        valid:   (n_items,) mask of the items that may be returned.
+    """
+
+    def __init__(self, vectors: np.ndarray, valid: np.ndarray | None = None):
+        self.vectors = vectors
+        if valid is None:
+            valid = np.ones(len(vectors), dtype=bool)
+        self.valid = valid
+
+    @abstractmethod
+    def _search(self, queries: np.ndarray, n: int) -> tuple:
+        """Backend specific search, see `search`."""
+        raise NotImplementedError
+
+    def search(self, queries: np.ndarray, n: int, exclude=None) -> tuple:
+        """Find the items with the highest inner product with each query.
+
+        Args:
+            queries: (m, n_factors) query vectors.
+            n:       amount of items to return per query.
+            exclude: optional sequence of m lists of positions that must not
+                     be returned for the matching query.
+        Returns:
+            (positions, scores), both (m, n) and best first. Rows with fewer
+            than `n` results are padded with position -1 and score -inf.
+        """
+        queries = np.atleast_2d(queries)
+        if exclude is None:
+            return self._search(queries, n)
+
+        extra = max((len(e) for e in exclude), default=0)
+        positions, scores = self._search(queries, n + extra)
+        keep = np.array(
+            [~np.isin(row, excl) for row, excl in zip(positions, exclude)]
+        ).reshape(positions.shape)
+        # Stable sort moves the excluded entries to the end of each row.
+        order = np.argsort(~keep, axis=1, kind="stable")[:, :n]
+        positions = np.take_along_axis(positions, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        dropped = ~np.take_along_axis(keep, order, axis=1)
+        positions[dropped] = -1
+        scores[dropped] = -np.inf
+        return positions, scores
+
+    @staticmethod
+    def _pad(positions: np.ndarray, scores: np.ndarray) -> tuple:
+        """Mark results that have no finite score as missing."""
+        missing = ~np.isfinite(scores)
+        positions[missing] = -1
+        return positions, scores
+
+
+class BruteForceIndex(SimilarityIndex):
+    """Exact search: every query is scored against every item."""
+
+    def _search(self, queries: np.ndarray, n: int) -> tuple:
+        """Score all the items in one matrix product per block of queries."""
+        positions = np.full((len(queries), n), -1, dtype=np.int64)
+        scores = np.full((len(queries), n), -np.inf, dtype=np.float32)
+        width = min(n, len(self.vectors))
+        for start in range(0, len(queries), BLOCK_SIZE):
+            block = slice(start, start + BLOCK_SIZE)
+            sims = queries[block] @ self.vectors.T
+            sims[:, ~self.valid] = -np.inf
+            best = top_k(sims, width)
+            positions[block, :width] = best
+            scores[block, :width] = np.take_along_axis(sims, best, axis=1)
+        return self._pad(positions, scores)
+
+
+class IVFIndex(SimilarityIndex):
+    """Approximate inverted file index.
+
+    Build cost is a few k-means iterations over a sample of the items.
+    A query scores `n_lists` centroids and about `n_probe / n_lists` of the
+    items, so recall and cost grow with `n_probe`.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        valid: np.ndarray | None = None,
+        n_lists: int | None = None,
+        n_probe: int = 8,
+        n_iter: int = 10,
+        seed: int = 0,
+    ) -> None:
+        """Cluster the items and build the inverted lists.
+
+        Args:
+            vectors: (n_items, n_factors) item vectors.
+            valid:   mask of the items that may be returned.
+            n_lists: amount of clusters, defaults to sqrt(n_items).
+            n_probe: amount of clusters scored per query.
+            n_iter:  k-means iterations.
+            seed:    seed of the k-means initialization and sampling.
+        """
+        super().__init__(vectors, valid)
+        members = np.flatnonzero(self.valid)
+        if n_lists is None:
+            n_lists = int(np.sqrt(len(members)))
+        n_lists = max(1, min(n_lists, len(members)))
+        self.n_probe = min(n_probe, n_lists)
+
+        rng = np.random.default_rng(seed)
+        self.centroids = self._kmeans(rng, members, n_lists, n_iter)
+
+        assignment = self._assign(self.vectors[members])
+        order = np.argsort(assignment, kind="stable")
+        self.list_items = members[order]
+        self.list_offsets = np.searchsorted(
+            assignment[order], np.arange(n_lists + 1)
+        )
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Index of the closest centroid of every vector."""
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), BLOCK_SIZE):
+            block = slice(start, start + BLOCK_SIZE)
+            sims = vectors[block] @ self.centroids.T
+            assignment[block] = np.argmax(sims, axis=1)
+        return assignment
+
+    def _kmeans(self, rng, members, n_lists: int, n_iter: int) -> np.ndarray:
+        """Spherical k-means over a sample of the items."""
+        sample_size = min(len(members), 256 * n_lists)
+        sample = self.vectors[rng.choice(members, sample_size, replace=False)]
+        self.centroids = sample[rng.choice(sample_size, n_lists, replace=False)]
+        for _ in range(n_iter):
+            assignment = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty clusters keep their previous centroid.
+            self.centroids = np.where(
+                norms > 0, sums / np.maximum(norms, 1e-12), self.centroids
+            )
+        return self.centroids
+
+    def _search(self, queries: np.ndarray, n: int) -> tuple:
+        """Score only the items of the closest clusters of each query."""
+        probes = top_k(queries @ self.centroids.T, self.n_probe)
+        positions = np.full((len(queries), n), -1, dtype=np.int64)
+        scores = np.full((len(queries), n), -np.inf, dtype=np.float32)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            candidates = np.concatenate(
+                [
+                    self.list_items[self.list_offsets[i] : self.list_offsets[i + 1]]
+                    for i in lists
+                ]
+            )
+            sims = self.vectors[candidates] @ query
+            best = top_k(sims[None, :], n)[0]
+            positions[row, : len(best)] = candidates[best]
+            scores[row, : len(best)] = sims[best]
+        return self._pad(positions, scores)
+
+
+BACKENDS: dict = {"brute": BruteForceIndex, "ivf": IVFIndex}
+
+
+def make_index(
+    name: str, vectors: np.ndarray, valid: np.ndarray | None = None, **kwargs
+) -> SimilarityIndex:
+    """Create the similarity backend called `name`.
+
+    Raises:
+        ValueError: if `name` is not a known backend.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"unknown similarity index '{name}'")
+    return BACKENDS[name](vectors, valid, **kwargs)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Recall and latency benchmark of the `utils.ann` backends.
+
+Usage:
+    python -m utils.bench_ann [--items N] [--factors F] [--queries Q]
+                              [--k K] [--model export-3-10.npz]
+
+Item embeddings are drawn from a mixture of gaussians (or read from an
+exported model) and every backend is compared with the exact brute force
+results, for the two searches served:
+
+    ranker:    the `FoldInRanker` vectors `[Q b]`, queried by inner product
+               with `[u 1]`, `u` folded in from random sessions.
+    neighbors: the unit vectors of the `NeighborIndex`, queried by cosine
+               similarity with the vectors of random jokes.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from utils.ann import BruteForceIndex, IVFIndex
+from utils.fold_in import FoldInRanker
+from utils.model_artifact import ModelArtifact
+
+
+def synthetic_vectors(n_items: int, n_factors: int, seed: int = 0) -> np.ndarray:
+    """Clustered random unit vectors, closer to real embeddings than noise."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, n_items // 500)
+    centers = rng.normal(size=(n_clusters, n_factors))
+    vectors = centers[rng.integers(n_clusters, size=n_items)]
+    vectors += rng.normal(scale=0.5, size=vectors.shape)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32)
+
+
+def synthetic_artifact(n_items: int, n_factors: int, seed: int = 0) -> ModelArtifact:
+    """Model weights of clustered item factors of varying norms and biases."""
+    rng = np.random.default_rng(seed)
+    norms = rng.lognormal(sigma=0.3, size=(n_items, 1))
+    factors = synthetic_vectors(n_items, n_factors, seed) * norms
+    return ModelArtifact(
+        factors, rng.normal(scale=0.5, size=n_items), np.arange(n_items)
+    )
+
+
+def fold_in_queries(
+    ranker: FoldInRanker, n_queries: int, rated: int = 5, seed: int = 0
+) -> np.ndarray:
+    """Queries `[u 1]` of sessions that rated `rated` random jokes."""
+    rng = np.random.default_rng(seed)
+    joke_ids = ranker.ids[ranker.ids >= 0]
+    queries = []
+    for _ in range(n_queries):
+        session = rng.choice(joke_ids, rated, replace=False).tolist()
+        likes = rng.integers(1, rated + 1)
+        u = ranker.user_vector(session[:likes], session[likes:])
+        queries.append(np.append(u, 1))
+    return np.array(queries, dtype=np.float32)
+
+
+def recall(found: np.ndarray, truth: np.ndarray) -> float:
+    """Fraction of the exact results that were found."""
+    hits = sum(len(np.intersect1d(f[f >= 0], t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed(fn, *args) -> tuple:
+    """Run `fn` and return its result and the elapsed seconds."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Benchmark every backend searching `vectors` for `queries`.
+
+    Returns:
+        One (name, build seconds, ms per query, recall@k) row per backend.
+    """
+    n_queries = len(queries)
+    exact, build = timed(BruteForceIndex, vectors)
+    (truth, _), elapsed = timed(exact.search, queries, k)
+    rows = [("brute", build, 1000 * elapsed / n_queries, 1.0)]
+
+    ivf, build = timed(IVFIndex, vectors)
+    for n_probe in (1, 4, 8, 16, 32):
+        ivf.n_probe = min(n_probe, len(ivf.centroids))
+        (found, _), elapsed = timed(ivf.search, queries, k)
+        rows.append(
+            (
+                f"ivf lists={len(ivf.centroids)} probe={ivf.n_probe}",
+                build,
+                1000 * elapsed / n_queries,
+                recall(found, truth),
+            )
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=200_000)
+    parser.add_argument("--factors", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--model", help="benchmark an exported model instead")
+    args = parser.parse_args()
+
+    if args.model:
+        artifact = ModelArtifact.load(args.model)
+    else:
+        artifact = synthetic_artifact(args.items, args.factors)
+    ranker = FoldInRanker(artifact)
+    valid = artifact.ids >= 0
+    factors = artifact.item_factors[valid]
+    unit = factors / np.maximum(np.linalg.norm(factors, axis=1, keepdims=True), 1e-12)
+    n_queries = min(args.queries, len(unit))
+    rng = np.random.default_rng(0)
+
+    workloads = {
+        "ranker": (ranker.vectors[valid], fold_in_queries(ranker, n_queries)),
+        "neighbors": (unit, unit[rng.choice(len(unit), n_queries, replace=False)]),
+    }
+    print(f"{len(unit)} items, {factors.shape[1]} factors, recall@{args.k}")
+    for workload, (vectors, queries) in workloads.items():
+        print(f"\n{workload}")
+        print(f"{'backend':<28} {'build s':>9} {'ms/query':>9} {'recall':>7}")
+        for name, build, latency, hit_rate in bench(vectors, queries, args.k):
+            print(f"{name:<28} {build:>9.2f} {latency:>9.3f} {hit_rate:>7.3f}")
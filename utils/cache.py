@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Cache of recommendation results keyed by preference set."""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from redis.exceptions import RedisError
+
+
+class RecommendationCache:
+    """Bounded LRU cache with a time to live, and an optional Redis tier.
+
+    Results are keyed by a digest of the canonical (sorted, deduplicated)
+    preference sets, the amount requested and the model version, so the
+    sessions sharing the same likes share one entry and a new model export
+    never serves stale results.
+
+    Attributes:
+        hits:       lookups answered by the in-process tier.
+        redis_hits: lookups answered by the shared Redis tier.
+        misses:     lookups that had to be computed.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 300,
+        redis=None,
+        prefix: str = "recs:",
+    ) -> None:
+        """Create a cache.
+
+        Args:
+            max_size: amount of entries kept in process, 0 disables the
+                      in-process tier.
+            ttl:      seconds an entry stays valid.
+            redis:    optional `RedisDB` used as a shared tier between
+                      workers.
+            prefix:   prefix of the keys of the shared tier.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.redis = redis
+        self.prefix = prefix
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict = OrderedDict()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(kind: str, n: int, version: str, *id_sets) -> str:
+        """Canonical key of a recommendation request.
+
+        Args:
+            kind:    the kind of recommendation, e.g. `dynamic`.
+            n:       amount of results requested.
+            version: version of the model answering the request.
+            id_sets: the preference sets, order inside a set is ignored.
+        """
+        canonical = json.dumps(
+            [kind, n, version] + [sorted({int(i) for i in ids}) for ids in id_sets]
+        )
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    def get(self, key: str) -> list | None:
+        """Get a cached result, `None` on a miss."""
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return list(value)
+                del self.__entries[key]
+
+        value = self._get_shared(key)
+        with self.__lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.redis_hits += 1
+        self._set_local(key, value)
+        return list(value)
+
+    def set(self, key: str, value: list) -> None:
+        """Cache a result in every tier."""
+        self._set_local(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.set_value(self.prefix + key, json.dumps(value), self.ttl)
+            except RedisError:
+                pass
+
+    def get_or_compute(self, key: str, compute) -> list:
+        """Get a cached result or compute and cache it.
+
+        Args:
+            key:     key from `RecommendationCache.key`.
+            compute: callable without arguments producing the result.
+        """
+        value = self.get(key)
+        if value is None:
+            value = list(compute())
+            self.set(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop the in-process entries and reset the counters."""
+        with self.__lock:
+            self.__entries.clear()
+            self.hits = self.redis_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """Hit and miss counters and the in-process size."""
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "size": len(self.__entries),
+            }
+
+    def _get_shared(self, key: str) -> list | None:
+        """Look a key up in the Redis tier, `None` if absent or unreachable."""
+        if self.redis is None:
+            return None
+        try:
+            value = self.redis.get_value(self.prefix + key)
+        except RedisError:
+            return None
+        return None if value is None else json.loads(value)
+
+    def _set_local(self, key: str, value: list) -> None:
+        """Store an entry in process, evicting the least recently used."""
+        if self.max_size <= 0:
+            return
+        with self.__lock:
+            self.__entries[key] = (time.monotonic() + self.ttl, list(value))
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
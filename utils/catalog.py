@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Lookup of joke texts by jokeId.
+
+The catalog can be written to a jokes only file and memory-mapped by every
+serving process, so preforked workers share a single page-cache copy:
+
+    python -m utils.catalog [ratings.pkl] [jokes.cat]
+
+File layout (little endian):
+    8 bytes   magic `JOKECAT1`
+    uint64    n, the amount of id slots (highest jokeId + 1)
+    uint64[n + 1] offsets of every text inside the blob
+    bytes     utf-8 blob of all the texts, in jokeId order
+
+The text of jokeId `i` is `blob[offsets[i]:offsets[i + 1]]`, an empty
+slice for ids that are not in the catalog.
+"""
+
+import mmap
+import os
+import struct
+import sys
+from functools import cached_property
+
+import numpy as np
+
+MAGIC: bytes = b"JOKECAT1"
+# Ratings dataframe the catalog is built from, and the catalog file written
+# from it and mapped by the serving processes.
+RATINGS_PATH: str = os.getenv("RATINGS_PATH", "./mini_ratings-df.pkl")
+CATALOG_PATH: str = os.getenv("CATALOG_PATH", "./jokes.cat")
+
+
+class JokeCatalog:
+    """Deduplicated jokeId to joke text index.
+
+    The texts are stored in an array indexed by jokeId, so resolving a list
+    of ids costs one array read per id whatever the size of the ratings
+    the catalog was built from.
+    """
+
+    def __init__(self, texts) -> None:
+        """Create a catalog.
+
+        Args:
+            texts: sequence indexed by jokeId, `None` for unknown ids.
+        """
+        self.__texts = np.asarray(texts, dtype=object)
+
+    @classmethod
+    def from_ratings(cls, ratings_df) -> "JokeCatalog":
+        """Build a catalog from a ratings dataframe.
+
+        Args:
+            ratings_df: frame with at least a `jokeId` and a `jokeText`
+                        column. Jokes may appear in several rows.
+        """
+        jokes = ratings_df.drop_duplicates("jokeId")
+        ids = jokes["jokeId"].to_numpy(dtype=np.int64)
+        texts = np.full(int(ids.max()) + 1 if len(ids) else 0, None, dtype=object)
+        texts[ids] = jokes["jokeText"].to_numpy(dtype=object)
+        return cls(texts)
+
+    def __len__(self) -> int:
+        """Amount of jokes in the catalog."""
+        return len(self.joke_ids)
+
+    @cached_property
+    def joke_ids(self) -> list:
+        """All jokeIds present in the catalog, in ascending order."""
+        return [i for i, text in enumerate(self.__texts) if text is not None]
+
+    def get(self, joke_id) -> str | None:
+        """Get the text of a single joke, `None` if it is unknown."""
+        joke_id = int(joke_id)
+        if 0 <= joke_id < len(self.__texts):
+            return self.__texts[joke_id]
+        return None
+
+    def __contains__(self, joke_id) -> bool:
+        """Whether `joke_id` is in the catalog."""
+        return self.get(joke_id) is not None
+
+    @cached_property
+    def _text_ids(self) -> dict:
+        """Joke text to jokeId mapping, only built if `find` is used."""
+        return {self.get(i): i for i in self.joke_ids}
+
+    def find(self, text: str) -> int | None:
+        """Get the jokeId of a joke text, `None` if it is unknown."""
+        return self._text_ids.get(text)
+
+    def texts(self, joke_ids: list) -> list:
+        """Get the texts of `joke_ids` in the order they were requested.
+
+        Unknown ids are skipped.
+        """
+        texts = (self.get(i) for i in joke_ids)
+        return [text for text in texts if text is not None]
+
+    def save(self, path: str) -> None:
+        """Write the catalog to `path` in the memory-mappable format."""
+        encoded = [(text or "").encode("utf-8") for text in self.__texts]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        np.cumsum([len(text) for text in encoded], out=offsets[1:])
+
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(encoded)))
+            f.write(offsets.tobytes())
+            for text in encoded:
+                f.write(text)
+
+
+class MappedCatalog(JokeCatalog):
+    """Read only catalog backed by a memory-mapped catalog file.
+
+    Opening the file only maps it, texts are decoded on lookup. The pages
+    are shared by every process mapping the same file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Map the catalog file at `path`.
+
+        Raises:
+            FileNotFoundError: if `path` does not exist.
+            ValueError: if `path` is not a catalog file.
+        """
+        with open(path, "rb") as f:
+            self.__mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.__mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"'{path}' is not a joke catalog file")
+
+        (n,) = struct.unpack_from("<Q", self.__mmap, len(MAGIC))
+        header = len(MAGIC) + 8
+        self.__offsets = np.frombuffer(
+            self.__mmap, dtype="<u8", count=n + 1, offset=header
+        )
+        self.__blob = header + 8 * (n + 1)
+
+    @cached_property
+    def joke_ids(self) -> list:
+        """All jokeIds present in the catalog, in ascending order."""
+        return np.flatnonzero(np.diff(self.__offsets)).tolist()
+
+    def get(self, joke_id) -> str | None:
+        """Get the text of a single joke, `None` if it is unknown."""
+        joke_id = int(joke_id)
+        if not 0 <= joke_id < len(self.__offsets) - 1:
+            return None
+        start = self.__blob + int(self.__offsets[joke_id])
+        end = self.__blob + int(self.__offsets[joke_id + 1])
+        if start == end:
+            return None
+        return self.__mmap[start:end].decode("utf-8")
+
+    def save(self, path: str) -> None:
+        """Copy the catalog file to `path`."""
+        with open(path, "wb") as f:
+            f.write(self.__mmap)
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    args = sys.argv[1:]
+    ratings_path = args[0] if args else RATINGS_PATH
+    catalog_path = args[1] if len(args) > 1 else CATALOG_PATH
+    catalog = JokeCatalog.from_ratings(pd.read_pickle(ratings_path))
+    catalog.save(catalog_path)
+    print(f"wrote {len(catalog)} jokes to {catalog_path}")
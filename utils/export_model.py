@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Export the fastai learner into a NumPy only inference artifact.
+
+Usage:
+    python -m utils.export_model [learner.pkl] [artifact.npz]
+
+This is the only module that needs fastai and torch. The serving processes
+load the resulting artifact with `utils.model_artifact.ModelArtifact`.
+"""
+
+import sys
+from numbers import Integral
+
+from fastai.tabular.all import (
+    Module,
+    Embedding,
+    sigmoid_range,
+    load_learner,
+)
+
+from utils.model_artifact import ModelArtifact
+
+LEARNER_PATH: str = "./export-3-10.pkl"
+ARTIFACT_PATH: str = "./export-3-10.npz"
+
+
+# The class, as defined in the actual module,
+class DotProduct(Module):
+    """Dot Product Class that is used to construct
+    the behaviour of the collab filtering
+        model."""
+
+    def __init__(self, n_users, n_items, n_factors, y_range=(-9.5, 10.5)):
+        self.user_factors = Embedding(n_users, n_factors)
+        self.user_bias = Embedding(n_users, 1)
+        self.item_factors = Embedding(n_items, n_factors)
+        self.item_bias = Embedding(n_items, 1)
+        self.y_range = y_range
+
+    def forward(self, x):
+        """Define the forward propagation."""
+        users = self.user_factors(x[:, 0])
+        items = self.item_factors(x[:, 1])
+        res = (users * items).sum(dim=1, keepdim=True)
+        res += self.user_bias(x[:, 0]) + self.item_bias(x[:, 1])
+        return sigmoid_range(res, *self.y_range)
+
+
+def artifact_from_learner(learner_path: str = LEARNER_PATH) -> ModelArtifact:
+    """Load a pickled learner and extract its inference weights."""
+    # The learner was pickled from a notebook, so unpickling looks the
+    # model class up in `__main__`.
+    main_module = sys.modules["__main__"]
+    if not hasattr(main_module, "DotProduct"):
+        setattr(main_module, "DotProduct", DotProduct)
+
+    learn = load_learner(learner_path)
+    model = learn.model
+    classes = learn.dls.classes["jokeId"]
+    return ModelArtifact(
+        model.item_factors.weight.detach().cpu().numpy(),
+        model.item_bias.weight.detach().cpu().numpy(),
+        [int(i) if isinstance(i, Integral) else -1 for i in classes],
+        model.y_range,
+    )
+
+
+def export(learner_path: str = LEARNER_PATH, artifact_path: str = ARTIFACT_PATH):
+    """Convert the learner at `learner_path` and save it to `artifact_path`."""
+    artifact = artifact_from_learner(learner_path)
+    artifact.save(artifact_path)
+    return artifact
+
+
+if __name__ == "__main__":
+    artifact = export(*sys.argv[1:3])
+    print(
+        f"exported {len(artifact.joke_ids)} jokes, "
+        f"{artifact.item_factors.shape[1]} factors, version {artifact.version}"
+    )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Personalized ranking by folding a session into a user vector."""
+
+import numpy as np
+
+from utils.ann import make_index
+from utils.model_artifact import ModelArtifact
+
+LIKE_RATING: float = 8.0
+DISLIKE_RATING: float = -8.0
+REGULARIZATION: float = 1.0
+
+
+def logit_range(rating: float, low: float, high: float) -> float:
+    """Inverse of fastai's `sigmoid_range`.
+
+    Maps a rating inside (low, high) to the raw dot product the model
+    would need to predict it.
+    """
+    p = np.clip((rating - low) / (high - low), 1e-6, 1 - 1e-6)
+    return float(np.log(p / (1 - p)))
+
+
+class FoldInRanker:
+    """Rank the catalog for a session that has no trained user factors.
+
+    The likes and dislikes of the session are treated as ratings and a
+    user vector `u` is fitted to them against the fixed item factors `Q`
+    and item biases `b` of the `DotProduct` model with a ridge solve:
+
+        u = (Q^T Q + reg * I)^-1 Q^T (t - b)
+
+    where `t` are the target ratings mapped back through `sigmoid_range`.
+    The best jokes maximize `Q u + b`, which orders the jokes like the
+    model's prediction would. They are found by a `utils.ann` backend
+    searching the item vectors `[Q b]` for the query `[u 1]`, exactly by
+    default.
+    """
+
+    def __init__(
+        self,
+        artifact: ModelArtifact,
+        reg: float = REGULARIZATION,
+        backend: str = "brute",
+        vectors: np.ndarray | None = None,
+        **options,
+    ) -> None:
+        """Create a ranker.
+
+        Args:
+            artifact: the model weights.
+            reg:      ridge regularization of the user vectors.
+            backend:  name of the `utils.ann` backend to search with.
+            vectors:  the item vectors `[Q b]` of the artifact, e.g. shared
+                      by another process, computed when not given.
+            options:  keyword arguments of the backend.
+        """
+        self.factors = artifact.item_factors
+        self.bias = artifact.item_bias
+        self.ids = artifact.ids
+        self.o2i = artifact.o2i
+        self.reg = reg
+        self.like_target = logit_range(LIKE_RATING, *artifact.y_range)
+        self.dislike_target = logit_range(DISLIKE_RATING, *artifact.y_range)
+        if vectors is None:
+            vectors = np.hstack([self.factors, self.bias[:, None]])
+        self.vectors = vectors
+        self.index = make_index(backend, vectors, self.ids >= 0, **options)
+
+    def _positions(self, joke_ids: list) -> list:
+        """Embedding positions of the jokes known to the model."""
+        return [self.o2i[i] for i in map(int, joke_ids) if i in self.o2i]
+
+    def user_vector(self, include_ids: list, exclude_ids: list) -> np.ndarray:
+        """Fit a user vector to the liked and disliked jokes.
+
+        A joke present in both lists counts as disliked.
+        """
+        excludes = self._positions(exclude_ids)
+        includes = [p for p in self._positions(include_ids) if p not in excludes]
+        positions = includes + excludes
+        n_factors = self.factors.shape[1]
+        if not positions:
+            return np.zeros(n_factors, dtype=np.float32)
+
+        targets = np.full(len(positions), self.dislike_target, dtype=np.float32)
+        targets[: len(includes)] = self.like_target
+        q = self.factors[positions]
+        gram = q.T @ q + self.reg * np.eye(n_factors, dtype=np.float32)
+        return np.linalg.solve(gram, q.T @ (targets - self.bias[positions]))
+
+    def scores(self, user_vector: np.ndarray) -> np.ndarray:
+        """Raw score of every embedding position for a user vector."""
+        return self.factors @ user_vector + self.bias
+
+    def rank(self, include_ids: list, exclude_ids: list, n: int = 5) -> list:
+        """Get the `n` best jokeIds for a session.
+
+        Jokes the session already rated are never returned.
+        """
+        query = np.append(self.user_vector(include_ids, exclude_ids), 1)
+        rated = self._positions(list(include_ids) + list(exclude_ids))
+        closest, _ = self.index.search(query.astype(np.float32), n, exclude=[rated])
+        return [int(i) for i in self.ids[closest[0][closest[0] >= 0]]]
@@ -1,90 +1,229 @@
 #!/usr/bin/env python3
 """Using the model to generate dynamic content."""
 
+import os
 import random
+import threading
+import time
 
 random.seed()
 
-# from fastai.collab import Embedding
-from fastai.tabular.all import (
-    Module,
-    Embedding,
-    sigmoid_range,
-    pd,
-    load_learner,
-    tensor,
-    nn,
-)
-
-
-# The class, as defined in the actual module,
-class DotProduct(Module):
-    """Dot Product Class that is used to construct
-    the behaviour of the collab filtering
-        model."""
-
-    def __init__(self, n_users, n_items, n_factors, y_range=(-9.5, 10.5)):
-        self.user_factors = Embedding(n_users, n_factors)
-        self.user_bias = Embedding(n_users, 1)
-        self.item_factors = Embedding(n_items, n_factors)
-        self.item_bias = Embedding(n_items, 1)
-        self.y_range = y_range
-
-    def forward(self, x):
-        """Define the forward propagation."""
-        users = self.user_factors(x[:, 0])
-        items = self.item_factors(x[:, 1])
-        res = (users * items).sum(dim=1, keepdim=True)
-        res += self.user_bias(x[:, 0]) + self.item_bias(x[:, 1])
-        return sigmoid_range(res, *self.y_range)
-
+from utils.cache import RecommendationCache
+from utils.catalog import CATALOG_PATH, RATINGS_PATH, JokeCatalog, MappedCatalog
+from utils.fold_in import FoldInRanker
+from utils.model_artifact import ModelArtifact
+from utils.neighbors import NeighborIndex
+from utils.shared_embeddings import attach, published
+
+# NumPy artifact written by `python -m utils.export_model`.
+MODEL_PATH: str = os.getenv("MODEL_PATH", "./export-3-10.npz")
+# How sessions are ranked: fold_in, a user vector folded in from the likes
+# and dislikes, or similarity, the similarity of the jokes to every liked
+# joke combined with COMBINE_SCORES (sum, max or mean).
+RANKING: str = os.getenv("RANKING", "fold_in")
+COMBINE_SCORES: str = os.getenv("COMBINE_SCORES", "sum")
+# Recommendation cache: in-process entries, seconds to live and whether
+# results are also shared between workers through Redis.
+CACHE_SIZE: int = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+CACHE_TTL: float = float(os.getenv("RECOMMENDATION_CACHE_TTL", "300"))
+CACHE_REDIS: bool = os.getenv("RECOMMENDATION_CACHE_REDIS", "") == "1"
+# Search backend of the ranker and of the neighbour index, see `utils.ann`:
+# brute or ivf.
+SIMILARITY_INDEX: str = os.getenv("SIMILARITY_INDEX", "brute")
+# Directory the embeddings are published to by `python -m
+# utils.shared_embeddings`, workers map them from there when set.
+SHARED_EMBEDDINGS_DIR: str = os.getenv("SHARED_EMBEDDINGS_DIR", "")
+
+
+class ModelHolder:
+    """Lazily loaded catalog, model, ranker and index of the process.
+
+    Nothing is read from disk until the first recommendation, or until
+    `warmup` is called. Loading happens once, under a lock, however many
+    threads ask for the model at the same time. When embeddings were
+    published to `shared_dir`, they are memory-mapped from there instead
+    of being loaded by every process.
+
+    Attributes:
+        catalog:        the joke texts.
+        model:          the `ModelArtifact` weights.
+        ranker:         ranks the catalog for a session's preferences.
+        neighbor_index: precomputed closest jokes of every joke.
+        load_seconds:   time the last load took.
+    """
 
-# Load in our pickled dataframe.
-ratings_df = pd.read_pickle("./mini_ratings-df.pkl")
+    def __init__(self, shared_dir: str = SHARED_EMBEDDINGS_DIR) -> None:
+        self.shared_dir = shared_dir
+        self.catalog = None
+        self.model = None
+        self.ranker = None
+        self.neighbor_index = None
+        self.load_seconds: float | None = None
+        self.__ready = False
+        self.__lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """Whether the model is loaded and recommendations can be served."""
+        return self.__ready
+
+    def load(self) -> "ModelHolder":
+        """Load everything if it was not loaded yet, and return the holder."""
+        if not self.__ready:
+            with self.__lock:
+                if not self.__ready:
+                    start = time.perf_counter()
+                    self._load()
+                    self.load_seconds = time.perf_counter() - start
+                    self.__ready = True
+        return self
+
+    def _load(self) -> None:
+        """Read the catalog and the model and build the ranker and index."""
+        # Map the shared joke catalog, or index the pickled dataframe when no
+        # catalog file has been written.
+        if os.path.exists(CATALOG_PATH):
+            self.catalog = MappedCatalog(CATALOG_PATH)
+        else:
+            import pandas as pd
+
+            self.catalog = JokeCatalog.from_ratings(
+                pd.read_pickle(RATINGS_PATH)
+            )
+
+        # Attach to the embeddings published by the parent process.
+        if self.shared_dir and published(self.shared_dir):
+            self.model, vectors, self.neighbor_index = attach(
+                self.shared_dir, SIMILARITY_INDEX
+            )
+            self.ranker = FoldInRanker(
+                self.model, backend=SIMILARITY_INDEX, vectors=vectors
+            )
+            return
+
+        # Load in our model weights.
+        if os.path.exists(MODEL_PATH):
+            self.model = ModelArtifact.load(MODEL_PATH)
+        else:
+            # No exported artifact yet, fall back to reading the fastai learner.
+            from utils.export_model import artifact_from_learner
+
+            self.model = artifact_from_learner()
+
+        # Ranks the catalog for a session's likes and dislikes.
+        self.ranker = FoldInRanker(self.model, backend=SIMILARITY_INDEX)
+
+        # Precompute the closest jokes of every joke once, at model load.
+        self.neighbor_index = NeighborIndex(
+            self.model.item_factors, self.model.ids, backend=SIMILARITY_INDEX
+        )
+
+
+model_holder = ModelHolder()
+
+if CACHE_REDIS:
+    from models import REDIS
+
+    recommendation_cache = RecommendationCache(CACHE_SIZE, CACHE_TTL, REDIS)
+else:
+    recommendation_cache = RecommendationCache(CACHE_SIZE, CACHE_TTL)
+
+
+def warmup() -> float:
+    """Load the model now instead of on the first request.
+
+    Returns:
+        The seconds the load took.
+    """
+    return model_holder.load().load_seconds
 
-# Load in our learner.
-learn_inf = load_learner("./export-3-10.pkl")
 
+def is_ready() -> bool:
+    """Whether the model is loaded."""
+    return model_holder.ready
 
-def generate_random(n: int = 10) -> list:
-    """Generate random JokeIds from 0 - 140"""
-    return random.sample(range(141), n)
 
+def generate_random(n: int = 10, exclude=()) -> list:
+    """Generate random JokeIds from the ones present in the catalog.
 
-def generate_dynamic(include_ids: list, n: int = 5):
-    """Generate dynamic specifc contents"""
+    Ids in `exclude` are never returned, fewer than `n` ids are returned
+    once the catalog runs out.
+    """
+    joke_ids = model_holder.load().catalog.joke_ids
+    exclude = set(exclude)
+    sample = random.sample(joke_ids, min(n + len(exclude), len(joke_ids)))
+    return [i for i in sample if i not in exclude][: max(n, 0)]
+
+
+def generate_dynamic(
+    include_ids: list, n: int = 5, combine: str = COMBINE_SCORES
+) -> list:
+    """Generate dynamic specifc contents
+
+    The jokes closest to a single liked joke are read from the neighbour
+    table precomputed at model load, without scoring the catalog. Jokes
+    the model does not know have no neighbours. Several liked jokes are
+    scored against the catalog in a single pass, and their scores are
+    combined with `combine` (sum, max or mean).
+    """
+    neighbor_index = model_holder.load().neighbor_index
+    if not include_ids:
+        return []
     if len(include_ids) == 1:
-        dls_inf = learn_inf.dls
-        joke_factors_inf = learn_inf.model.item_factors.weight
-        idx_int = int(
-            include_ids[0]
-        )  # You can change this id, to get different results.
-        cls_idx = tensor(dls_inf.classes["jokeId"].o2i[idx_int])
-        int_joke_emb = joke_factors_inf[cls_idx, None]
-        distances = nn.CosineSimilarity(dim=1)(joke_factors_inf, int_joke_emb)
-        # Top 5 closest jokes.
-        closest_emb_idx = distances.argsort(descending=True)[1 : n + 1]
-        closest_idx = dls_inf.classes["jokeId"][closest_emb_idx]
-        return closest_idx
-    closest_idxs = []
-    for idx in random.sample(list(include_ids), 2):
-        dls_inf = learn_inf.dls
-        joke_factors_inf = learn_inf.model.item_factors.weight
-        idx_int = int(idx)  # You can change this id, to get different results.
-        cls_idx = tensor(dls_inf.classes["jokeId"].o2i[idx_int])
-        int_joke_emb = joke_factors_inf[cls_idx, None]
-        distances = nn.CosineSimilarity(dim=1)(joke_factors_inf, int_joke_emb)
-        # Top 5 closest jokes.
-        closest_emb_idx = distances.argsort(descending=True)[1 : n + 1]
-        closest_idxs.extend(dls_inf.classes["jokeId"][closest_emb_idx])
-    return random.sample(closest_idxs, n)
+        try:
+            return neighbor_index.neighbors(include_ids[0], n)
+        except KeyError:
+            return []
+    key = recommendation_cache.key(
+        f"dynamic-{combine}", n, model_holder.model.version, include_ids
+    )
+    return recommendation_cache.get_or_compute(
+        key, lambda: neighbor_index.recommend(include_ids, n, combine)
+    )
+
+
+def generate_personalized(include_ids: list, exclude_ids: list, n: int = 5):
+    """Generate contents personalized to a session's likes and dislikes.
+
+    A session that only liked a single joke, or every session with the
+    `similarity` RANKING, is served the neighbours of its likes with
+    `generate_dynamic`. Otherwise the session is folded into a user vector
+    against the model's joke factors and the catalog is searched for its
+    best jokes with the `SIMILARITY_INDEX` backend. Results are cached by
+    preference set.
+    """
+    if RANKING == "similarity" or (len(include_ids) == 1 and not exclude_ids):
+        return generate_dynamic(include_ids, n)
+    ranker = model_holder.load().ranker
+    key = recommendation_cache.key(
+        "personalized", n, model_holder.model.version, include_ids, exclude_ids
+    )
+    return recommendation_cache.get_or_compute(
+        key, lambda: ranker.rank(include_ids, exclude_ids, n)
+    )
 
 
 def generate_text_from_id(joke_ids: list[int]):
     """This is used to generate the appropriate text from a list of joke
     ids.
+
+    The texts are returned in the order of `joke_ids`, unknown ids are
+    skipped.
+    """
+    return model_holder.load().catalog.texts(joke_ids)
+
+
+def generate_id_from_text(jokes: list[str]) -> list[int]:
+    """Get the joke ids of a list of joke texts, in the same order.
+
+    Unknown texts are skipped.
     """
-    closest_jokes = ratings_df[ratings_df["jokeId"].isin(joke_ids)].drop_duplicates(
-        "jokeId"
-    )["jokeText"]
-    return list(closest_jokes)
+    catalog = model_holder.load().catalog
+    joke_ids = (catalog.find(joke) for joke in jokes)
+    return [joke_id for joke_id in joke_ids if joke_id is not None]
+
+
+def filter_known_ids(joke_ids: list) -> list[int]:
+    """Keep the joke ids that have a text in the catalog, in order."""
+    catalog = model_holder.load().catalog
+    return [int(joke_id) for joke_id in joke_ids if joke_id in catalog]
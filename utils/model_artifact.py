@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""NumPy only inference artifact of the collab filtering model."""
+
+import hashlib
+
+import numpy as np
+
+
+class ModelArtifact:
+    """The parts of the trained `DotProduct` model needed for inference.
+
+    Attributes:
+        item_factors: (n_items, n_factors) joke embedding matrix.
+        item_bias:    (n_items,) joke bias.
+        ids:          jokeId stored at each embedding position, -1 for
+                      positions that do not map to a joke (fastai's `#na#`).
+        o2i:          jokeId to embedding position mapping.
+        y_range:      (low, high) range of the model's ratings.
+        version:      digest of the weights, changes on every new export.
+    """
+
+    def __init__(
+        self,
+        item_factors,
+        item_bias,
+        ids,
+        y_range: tuple = (-9.5, 10.5),
+        version: str | None = None,
+    ) -> None:
+        self.item_factors = np.asarray(item_factors, dtype=np.float32)
+        self.item_bias = np.asarray(item_bias, dtype=np.float32).reshape(-1)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.o2i = {int(i): pos for pos, i in enumerate(self.ids) if i >= 0}
+        self.y_range = (float(y_range[0]), float(y_range[1]))
+        self.version = version or self._digest()
+
+    def _digest(self) -> str:
+        """Digest of the weights and id mapping."""
+        digest = hashlib.sha1()
+        for arr in (self.item_factors, self.item_bias, self.ids):
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        return digest.hexdigest()[:12]
+
+    @property
+    def joke_ids(self) -> list:
+        """All jokeIds known to the model."""
+        return [int(i) for i in self.ids if i >= 0]
+
+    def save(self, path: str) -> None:
+        """Write the artifact to `path` as an uncompressed `.npz` file."""
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                item_factors=self.item_factors,
+                item_bias=self.item_bias,
+                ids=self.ids,
+                y_range=np.asarray(self.y_range, dtype=np.float64),
+                version=np.asarray(self.version),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "ModelArtifact":
+        """Read an artifact written by `save`.
+
+        Raises:
+            FileNotFoundError: if `path` does not exist.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                data["item_factors"],
+                data["item_bias"],
+                data["ids"],
+                tuple(data["y_range"]),
+                str(data["version"]),
+            )
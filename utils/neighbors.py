@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Precomputed nearest neighbour table over the joke embeddings."""
+
+from numbers import Integral
+
+import numpy as np
+
+from utils.ann import make_index, top_k
+
+TOP_K: int = 50
+BLOCK_SIZE: int = 1024
+COMBINE_MODES: tuple = ("sum", "max", "mean")
+
+
+class NeighborIndex:
+    """Cosine similarity index built once from the item factors.
+
+    The item vectors are normalized at build time and the `k` closest
+    jokes of every joke are stored in a table, so looking up the
+    neighbours of a joke is a row read instead of a full similarity
+    pass over the catalog.
+
+    The similarity search itself is delegated to a `utils.ann` backend,
+    exact by default.
+
+    Attributes:
+        ids:     jokeId stored at each embedding position.
+        vectors: unit length item vectors, one row per position.
+        index:   the similarity search backend.
+        table:   positions of the `k` closest items of every position,
+                 most similar first, -1 padded.
+    """
+
+    def __init__(
+        self, factors, ids, k: int = TOP_K, backend: str = "brute", **options
+    ) -> None:
+        """Build the index.
+
+        Args:
+            factors: (n_items, n_factors) item embedding matrix.
+            ids:     jokeId of every row in `factors`. Entries that are
+                     negative or not integers (e.g. fastai's `#na#`
+                     placeholder) are never returned as neighbours.
+            k:       amount of neighbours to precompute per joke.
+            backend: name of the `utils.ann` backend to search with.
+            options: keyword arguments of the backend.
+        """
+        factors = np.asarray(factors, dtype=np.float32)
+        norms = np.linalg.norm(factors, axis=1, keepdims=True)
+        self.vectors = factors / np.maximum(norms, 1e-12)
+
+        self.valid = np.array(
+            [isinstance(i, Integral) and i >= 0 for i in ids], dtype=bool
+        )
+        self.ids = np.array([i if v else -1 for i, v in zip(ids, self.valid)])
+        self.o2i = {int(i): pos for pos, i in enumerate(self.ids) if i >= 0}
+
+        self.index = make_index(backend, self.vectors, self.valid, **options)
+        self.k = max(0, min(k, int(self.valid.sum()) - 1))
+        self.table = self._build_table()
+
+    @classmethod
+    def from_arrays(
+        cls, vectors, ids, table, backend: str = "brute", **options
+    ) -> "NeighborIndex":
+        """Create an index from arrays computed by another index.
+
+        The arrays are used as they are, so read only memory maps shared
+        between processes are never copied.
+
+        Args:
+            vectors: unit length item vectors.
+            ids:     integer jokeId of every row, -1 for placeholders.
+            table:   the neighbour table of the index that computed them.
+            backend: name of the `utils.ann` backend to search with.
+            options: keyword arguments of the backend.
+        """
+        index = cls.__new__(cls)
+        index.vectors = vectors
+        index.ids = np.asarray(ids)
+        index.valid = index.ids >= 0
+        index.o2i = {int(i): pos for pos, i in enumerate(index.ids) if i >= 0}
+        index.index = make_index(backend, vectors, index.valid, **options)
+        index.table = table
+        index.k = table.shape[1]
+        return index
+
+    def _search(self, positions: list, n: int) -> np.ndarray:
+        """Closest positions of every item of `positions`, itself excluded."""
+        closest, _ = self.index.search(
+            self.vectors[positions], n, exclude=[[p] for p in positions]
+        )
+        return closest
+
+    def _build_table(self) -> np.ndarray:
+        """Compute the top-k table for every item.
+
+        Rows are processed in blocks so the similarity matrix never has to
+        be held in memory as a whole.
+        """
+        n_items = len(self.ids)
+        table = np.empty((n_items, self.k), dtype=np.int64)
+        for start in range(0, n_items, BLOCK_SIZE):
+            positions = list(range(start, min(start + BLOCK_SIZE, n_items)))
+            table[positions] = self._search(positions, self.k)
+        return table
+
+    def position(self, joke_id) -> int:
+        """Embedding position of a jokeId.
+
+        Raises:
+            KeyError: if the joke is not part of the model.
+        """
+        return self.o2i[int(joke_id)]
+
+    def neighbors(self, joke_id, n: int = 5) -> list:
+        """Get the `n` jokeIds closest to `joke_id`, most similar first.
+
+        Served from the precomputed table when `n` is within it, otherwise
+        that single joke is searched in the index.
+        """
+        pos = self.position(joke_id)
+        if n <= self.k:
+            closest = self.table[pos, :n]
+        else:
+            closest = self._search([pos], n)[0]
+        return [int(i) for i in self.ids[closest[closest >= 0]]]
+
+    def recommend(self, joke_ids: list, n: int = 5, combine: str = "sum") -> list:
+        """Get the `n` jokeIds closest to a whole set of seed jokes.
+
+        The seed similarities are combined into a single score per joke.
+        `sum` and `mean` rank like the similarity to the sum of the seed
+        vectors, so they cost a single search. `max` searches all the seeds
+        in one batched query and rescores the union of their results.
+        Seeds that are not part of the model are ignored.
+
+        Args:
+            joke_ids: the seed jokeIds, e.g. every joke liked in a session.
+            n:        amount of jokeIds to return.
+            combine:  how to combine the seed scores, one of `sum`, `max`
+                      or `mean`.
+        Returns:
+            The best scoring jokeIds, best first. Seeds are never returned.
+        Raises:
+            ValueError: if `combine` is not a known mode.
+        """
+        if combine not in COMBINE_MODES:
+            raise ValueError(f"unknown combine mode '{combine}'")
+
+        positions = sorted(
+            {self.o2i[i] for i in map(int, joke_ids) if i in self.o2i}
+        )
+        if not positions:
+            return []
+
+        seeds = self.vectors[positions]
+        if combine == "max":
+            candidates, _ = self.index.search(
+                seeds, n, exclude=[positions] * len(positions)
+            )
+            candidates = np.unique(candidates[candidates >= 0])
+            scores = (self.vectors[candidates] @ seeds.T).max(axis=1)
+            closest = candidates[top_k(scores[None, :], n)[0]]
+        else:
+            closest, _ = self.index.search(seeds.sum(axis=0), n, exclude=[positions])
+            closest = closest[0][closest[0] >= 0]
+        return [int(i) for i in self.ids[closest]]
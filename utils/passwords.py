@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Password hashing off the request threads.
+
+Hashing and checking passwords is deliberately slow and CPU bound. It runs
+in a small pool of processes, so a burst of logins neither holds the GIL
+of the serving process nor queues without bound: once `max_pending`
+passwords wait, new ones are refused with a `HasherBusyError`. The hashes
+computed again in the background are saved by a thread of their own.
+
+The processes are forked from a fork server holding only werkzeug, never
+from the threads of the serving process. Like any process multiprocessing
+starts without a plain fork, each of them imports the main script again,
+as `__mp_main__`: serve with a server whose main script is light, e.g.
+`gunicorn app:app` or `uvicorn asgi:application`. Run as `python app.py`
+or `python asgi.py`, whose import loads the whole app, passwords are
+hashed on the request threads instead.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_all_start_methods, get_context
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# Werkzeug hashing method and its parameters, e.g. scrypt:32768:8:1 or
+# pbkdf2:sha256:600000, and length of the salts.
+PASSWORD_HASH_METHOD: str = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+PASSWORD_SALT_LENGTH: int = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+# Processes hashing passwords, 0 hashes on the calling thread, and amount
+# of passwords allowed to wait for them. See above for the main script.
+PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE: int = int(os.getenv("PASSWORD_HASH_QUEUE", "64"))
+
+
+class HasherBusyError(RuntimeError):
+    """Raised when too many passwords are already waiting to be hashed."""
+
+
+class PasswordHasher:
+    """Bounded pool of processes hashing and checking passwords."""
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_QUEUE,
+        method: str = PASSWORD_HASH_METHOD,
+        salt_length: int = PASSWORD_SALT_LENGTH,
+    ) -> None:
+        """Create a hasher.
+
+        Args:
+            workers:     amount of processes, 0 hashes on the calling thread.
+            max_pending: amount of passwords allowed to be hashed or to wait.
+            method:      werkzeug hashing method of the new hashes.
+            salt_length: length of the salt of the new hashes.
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.method = method
+        self.salt_length = salt_length
+        self.__pending = 0
+        self.__prefix: str | None = None
+        self.__executor: ProcessPoolExecutor | None = None
+        self.__saver: ThreadPoolExecutor | None = None
+        self.__lock = threading.Lock()
+
+    def pending(self) -> int:
+        """Amount of passwords being hashed or waiting."""
+        with self.__lock:
+            return self.__pending
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured method.
+
+        Raises:
+            HasherBusyError: if too many passwords are waiting.
+        """
+        return self._submit(
+            generate_password_hash, password, self.method, self.salt_length
+        ).result()
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        """Check a password against its hash.
+
+        Raises:
+            HasherBusyError: if too many passwords are waiting.
+        """
+        return self._submit(check_password_hash, pwhash, password).result()
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Whether a hash was made with other parameters than the current."""
+        if self.__prefix is None:
+            # Werkzeug fills the method with its default parameters.
+            self.__prefix = generate_password_hash("", self.method, 1).split("$")[0]
+        method, _, rest = pwhash.partition("$")
+        salt = rest.partition("$")[0]
+        return method != self.__prefix or len(salt) != self.salt_length
+
+    def rehash(self, password: str, save) -> bool:
+        """Hash a password again in the background.
+
+        Args:
+            password: the password, which was just verified.
+            save:     called with the new hash once computed, on the thread
+                      saving the rehashed passwords.
+        Returns:
+            Whether it was queued, False if too many passwords are waiting.
+        """
+        try:
+            future = self._submit(
+                generate_password_hash, password, self.method, self.salt_length
+            )
+        except HasherBusyError:
+            return False
+
+        # Not saved on the thread completing the hash: the callback thread
+        # of the pool, or the request thread without workers.
+        future.add_done_callback(
+            lambda future: self._saver().submit(self._save, future, save)
+        )
+        return True
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the processes, waiting for the queued passwords if `wait`."""
+        with self.__lock:
+            executor, self.__executor = self.__executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+        with self.__lock:
+            saver, self.__saver = self.__saver, None
+        if saver is not None:
+            saver.shutdown(wait=wait)
+
+    def _saver(self) -> ThreadPoolExecutor:
+        """The thread saving the rehashed passwords."""
+        with self.__lock:
+            if self.__saver is None:
+                self.__saver = ThreadPoolExecutor(
+                    1, thread_name_prefix="password-rehash"
+                )
+            return self.__saver
+
+    @staticmethod
+    def _save(future: Future, save) -> None:
+        """Save a new hash once computed."""
+        try:
+            save(future.result())
+        except Exception:
+            logger.exception("password rehash failed")
+
+    def _submit(self, fn, *args) -> Future:
+        """Run `fn(*args)` in the pool, or inline without workers."""
+        with self.__lock:
+            if self.__pending >= self.max_pending:
+                raise HasherBusyError("too many passwords waiting to be hashed")
+            self.__pending += 1
+            if self.workers > 0 and self.__executor is None:
+                self.__executor = ProcessPoolExecutor(
+                    self.workers, mp_context=self._context()
+                )
+            executor = self.__executor
+
+        if executor is None:
+            future = Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = executor.submit(fn, *args)
+            except Exception as e:
+                # E.g. a BrokenProcessPool, accounted for like any failure.
+                future = Future()
+                future.set_exception(e)
+        future.add_done_callback(self._done)
+        return future
+
+    @staticmethod
+    def _context():
+        """Start method of the processes.
+
+        A fork of the serving process would copy the locks held by its
+        threads. The fork server is started with werkzeug imported, and
+        its forks start quicker than spawned processes.
+        """
+        if "forkserver" not in get_all_start_methods():
+            return get_context("spawn")
+        context = get_context("forkserver")
+        context.set_forkserver_preload(["werkzeug.security"])
+        return context
+
+    def _done(self, future: Future) -> None:
+        """Account for a finished password."""
+        with self.__lock:
+            self.__pending -= 1
+        if not future.cancelled() and isinstance(
+            future.exception(), BrokenProcessPool
+        ):
+            # A process died, start a new pool for the next passwords.
+            with self.__lock:
+                self.__executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Embedding matrices shared read-only between serving processes.
+
+A parent process publishes the item factors and biases, the item vectors
+searched by the ranker, and the normalized item vectors and neighbour
+table of the neighbour index once as `.npy` files. Every worker then
+memory-maps them read-only, so all the workers of a box share the same page-cache copy
+and memory stays flat as workers are added.
+
+    python -m utils.shared_embeddings [directory]
+
+Layout of `directory`:
+    <version>/item_factors.npy, item_bias.npy, ids.npy, vectors.npy,
+    unit_vectors.npy, table.npy and meta.json
+    current   name of the latest published version
+
+A new publish never touches the files a running worker has mapped, it adds
+a version and then atomically swaps `current`.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+from utils.fold_in import FoldInRanker
+from utils.model_artifact import ModelArtifact
+from utils.neighbors import NeighborIndex
+
+ARRAYS: tuple = (
+    "item_factors", "item_bias", "ids", "vectors", "unit_vectors", "table"
+)
+
+
+def publish(
+    directory: str, model: ModelArtifact, ranker: FoldInRanker, index: NeighborIndex
+) -> str:
+    """Write the arrays of `model`, its `ranker` and `index` under `directory`.
+
+    Returns:
+        The path of the published version.
+    """
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, model.version)
+    if not os.path.isdir(target):
+        staging = tempfile.mkdtemp(dir=directory)
+        arrays = {
+            "item_factors": model.item_factors,
+            "item_bias": model.item_bias,
+            "ids": model.ids,
+            "vectors": ranker.vectors,
+            "unit_vectors": index.vectors,
+            "table": index.table,
+        }
+        for name in ARRAYS:
+            np.save(os.path.join(staging, f"{name}.npy"), arrays[name])
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump({"version": model.version, "y_range": model.y_range}, f)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Published concurrently by another process.
+            shutil.rmtree(staging, ignore_errors=True)
+
+    pointer = os.path.join(directory, f"current.{os.getpid()}")
+    with open(pointer, "w") as f:
+        f.write(model.version)
+    os.replace(pointer, os.path.join(directory, "current"))
+    return target
+
+
+def published(directory: str) -> bool:
+    """Whether a version was published under `directory`."""
+    return os.path.exists(os.path.join(directory, "current"))
+
+
+def attach(directory: str, backend: str = "brute", **options) -> tuple:
+    """Memory-map the current version published under `directory`.
+
+    Args:
+        directory: directory passed to `publish`.
+        backend:   `utils.ann` backend of the neighbour index.
+        options:   keyword arguments of the backend.
+    Returns:
+        (ModelArtifact, item vectors of the ranker, NeighborIndex) backed
+        by read only memory maps.
+    Raises:
+        FileNotFoundError: if nothing was published under `directory`.
+    """
+    with open(os.path.join(directory, "current")) as f:
+        source = os.path.join(directory, f.read().strip())
+    with open(os.path.join(source, "meta.json")) as f:
+        meta = json.load(f)
+    arrays = {
+        name: np.load(os.path.join(source, f"{name}.npy"), mmap_mode="r")
+        for name in ARRAYS
+    }
+
+    model = ModelArtifact(
+        arrays["item_factors"],
+        arrays["item_bias"],
+        arrays["ids"],
+        tuple(meta["y_range"]),
+        meta["version"],
+    )
+    index = NeighborIndex.from_arrays(
+        arrays["unit_vectors"], arrays["ids"], arrays["table"], backend, **options
+    )
+    return model, arrays["vectors"], index
+
+
+if __name__ == "__main__":
+    from utils.generate_content import SHARED_EMBEDDINGS_DIR, ModelHolder
+
+    directory = sys.argv[1] if len(sys.argv) > 1 else SHARED_EMBEDDINGS_DIR
+    if not directory:
+        sys.exit("usage: python -m utils.shared_embeddings <directory>")
+    # Load from the model artifact, not from a previous publish.
+    holder = ModelHolder(shared_dir="").load()
+    path = publish(directory, holder.model, holder.ranker, holder.neighbor_index)
+    print(f"published {path}")
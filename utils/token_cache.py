@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Cache of verified JWT payloads."""
+
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from jose import jwt
+
+
+class TokenCache:
+    """Bounded cache of the payloads of tokens already verified.
+
+    Entries are keyed by a digest of the token, so a token only hits the
+    cache if it is byte for byte one that passed verification. An entry is
+    dropped at the token's `exp`, after which the token is decoded again
+    and rejected as expired. Tokens without an `exp` are never cached.
+
+    Attributes:
+        hits:   tokens answered from the cache.
+        misses: tokens that had to be verified.
+    """
+
+    def __init__(
+        self, key: str, max_size: int = 4096, algorithms: list | None = None
+    ) -> None:
+        """Create a cache.
+
+        Args:
+            key:        key the tokens are signed with.
+            max_size:   amount of tokens kept, 0 disables the cache.
+            algorithms: algorithms accepted, those of python-jose by default.
+        """
+        self.key = key
+        self.max_size = max_size
+        self.algorithms = algorithms
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict = OrderedDict()
+        # Heap of (expiry, sequence, digest) of the entries.
+        self.__expiries: list = []
+        self.__sequence = itertools.count()
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        """Key of a token in the cache."""
+        return hashlib.sha256(token.encode()).digest()
+
+    def decode(self, token: str) -> dict:
+        """Verify a token and return its claims.
+
+        Raises:
+            JWTError: or one of its subclasses, as `jose.jwt.decode`, if the
+                      token is invalid or expired.
+        """
+        digest = self.digest(token)
+        now = time.time()
+        with self.__lock:
+            entry = self.__entries.get(digest)
+            if entry is not None and entry[0] > now:
+                self.__entries.move_to_end(digest)
+                payload = entry[1]
+                self.hits += 1
+            else:
+                payload = None
+                self.misses += 1
+
+        if payload is None:
+            payload = jwt.decode(token, self.key, algorithms=self.algorithms)
+            self._store(digest, payload, now)
+        return dict(payload)
+
+    def clear(self) -> None:
+        """Drop every cached token and reset the counters."""
+        with self.__lock:
+            self.__entries.clear()
+            self._compact()
+            self.hits = self.misses = 0
+
+    def _store(self, digest: bytes, payload: dict, now: float) -> None:
+        """Cache a verified payload until its expiry."""
+        exp = payload.get("exp")
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self.__lock:
+            self._expire(now)
+            self.__entries[digest] = (exp, payload)
+            heapq.heappush(self.__expiries, (exp, next(self.__sequence), digest))
+            while len(self.__entries) > self.max_size:
+                self.__entries.popitem(last=False)
+            # Entries evicted before their expiry leave stale heap items.
+            if len(self.__expiries) > 2 * self.max_size:
+                self._compact()
+
+    def _expire(self, now: float) -> None:
+        """Drop the tokens past their expiry."""
+        while self.__expiries and self.__expiries[0][0] <= now:
+            exp, _, digest = heapq.heappop(self.__expiries)
+            entry = self.__entries.get(digest)
+            if entry is not None and entry[0] == exp:
+                del self.__entries[digest]
+
+    def _compact(self) -> None:
+        """Rebuild the expiry heap from the live entries."""
+        self.__expiries = [
+            (exp, next(self.__sequence), digest)
+            for digest, (exp, _) in self.__entries.items()
+        ]
+        heapq.heapify(self.__expiries)